@@ -0,0 +1,104 @@
+"""
+Population aggregates maintained incrementally: every admit / re-score / discharge
+is an O(1) add or remove, so reading the dashboard KPIs never rescans the census.
+"""
+import math
+import os
+from collections import Counter
+
+# Risk histogram bin width in score points; the default 20 reproduces the dashboard's 0-20 ... 80-100 buckets
+HISTOGRAM_WIDTH = float(os.getenv("CENSUS_HISTOGRAM_WIDTH", 20))
+SCORE_MAX = 100.0
+
+class RunningStats:
+    """Welford mean/variance that also supports removing a previously added value."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x: float):
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.n -= 1
+        self.mean = (old_mean * (self.n + 1) - x) / self.n
+        self.m2 = max(0.0, self.m2 - (x - old_mean) * (x - self.mean))
+
+    def summary(self) -> dict:
+        variance = self.m2 / self.n if self.n else 0.0
+        return {"count": self.n, "mean": round(self.mean, 4), "variance": round(variance, 4), "std": round(math.sqrt(variance), 4)}
+
+class FixedHistogram:
+    def __init__(self, width: float = HISTOGRAM_WIDTH, upper: float = SCORE_MAX):
+        self.width = width
+        self.counts = [0] * max(1, math.ceil(upper / width))
+
+    def _bin(self, x: float) -> int:
+        return min(len(self.counts) - 1, max(0, int(x // self.width)))
+
+    def add(self, x: float):
+        self.counts[self._bin(x)] += 1
+
+    def remove(self, x: float):
+        self.counts[self._bin(x)] -= 1
+
+    def summary(self) -> list:
+        return [
+            {"range": f"{i * self.width:g}-{(i + 1) * self.width:g}", "count": count}
+            for i, count in enumerate(self.counts)
+        ]
+
+class PopulationAggregates:
+    def __init__(self):
+        self.severity = Counter()
+        self.diet = Counter()
+        self.diagnosis = Counter()
+        self.final_risk = RunningStats()
+        self.base_score = RunningStats()
+        self.final_risk_histogram = FixedHistogram()
+        self.base_score_histogram = FixedHistogram()
+
+    def add(self, record: dict):
+        self.severity[record["severity_class"]] += 1
+        self.diet[record["diet_recommendation"]] += 1
+        self.diagnosis[record["diagnosis_category"]] += 1
+        self.final_risk.add(record["final_risk_score"])
+        self.base_score.add(record["base_score"])
+        self.final_risk_histogram.add(record["final_risk_score"])
+        self.base_score_histogram.add(record["base_score"])
+
+    def remove(self, record: dict):
+        self.severity[record["severity_class"]] -= 1
+        self.diet[record["diet_recommendation"]] -= 1
+        self.diagnosis[record["diagnosis_category"]] -= 1
+        self.final_risk.remove(record["final_risk_score"])
+        self.base_score.remove(record["base_score"])
+        self.final_risk_histogram.remove(record["final_risk_score"])
+        self.base_score_histogram.remove(record["base_score"])
+
+    @property
+    def total(self) -> int:
+        return self.final_risk.n
+
+    def summary(self) -> dict:
+        def counts(counter):
+            return {key: count for key, count in counter.items() if count}
+        return {
+            "total": self.total,
+            "severity_counts": counts(self.severity),
+            "diet_counts": counts(self.diet),
+            "diagnosis_counts": counts(self.diagnosis),
+            "final_risk_score": self.final_risk.summary(),
+            "base_score": self.base_score.summary(),
+            "final_risk_histogram": self.final_risk_histogram.summary(),
+            "base_score_histogram": self.base_score_histogram.summary(),
+        }
@@ -0,0 +1,41 @@
+"""
+OTP persistence for main.py, and read access to the backend's staff accounts (the same auth.db)
+for admin-only routes. Imported (and its tables created by init()) in the app lifespan, so
+sqlalchemy and the auth.db schema setup stay off the server's import path.
+"""
+from sqlalchemy import create_engine, Column, String, Float, Integer
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+import metrics
+
+DATABASE_URL = "sqlite:///./auth.db"
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+
+class OTPRecord(Base):
+    __tablename__ = "otp_records"
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True)
+    otp = Column(String)
+    expiry = Column(Float)
+
+# Owned by the backend (backend/models.py): read here for role checks, never created here
+BackendBase = declarative_base()
+
+class User(BackendBase):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    email = Column(String)
+    role = Column(String)
+
+class TokenBlocklist(BackendBase):
+    __tablename__ = "token_blocklist"
+    id = Column(Integer, primary_key=True)
+    token = Column(String)
+
+metrics.instrument_sqlalchemy(engine, "auth")
+
+def init():
+    """Creates the OTP table (from the app lifespan, not at import)."""
+    Base.metadata.create_all(bind=engine)
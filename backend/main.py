@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
@@ -9,23 +10,29 @@ import auth
 from pydantic import BaseModel, EmailStr
 import os
 import json
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from typing import List
-import pandas as pd
+from typing import List, Optional
+import asyncio
+
+# Shared instrumentation modules live in the repository root, which is on PYTHONPATH (see README)
+import metrics
+import profiler
 
 GOOGLE_CLIENT_ID = "625094222230-d9ihjsrcl49h5qr9ggv18spjllpa6u7i.apps.googleusercontent.com"
 EXCEL_FILE = "Patient_Clinical_Data.xlsx"
 
-# Initialize folders
 DATA_DIR = "data"
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
 
-# Initialize database
-models.Base.metadata.create_all(bind=database.engine)
+# pandas and google-auth are imported where they are used; folders, tables and monitors are set up here
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    models.Base.metadata.create_all(bind=database.engine)
+    metrics.instrument_sqlalchemy(database.engine, "auth")
+    app.state.loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
+    yield
+    app.state.loop_monitor.cancel()
 
-app = FastAPI(title="CarePulse++ Professional Auth System")
+app = FastAPI(title="CarePulse++ Professional Auth System", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +41,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(profiler.ProfilerMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # --- SCHEMAS ---
 class AuthToken(BaseModel):
@@ -56,15 +65,29 @@ class UserDataStore(BaseModel):
     patients: List[dict]
     hospital: dict
 
+class ProfileRequest(BaseModel):
+    mode: str = "sample"  # "sample" (collapsed stacks) or "cprofile" (pstats)
+    seconds: Optional[float] = None
+    route: Optional[str] = None  # e.g. "/api/v1/patients/add"; profiles the next `requests` matches
+    requests: Optional[int] = None
+    interval_ms: float = profiler.DEFAULT_INTERVAL_MS
+
 
 # --- HELPERS ---
 def get_user_data_path(email: str):
     return os.path.join(DATA_DIR, f"{email.replace('@', '_at_')}.json")
 
+async def send_otp_email_tracked(email: str, otp: str):
+    with metrics.email_send() as outcome:
+        outcome["ok"] = await otp_utils.send_otp_email(email, otp)
+    return outcome["ok"]
+
 # --- ENDPOINTS ---
 
 @app.post("/api/v1/auth/google")
 async def auth_google(auth_req: AuthToken, db: Session = Depends(database.get_db)):
+    from google.oauth2 import id_token
+    from google.auth.transport import requests
     try:
         idinfo = id_token.verify_oauth2_token(auth_req.token, requests.Request(), GOOGLE_CLIENT_ID)
         email = idinfo['email']
@@ -80,7 +103,7 @@ async def auth_google(auth_req: AuthToken, db: Session = Depends(database.get_db
         db.commit()
 
         # Send Email
-        email_sent = await otp_utils.send_otp_email(email, otp_code)
+        email_sent = await send_otp_email_tracked(email, otp_code)
         print(f"\n[GOOGLE-AUTH] OTP for {email}: {otp_code} (email sent: {email_sent})\n")
 
         return {
@@ -113,7 +136,7 @@ async def request_otp(req: OTPRequest, db: Session = Depends(database.get_db)):
     db.commit()
 
     # Send via FastAPI-Mail (implementation in otp_utils.py)
-    email_sent = await otp_utils.send_otp_email(req.email, otp_code)
+    email_sent = await send_otp_email_tracked(req.email, otp_code)
     
     if not email_sent:
         raise HTTPException(
@@ -286,11 +309,13 @@ async def add_patient(req: dict, current_user: models.User = Depends(auth.get_cu
     if not patient:
         raise HTTPException(status_code=400, detail="Missing patient data")
 
+    import pandas as pd
     # 1. Sequential ID Generation
     new_id = 1
     if os.path.exists(EXCEL_FILE):
         try:
-            df = pd.read_excel(EXCEL_FILE)
+            with metrics.EXCEL_SECONDS.labels("read").time():
+                df = pd.read_excel(EXCEL_FILE)
             if not df.empty and 'patient_id' in df.columns:
                 # Filter out non-numeric IDs if any, then find max
                 numeric_ids = pd.to_numeric(df['patient_id'], errors='coerce')
@@ -309,7 +334,8 @@ async def add_patient(req: dict, current_user: models.User = Depends(auth.get_cu
     # 2. Update Excel
     try:
         if os.path.exists(EXCEL_FILE):
-            df = pd.read_excel(EXCEL_FILE)
+            with metrics.EXCEL_SECONDS.labels("read").time():
+                df = pd.read_excel(EXCEL_FILE)
             new_row_df = pd.DataFrame([patient])
             # Ensure columns match
             for col in df.columns:
@@ -318,9 +344,11 @@ async def add_patient(req: dict, current_user: models.User = Depends(auth.get_cu
             # Reorder columns to match
             new_row_df = new_row_df[df.columns]
             df = pd.concat([df, new_row_df], ignore_index=True)
-            df.to_excel(EXCEL_FILE, index=False)
+            with metrics.EXCEL_SECONDS.labels("write").time():
+                df.to_excel(EXCEL_FILE, index=False)
         else:
-             pd.DataFrame([patient]).to_excel(EXCEL_FILE, index=False)
+            with metrics.EXCEL_SECONDS.labels("write").time():
+                pd.DataFrame([patient]).to_excel(EXCEL_FILE, index=False)
     except Exception as e:
         print(f"Excel Update Error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to update Excel: {str(e)}")
@@ -335,6 +363,51 @@ def check_role(roles: List[str]):
         return current_user
     return role_checker
 
+# --- PROFILING (Admin only) ---
+@app.post("/admin/profiler/start")
+async def start_profiler(req: ProfileRequest, current_user: models.User = Depends(check_role(["Admin"]))):
+    """
+    Profiles this worker for N seconds, or for the next N requests matching a route.
+    Fetch the artifact from /admin/profiler/result once the session has finished.
+    """
+    try:
+        return profiler.start(req.mode, req.seconds, req.route, req.requests, req.interval_ms)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=f"Profiler session {e} is already running")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/admin/profiler/stop")
+async def stop_profiler(current_user: models.User = Depends(check_role(["Admin"]))):
+    session = profiler.stop()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profiler session is running")
+    return session
+
+@app.get("/admin/profiler")
+async def get_profiler_status(current_user: models.User = Depends(check_role(["Admin"]))):
+    session = profiler.status()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile has been recorded")
+    return session
+
+@app.get("/admin/profiler/result")
+async def get_profiler_result(current_user: models.User = Depends(check_role(["Admin"]))):
+    """Collapsed stacks (text) for "sample" sessions, a pstats dump for "cprofile" ones."""
+    try:
+        content, media_type, filename = profiler.result()
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except profiler.ProfileNotReady:
+        raise HTTPException(status_code=409, detail="Profiler session is still running")
+    return Response(content=content, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+# --- METRICS ---
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition: route latency, Excel/DB/email timings, loop lag."""
+    return Response(content=metrics.render_latest(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
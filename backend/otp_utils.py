@@ -1,21 +1,25 @@
 import random
 import os
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from functools import lru_cache
 from dotenv import load_dotenv
 import hashlib
 
 load_dotenv()
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
-    MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
-    MAIL_FROM=os.getenv("MAIL_FROM"),
-    MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
-    MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
-    MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "True") == "True",
-    MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False") == "True",
-    USE_CREDENTIALS=True
-)
+@lru_cache(maxsize=None)
+def get_mail_config():
+    """Built on the first email, so fastapi_mail (and aiosmtplib) load only when mail is sent."""
+    from fastapi_mail import ConnectionConfig
+    return ConnectionConfig(
+        MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
+        MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
+        MAIL_FROM=os.getenv("MAIL_FROM"),
+        MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
+        MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
+        MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "True") == "True",
+        MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False") == "True",
+        USE_CREDENTIALS=True
+    )
 
 def generate_otp():
     return str(random.randint(100000, 999999))
@@ -27,6 +31,7 @@ def verify_otp_hash(otp: str, hashed_otp: str):
     return hashlib.sha256(otp.encode()).hexdigest() == hashed_otp
 
 async def send_otp_email(email: str, otp: str):
+    from fastapi_mail import FastMail, MessageSchema
     message = MessageSchema(
         subject="CarePulse++ OTP Verification",
         recipients=[email],
@@ -50,7 +55,7 @@ async def send_otp_email(email: str, otp: str):
         subtype="html"
     )
 
-    fm = FastMail(conf)
+    fm = FastMail(get_mail_config())
     try:
         await fm.send_message(message)
         return True
@@ -0,0 +1,241 @@
+"""
+In-process engine benchmarks on seeded synthetic cohorts.
+
+    python bench_engine.py --update-baseline    # record this machine's numbers as the baseline
+    python bench_engine.py                      # 1e3..1e5, compare against bench_baseline.json
+    python bench_engine.py --full               # adds 1e6
+    python bench_engine.py --ci                 # CI: record the baseline on the first run, compare after
+
+Each case reports throughput (items/s), p50/p99 latency and peak traced memory.
+Scalar cases report per-call percentiles; vectorized cases time repeated whole-batch runs.
+Exits non-zero when a case's throughput falls more than --threshold below the baseline, or when
+there is no baseline to compare against. Baselines are machine-specific: record one per benchmark
+host with --update-baseline; it is never written implicitly, except by --ci.
+
+In CI, keep bench_baseline.json in the runner's cache (keyed by runner type) and run with --ci: the
+first run on a host records the baseline and exits 0, every later run compares against it.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+import scoring_spec
+import synthetic
+from engine import (calculate_patient_risk, calculate_patient_risk_batch, calculate_hospital_stress, score_patient,
+                    component_batch, component_lut_batch)
+from models import HospitalData
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+FULL_SIZES = DEFAULT_SIZES + [1_000_000]
+BASELINE_FILE = "bench_baseline.json"
+BATCH_REPEATS = 7
+
+def percentiles_us(samples_ns: np.ndarray) -> dict:
+    p50, p99 = np.percentile(samples_ns, [50, 99])
+    return {"p50_us": round(p50 / 1000, 3), "p99_us": round(p99 / 1000, 3)}
+
+def peak_memory_mb(fn) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 2**20, 2)
+
+def bench_per_call(items, fn) -> dict:
+    """
+    Throughput is the best of several untimed-per-call loops (like timeit);
+    percentiles come from a separate pass that times every call.
+    """
+    best_ns = None
+    for _ in range(3 if len(items) <= 100_000 else 1):
+        t0 = time.perf_counter_ns()
+        for item in items:
+            fn(item)
+        elapsed = time.perf_counter_ns() - t0
+        best_ns = elapsed if best_ns is None else min(best_ns, elapsed)
+
+    timings = np.empty(len(items), dtype=np.int64)
+    clock = time.perf_counter_ns
+    for i, item in enumerate(items):
+        t0 = clock()
+        fn(item)
+        timings[i] = clock() - t0
+    return {"throughput_per_s": round(len(items) / (best_ns / 1e9), 1), **percentiles_us(timings)}
+
+def bench_per_batch(n: int, fn, repeats: int = BATCH_REPEATS) -> dict:
+    fn()  # warm-up
+    timings = np.empty(repeats, dtype=np.int64)
+    for i in range(repeats):
+        t0 = time.perf_counter_ns()
+        fn()
+        timings[i] = time.perf_counter_ns() - t0
+    return {"throughput_per_s": round(n / (np.median(timings) / 1e9), 1), **percentiles_us(timings)}
+
+@contextmanager
+def active_spec(spec):
+    """Scores with `spec` (e.g. one compiled without lookup tables) for the duration of a case."""
+    saved, scoring_spec._current = scoring_spec.current(), spec
+    try:
+        yield
+    finally:
+        scoring_spec._current = saved
+
+def without_luts(fn):
+    no_luts = scoring_spec.CompiledSpec(scoring_spec.current().raw, lut_max_entries=0)
+
+    def run():
+        with active_spec(no_luts):
+            return fn()
+    return run
+
+def hospital_cohort(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    hospitals = []
+    for i in range(n):
+        beds, icu, er = int(rng.integers(50, 800)), int(rng.integers(5, 80)), int(rng.integers(10, 120))
+        hospitals.append(HospitalData(
+            hospital_id=i, total_beds=beds, occupied_beds=int(rng.integers(0, beds + 1)),
+            icu_beds_total=icu, icu_beds_occupied=int(rng.integers(0, icu + 1)),
+            er_capacity=er, er_occupied=int(rng.integers(0, int(er * 1.3) + 1)),
+            ongoing_operations_count=int(rng.integers(0, 30)), available_doctors=int(rng.integers(1, 60)),
+            available_nurses=int(rng.integers(5, 200)), ventilators_available=int(rng.integers(1, 60)),
+            ambulance_available_count=int(rng.integers(0, 15)), room_temperature_celsius=22.0,
+            oxygen_supply_level_percent=int(rng.integers(10, 101)), total_patients_current=beds
+        ))
+    return hospitals
+
+def run_cases(sizes, seed) -> dict:
+    results = {}
+    for n in sizes:
+        columns = synthetic.generate_patient_columns(n, seed)
+        patients = synthetic.patients_from_columns(columns)
+        spec = scoring_spec.current()
+        hr_k = spec.inputs.index("heart_rate_bpm")
+        hr_array = columns["heart_rate_bpm"].astype(float)
+        gender_row = (columns["gender"] != "male").astype(np.intp)
+
+        cases = {
+            "calculate_patient_risk": (
+                lambda: bench_per_call(patients, calculate_patient_risk),
+                lambda: [calculate_patient_risk(p) for p in patients],
+            ),
+            "score_patient": (
+                lambda: bench_per_call(patients, score_patient),
+                lambda: [score_patient(p) for p in patients],
+            ),
+            "calculate_patient_risk[oxygen_crisis]": (
+                lambda: bench_per_call(patients, lambda p: calculate_patient_risk(p, True)),
+                lambda: [calculate_patient_risk(p, True) for p in patients],
+            ),
+            "score_patient[no_lut]": (
+                without_luts(lambda: bench_per_call(patients, score_patient)),
+                without_luts(lambda: [score_patient(p) for p in patients]),
+            ),
+            "heart_rate_index_batch[closed_form]": (
+                lambda: bench_per_batch(n, lambda: component_batch(spec, hr_k, hr_array, gender_row)),
+                lambda: component_batch(spec, hr_k, hr_array, gender_row),
+            ),
+            "heart_rate_index_batch[lut]": (
+                lambda: bench_per_batch(n, lambda: component_lut_batch(spec, hr_k, hr_array, hr_array, gender_row)),
+                lambda: component_lut_batch(spec, hr_k, hr_array, hr_array, gender_row),
+            ),
+            "calculate_patient_risk_batch": (
+                lambda: bench_per_batch(n, lambda: calculate_patient_risk_batch(columns)),
+                lambda: calculate_patient_risk_batch(columns),
+            ),
+            "calculate_patient_risk_batch[no_lut]": (
+                without_luts(lambda: bench_per_batch(n, lambda: calculate_patient_risk_batch(columns))),
+                without_luts(lambda: calculate_patient_risk_batch(columns)),
+            ),
+        }
+        if n <= 100_000:  # hospital snapshots beyond this are not a realistic workload
+            hospitals = hospital_cohort(n, seed)
+            cases["calculate_hospital_stress"] = (
+                lambda: bench_per_call(hospitals, calculate_hospital_stress),
+                lambda: [calculate_hospital_stress(h) for h in hospitals],
+            )
+
+        for name, (timed, traced) in cases.items():
+            key = f"{name}@{n}"
+            stats = timed()
+            stats["peak_memory_mb"] = peak_memory_mb(traced)
+            results[key] = stats
+            print(f"{key:<48} {stats['throughput_per_s']:>14,.0f}/s  p50 {stats['p50_us']:>10.2f}us  "
+                  f"p99 {stats['p99_us']:>10.2f}us  peak {stats['peak_memory_mb']:>9.2f}MB")
+        del patients, columns
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        floor = base["throughput_per_s"] * (1 - threshold)
+        if stats["throughput_per_s"] < floor:
+            regressions.append(f"{key}: {stats['throughput_per_s']:,.0f}/s < {floor:,.0f}/s "
+                               f"(baseline {base['throughput_per_s']:,.0f}/s)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="CarePulse++ engine benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", help="cohort sizes (default 1e3 1e4 1e5)")
+    parser.add_argument("--full", action="store_true", help="include the 1e6 cohort")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--ci", action="store_true", help="record the baseline if there is none, else compare")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed fractional throughput drop")
+    args = parser.parse_args()
+
+    if args.ci and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; --ci records this run as the baseline")
+        args.update_baseline = True
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one on this host with --update-baseline, or run with --ci", file=sys.stderr)
+        return 2
+
+    sizes = args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)
+    print(f"CarePulse++ engine benchmark | seed={args.seed} sizes={sizes}")
+    print("=" * 110)
+    results = run_cases(sizes, args.seed)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "results": results
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    unmatched = [key for key in results if key not in baseline.get("results", {})]
+    if unmatched:
+        print(f"\nNot in the baseline, not compared: {', '.join(unmatched)}")
+    if regressions:
+        print(f"\nREGRESSIONS (> {args.threshold:.0%} below baseline):")
+        for line in regressions:
+            print("  " + line)
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from models import PatientData
+import scoring_spec
+from engine import PatientRisk, score_patient
+from risk_cache import risk_cache
+
+# --- TUNING (from env) ---
+# Bulk requests smaller than this are scored inline; the IPC round trip is not worth it
+OFFLOAD_THRESHOLD = int(os.getenv("BULK_OFFLOAD_THRESHOLD", 2000))
+# Smallest chunk handed to a worker process
+MIN_CHUNK_SIZE = int(os.getenv("BULK_MIN_CHUNK_SIZE", 1000))
+POOL_WORKERS = int(os.getenv("BULK_POOL_WORKERS", os.cpu_count() or 1))
+# Upper bound on chunks queued or running across all requests on this worker
+MAX_INFLIGHT_CHUNKS = int(os.getenv("BULK_MAX_INFLIGHT_CHUNKS", POOL_WORKERS * 4))
+RETRY_AFTER_SECONDS = int(os.getenv("BULK_RETRY_AFTER_SECONDS", 2))
+# How often background work waiting for a free slot looks again
+CAPACITY_POLL_SECONDS = 0.05
+# Workers never start with a plain fork: forking while another thread of the server holds an
+# import or I/O lock leaves the child waiting on that lock forever
+POOL_START_METHOD = os.getenv(
+    "BULK_POOL_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_inflight_chunks = 0
+
+class PoolSaturated(Exception):
+    def __init__(self, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__("Bulk scoring capacity exhausted")
+        self.retry_after = retry_after
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context(POOL_START_METHOD))
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def inflight_chunks() -> int:
+    return _inflight_chunks
+
+def score_chunk(patients: List[PatientData], is_oxygen_crisis: bool) -> List[PatientRisk]:
+    # Runs inside a pool worker, which picks up spec edits on its own
+    scoring_spec.refresh()
+    return [score_patient(p, is_oxygen_crisis) for p in patients]
+
+def partition(items: list, max_chunks: int) -> List[list]:
+    n_chunks = max(1, min(max_chunks, math.ceil(len(items) / MIN_CHUNK_SIZE)))
+    size = math.ceil(len(items) / n_chunks)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+async def score_bulk(patients: List[PatientData], is_oxygen_crisis: bool = False) -> List[PatientRisk]:
+    """
+    Scores small batches inline and fans large ones out over the process pool.
+    Raises PoolSaturated instead of queueing when the in-flight bound would be exceeded.
+    With the risk cache enabled, only uncached and distinct rows reach the scorer.
+    """
+    if risk_cache.enabled:
+        keys, results, todo = risk_cache.plan_bulk(patients, is_oxygen_crisis)
+        scored = await _score_uncached(list(todo.values()), is_oxygen_crisis)
+        return risk_cache.finish_bulk(patients, keys, results, todo, scored)
+    return await _score_uncached(patients, is_oxygen_crisis)
+
+async def _score_uncached(patients: List[PatientData], is_oxygen_crisis: bool) -> List[PatientRisk]:
+    if len(patients) < OFFLOAD_THRESHOLD:
+        return score_chunk(patients, is_oxygen_crisis)
+
+    # Never more chunks than the pool can run at once, so one request always fits an idle pool
+    chunks = partition(patients, min(POOL_WORKERS, MAX_INFLIGHT_CHUNKS))
+    parts = await run_chunks(score_chunk, [(chunk, is_oxygen_crisis) for chunk in chunks])
+    return [result for part in parts for result in part]
+
+async def run_chunks(fn, chunk_args: List[tuple], wait: bool = False) -> list:
+    """
+    Runs fn(*args) for every args tuple on the pool, counted against MAX_INFLIGHT_CHUNKS.
+    Raises PoolSaturated instead of queueing behind other requests; background work (scoring
+    jobs) passes wait=True to wait for room instead, still within the same bound.
+    """
+    global _inflight_chunks
+    while _inflight_chunks + len(chunk_args) > MAX_INFLIGHT_CHUNKS:
+        if not wait:
+            raise PoolSaturated()
+        await asyncio.sleep(CAPACITY_POLL_SECONDS)
+
+    _inflight_chunks += len(chunk_args)
+    try:
+        loop = asyncio.get_running_loop()
+        pool = get_pool()
+        return await asyncio.gather(*[loop.run_in_executor(pool, fn, *args) for args in chunk_args])
+    finally:
+        _inflight_chunks -= len(chunk_args)
@@ -0,0 +1,207 @@
+"""
+Server-side patient census with maintained indexes, so the dashboard can page through
+filtered, sorted patients without shipping and re-sorting the whole array.
+
+Indexes (all updated in O(log n) search + list insert per patient change):
+  - one sorted list of (key, patient_id) per (severity filter, sort column), where the
+    severity filter is each severity label plus ALL
+  - prefix indexes on lower-cased patient_id and diagnosis_category
+A severity-filtered, sorted page is a slice of one sorted list: O(log n + page).
+A search narrows to the m prefix matches first and sorts those: O(log n + m log m).
+"""
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import columnar
+from aggregates import PopulationAggregates
+import scoring_spec
+from engine import PatientRisk, calculate_patient_risk_batch
+from models import PatientData, PatientAnalysisResult
+
+EXCEL_FILE = "Patient_Clinical_Data.xlsx"
+ALL = "All"
+SORT_COLUMNS = (
+    "final_risk_score", "base_score", "patient_id", "age", "heart_rate_bpm", "systolic_bp_mmHg", "diastolic_bp_mmHg",
+    "oxygen_saturation_percent", "body_temperature_celsius", "respiratory_rate_bpm", "blood_sugar_mg_dl",
+    "hydration_level_percent", "hemoglobin_g_dl", "diagnosis_category", "admission_type",
+)
+PREFIX_COLUMNS = ("patient_id", "diagnosis_category")
+INT_FIELDS = {name for name, field in PatientData.model_fields.items() if field.annotation is int}
+RESULT_FIELDS = tuple(f for f in PatientAnalysisResult.model_fields if f != "patient_id")
+
+def _sort_key(column: str, value):
+    if column == "patient_id":
+        # Numeric IDs (the Excel sequence) sort numerically, then anything else lexically;
+        # isdigit() alone also accepts digits int() rejects, such as superscripts
+        return (0, int(value), value) if value.isascii() and value.isdigit() else (1, 0, value)
+    return value
+
+class CensusStore:
+    def __init__(self):
+        self.records: Dict[str, dict] = {}
+        self.sorted: Dict[Tuple[str, str], List[tuple]] = {}
+        self.prefix: Dict[str, List[Tuple[str, str]]] = {column: [] for column in PREFIX_COLUMNS}
+        self.aggregates = PopulationAggregates()
+        self.spec_mtime: Optional[float] = None
+
+    # --- INDEX MAINTENANCE ---
+    def _sorted_list(self, severity: str, column: str) -> List[tuple]:
+        key = (severity, column)
+        if key not in self.sorted:
+            self.sorted[key] = []
+        return self.sorted[key]
+
+    def _index(self, record: dict):
+        pid = record["patient_id"]
+        for severity in (ALL, record["severity_class"]):
+            for column in SORT_COLUMNS:
+                insort(self._sorted_list(severity, column), (_sort_key(column, record[column]), pid))
+        for column in PREFIX_COLUMNS:
+            insort(self.prefix[column], (str(record[column]).lower(), pid))
+        self.aggregates.add(record)
+
+    def _unindex(self, record: dict):
+        pid = record["patient_id"]
+        for severity in (ALL, record["severity_class"]):
+            for column in SORT_COLUMNS:
+                entries = self.sorted[(severity, column)]
+                del entries[bisect_left(entries, (_sort_key(column, record[column]), pid))]
+        for column in PREFIX_COLUMNS:
+            entries = self.prefix[column]
+            del entries[bisect_left(entries, (str(record[column]).lower(), pid))]
+        self.aggregates.remove(record)
+
+    def _clear(self):
+        self.records.clear()
+        self.sorted.clear()
+        self.prefix = {column: [] for column in PREFIX_COLUMNS}
+        self.aggregates = PopulationAggregates()
+
+    # --- UPDATES ---
+    def upsert(self, patient: PatientData, result: PatientRisk) -> dict:
+        record = patient.model_dump()
+        record.update({field: getattr(result, field) for field in RESULT_FIELDS})
+        old = self.records.get(record["patient_id"])
+        if old is not None:
+            self._unindex(old)
+        self.records[record["patient_id"]] = record
+        self._index(record)
+        return record
+
+    def discharge(self, patient_id: str) -> bool:
+        record = self.records.pop(patient_id, None)
+        if record is None:
+            return False
+        self._unindex(record)
+        return True
+
+    def load_columns(self, columns: Dict[str, np.ndarray]):
+        """Replaces the census with a scored column batch (bulk rebuild: sort once, not insort n times)."""
+        results = calculate_patient_risk_batch(columns)
+        names = list(PatientData.model_fields)
+        lists = [
+            columns[name].astype(np.int64).tolist() if name in INT_FIELDS else columns[name].tolist()
+            for name in names
+        ] + [results[field].tolist() for field in RESULT_FIELDS]
+        keys = names + list(RESULT_FIELDS)
+
+        self._clear()
+        for row in zip(*lists):
+            record = dict(zip(keys, row))
+            self.records[record["patient_id"]] = record
+        for column in SORT_COLUMNS:
+            everything = sorted((_sort_key(column, r[column]), r["patient_id"]) for r in self.records.values())
+            self.sorted[(ALL, column)] = everything
+            for entry in everything:
+                self._sorted_list(self.records[entry[1]]["severity_class"], column).append(entry)
+        for column in PREFIX_COLUMNS:
+            self.prefix[column] = sorted((str(r[column]).lower(), r["patient_id"]) for r in self.records.values())
+        for record in self.records.values():
+            self.aggregates.add(record)
+        self.spec_mtime = scoring_spec.current().mtime
+
+    def load_excel(self, path: str = EXCEL_FILE):
+        import pandas as pd
+        import pyarrow as pa
+        df = pd.read_excel(path)
+        df["patient_id"] = df["patient_id"].astype(str)
+        self.load_columns(columnar.table_to_columns(pa.Table.from_pandas(df, preserve_index=False)))
+
+    def sync_spec(self):
+        """Re-scores the census when the scoring spec changed since it was scored."""
+        spec = scoring_spec.current()
+        if self.spec_mtime is None or spec.mtime == self.spec_mtime or not self.records:
+            self.spec_mtime = spec.mtime
+            return
+        self.load_columns(self.to_columns())
+
+    def to_columns(self) -> Dict[str, np.ndarray]:
+        """The census as one array per PatientData field (batch-engine input)."""
+        return columnar.records_to_columns(list(self.records.values()))
+
+    # --- QUERIES ---
+    def _prefix_matches(self, query: str) -> set:
+        q = query.lower()
+        matches = set()
+        for entries in self.prefix.values():
+            i = bisect_left(entries, (q, ""))
+            while i < len(entries) and entries[i][0].startswith(q):
+                matches.add(entries[i][1])
+                i += 1
+        return matches
+
+    def _matching(self, severity: Optional[str], search: Optional[str], sort: str) -> List[tuple]:
+        """Ascending (sort key, patient_id) entries of the filtered view; the index itself when unfiltered by search."""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort}; sortable columns: {', '.join(SORT_COLUMNS)}")
+        severity = severity or ALL
+
+        if search:
+            pids = self._prefix_matches(search)
+            if severity != ALL:
+                pids = {pid for pid in pids if self.records[pid]["severity_class"] == severity}
+            entries = sorted((_sort_key(sort, self.records[pid][sort]), pid) for pid in pids)
+        else:
+            entries = self.sorted.get((severity, sort), [])
+        return entries
+
+    def query(self, severity: Optional[str] = None, search: Optional[str] = None, sort: str = "final_risk_score",
+              descending: bool = True, offset: int = 0, limit: int = 50) -> Tuple[int, List[dict]]:
+        """Returns (matched count, page of records)."""
+        entries = self._matching(severity, search, sort)
+        matched = len(entries)
+        if descending:
+            stop = max(0, matched - offset)
+            page = entries[max(0, stop - limit):stop][::-1]
+        else:
+            page = entries[offset:offset + limit]
+        return matched, [self.records[pid] for _, pid in page]
+
+    def export_chunks(self, severity: Optional[str] = None, search: Optional[str] = None, sort: str = "final_risk_score",
+                      descending: bool = True, chunk_rows: int = 5000) -> Iterator[List[dict]]:
+        """
+        Every matching record in query order, chunk_rows at a time. Only the patient_id order is
+        snapshotted up front, so changes during a long export neither break nor reorder it;
+        patients discharged meanwhile are skipped. Raises ValueError (unknown sort) before yielding.
+        """
+        order = [pid for _, pid in self._matching(severity, search, sort)]
+        if descending:
+            order.reverse()
+        return self._export(order, chunk_rows)
+
+    def _export(self, order: List[str], chunk_rows: int) -> Iterator[List[dict]]:
+        for start in range(0, len(order), chunk_rows):
+            records = [self.records.get(pid) for pid in order[start:start + chunk_rows]]
+            yield [record for record in records if record is not None]
+
+    def page_aggregates(self) -> dict:
+        summary = self.aggregates
+        return {
+            "total": summary.total,
+            "severity_counts": {label: count for label, count in summary.severity.items() if count},
+            "average_risk_score": round(summary.final_risk.mean, 2),
+        }
+
+census = CensusStore()
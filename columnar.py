@@ -0,0 +1,117 @@
+"""
+Arrow/Parquet wire formats for patient tables. pyarrow is imported by the functions that need
+it, so importing this module (for the media types or records_to_columns) stays cheap.
+"""
+from functools import lru_cache
+import numpy as np
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from models import PatientData
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+# Accepted Content-Type values mapped to their canonical wire format
+MEDIA_TYPE_ALIASES = {
+    ARROW_STREAM_MEDIA_TYPE: ARROW_STREAM_MEDIA_TYPE,
+    "application/x-apache-arrow-stream": ARROW_STREAM_MEDIA_TYPE,
+    PARQUET_MEDIA_TYPE: PARQUET_MEDIA_TYPE,
+    "application/x-parquet": PARQUET_MEDIA_TYPE,
+    "application/parquet": PARQUET_MEDIA_TYPE,
+}
+
+STRING_FIELDS = {"patient_id", "gender", "admission_type", "diagnosis_category"}
+
+@lru_cache(maxsize=None)
+def result_schema() -> "pa.Schema":
+    import pyarrow as pa
+    return pa.schema([
+        ("patient_id", pa.string()),
+        ("base_score", pa.float64()),
+        ("final_risk_score", pa.float64()),
+        ("severity_class", pa.dictionary(pa.int32(), pa.string())),
+        ("diet_recommendation", pa.dictionary(pa.int32(), pa.string())),
+        ("target_room_temperature", pa.float64()),
+    ])
+
+def resolve_media_type(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    return MEDIA_TYPE_ALIASES.get(content_type.split(";")[0].strip().lower())
+
+def read_patient_table(payload: bytes, media_type: str) -> "pa.Table":
+    """
+    Decodes an Arrow IPC stream or Parquet file. Both readers work directly on the
+    request buffer, so primitive columns are not copied on the way in.
+    """
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    buf = pa.py_buffer(payload)
+    if media_type == PARQUET_MEDIA_TYPE:
+        return pq.read_table(pa.BufferReader(buf))
+    return ipc.open_stream(buf).read_all()
+
+def table_to_columns(table: "pa.Table") -> Dict[str, np.ndarray]:
+    """
+    Maps a patient table onto one numpy array per PatientData field.
+    Missing columns and nulls fall back to the PatientData defaults.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    if "patient_id" not in table.column_names:
+        raise ValueError("Missing required column: patient_id")
+
+    columns = {}
+    for name, field in PatientData.model_fields.items():
+        if name not in table.column_names:
+            columns[name] = np.full(table.num_rows, field.default, dtype=object if name in STRING_FIELDS else np.float64)
+            continue
+
+        col = table.column(name)
+        if name in STRING_FIELDS:
+            col = pc.cast(col, pa.string())
+        elif not pa.types.is_floating(col.type):
+            col = pc.cast(col, pa.float64())
+
+        if col.null_count:
+            if name == "patient_id":
+                raise ValueError("Column patient_id must not contain nulls")
+            col = pc.fill_null(col, field.default)
+
+        # Single-chunk, null-free float64 columns are handed over without a copy
+        columns[name] = col.combine_chunks().to_numpy(zero_copy_only=False)
+    return columns
+
+def records_to_columns(records: List[dict]) -> Dict[str, np.ndarray]:
+    """Row dicts (census records, dumped PatientData) to the same column layout."""
+    return {
+        name: np.array([r[name] for r in records], dtype=object if name in STRING_FIELDS else np.float64)
+        for name in PatientData.model_fields
+    }
+
+def results_to_table(results: Dict[str, np.ndarray]) -> "pa.Table":
+    import pyarrow as pa
+    schema = result_schema()
+    arrays = [
+        pa.array(results[field.name], type=field.type.value_type).dictionary_encode()
+        if pa.types.is_dictionary(field.type)
+        else pa.array(results[field.name], type=field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def write_table(table: "pa.Table", media_type: str) -> bytes:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    sink = pa.BufferOutputStream()
+    if media_type == PARQUET_MEDIA_TYPE:
+        pq.write_table(table, sink)
+    else:
+        with ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,244 @@
+"""
+Content-Encoding for the bulk clinical endpoints (pure ASGI middleware).
+
+Requests: a gzip or zstd body is decoded as it is received, before the route reads it, and the
+decoded size is capped so a small compressed body cannot expand without limit.
+Responses: gzip or zstd is negotiated from Accept-Encoding and applied message by message, each
+message flushed, so streamed responses (exports) stay streamed. Bodies under
+COMPRESSION_MIN_BYTES, already-compressed media types and event streams pass through untouched.
+
+zstd needs the optional zstandard package; without it only gzip is offered and accepted.
+"""
+import os
+import zlib
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# --- CONFIG (from env) ---
+MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+MAX_DECODED_BYTES = int(os.getenv("COMPRESSION_MAX_DECODED_BYTES", 256 * 1024 * 1024))
+PATH_PREFIXES = tuple(p.strip() for p in os.getenv(
+    "COMPRESSION_PATHS",
+    "/api/v1/patient,/api/v1/census,/api/v1/export,/api/v1/jobs,/api/v1/history,/api/v1/network,"
+    "/api/v1/simulation,/api/v1/hospital,/api/v1/er"
+).split(",") if p.strip())
+
+# Media types that are compressed already or must not be held back
+SKIP_MEDIA_PREFIXES = (
+    "text/event-stream", "image/", "application/zip", "application/gzip", "application/zstd",
+    "application/vnd.apache.parquet", "application/parquet", "application/x-parquet",
+    "application/vnd.openxmlformats-officedocument",
+)
+
+# --- CODECS ---
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        self.obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class _ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self):
+        self.obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        flush = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self.obj.compress(data) + self.obj.flush(flush)
+
+class _GzipDecoder:
+    def __init__(self):
+        self.obj = zlib.decompressobj(31)
+
+    def decode(self, data: bytes, room: int) -> bytes:
+        # One byte past the room left is enough to know the cap is exceeded
+        out = self.obj.decompress(data, room + 1)
+        if len(out) > room:
+            raise _too_large()
+        return out
+
+    def finish(self):
+        if not self.obj.eof:
+            raise HTTPException(status_code=400, detail="Truncated gzip request body")
+
+class _ZstdDecoder:
+    # zstandard's decompressobj takes no output limit, so the input goes in a slice at a time: a block
+    # holds at most 128 KiB and takes at least 4 bytes, so one slice yields at most 2 MiB past the room
+    FEED_BYTES = 64
+
+    def __init__(self):
+        self.obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decode(self, data: bytes, room: int) -> bytes:
+        view, parts, size = memoryview(data), [], 0
+        for i in range(0, len(view), self.FEED_BYTES):
+            part = self.obj.decompress(view[i:i + self.FEED_BYTES])
+            size += len(part)
+            if size > room:
+                raise _too_large()
+            parts.append(part)
+        return b"".join(parts)
+
+    def finish(self):
+        if not getattr(self.obj, "eof", True):
+            raise HTTPException(status_code=400, detail="Truncated zstd request body")
+
+ENCODERS = {"gzip": _GzipEncoder}
+DECODERS = {"gzip": _GzipDecoder}
+DECODE_ERRORS = (zlib.error, ValueError)
+if zstandard is not None:
+    ENCODERS["zstd"] = _ZstdEncoder
+    DECODERS["zstd"] = _ZstdDecoder
+    DECODE_ERRORS += (zstandard.ZstdError,)
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Decoded request body exceeds {MAX_DECODED_BYTES} bytes")
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Preferred supported encoding for an Accept-Encoding header (zstd over gzip at equal weight)."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip()] = q
+    candidates = [(weights.get(name, weights.get("*", 0.0)), rank, name) for rank, name in enumerate(("gzip", "zstd"))
+                  if name in ENCODERS]
+    q, _, name = max(candidates)
+    return name if q > 0 else None
+
+# --- MIDDLEWARE ---
+class CompressionMiddleware:
+    def __init__(self, app, path_prefixes=PATH_PREFIXES, minimum_size: int = MIN_BYTES):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        # 1. Request body
+        request_encoding = headers.get("content-encoding", "identity").strip().lower() or "identity"
+        if request_encoding != "identity":
+            if request_encoding not in DECODERS:
+                detail = f"Unsupported Content-Encoding {request_encoding}; use {', '.join(DECODERS)}".encode()
+                await send({"type": "http.response.start", "status": 415,
+                            "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(detail)).encode())]})
+                await send({"type": "http.response.body", "body": detail})
+                return
+            # The route sees a plain body of unknown length
+            scope = dict(scope, headers=[(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")])
+            receive = _decoding_receive(receive, request_encoding)
+        else:
+            receive = _counting_receive(receive)
+
+        # 2. Response body
+        encoding = negotiate(headers.get("accept-encoding", ""))
+        responder = _Responder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+def _counting_receive(receive) -> Callable:
+    wire = metrics.TRANSPORT_BYTES.labels("in", "identity", "wire")
+    body = metrics.TRANSPORT_BYTES.labels("in", "identity", "body")
+
+    async def wrapped():
+        message = await receive()
+        if message["type"] == "http.request":
+            size = len(message.get("body", b""))
+            wire.inc(size)
+            body.inc(size)
+        return message
+    return wrapped
+
+def _decoding_receive(receive, encoding: str) -> Callable:
+    decoder = DECODERS[encoding]()
+    wire = metrics.TRANSPORT_BYTES.labels("in", encoding, "wire")
+    body = metrics.TRANSPORT_BYTES.labels("in", encoding, "body")
+    decoded = 0
+
+    async def wrapped():
+        nonlocal decoded
+        message = await receive()
+        if message["type"] != "http.request":
+            return message
+        data = message.get("body", b"")
+        wire.inc(len(data))
+        try:
+            out = decoder.decode(data, MAX_DECODED_BYTES - decoded)
+            if not message.get("more_body", False):
+                decoder.finish()
+        except DECODE_ERRORS as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {encoding} request body: {e}")
+        decoded += len(out)
+        body.inc(len(out))
+        return {**message, "body": out}
+    return wrapped
+
+class _Responder:
+    """Holds http.response.start until the first body message shows whether compressing pays off."""
+
+    def __init__(self, send, encoding: Optional[str], minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+        self.counters = None
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            return await self._send(message)
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.start is not None:
+            await self._start(body, more)
+        wire, decoded = self.counters
+        decoded.inc(len(body))
+        if self.encoder is not None:
+            body = self.encoder.encode(body, not more)
+        wire.inc(len(body))
+        await self._send({"type": "http.response.body", "body": body, "more_body": more})
+
+    async def _start(self, body: bytes, more: bool):
+        start, self.start = self.start, None
+        headers = MutableHeaders(raw=start["headers"])
+        media_type = headers.get("content-type", "")
+        compressible = self.encoding is not None and not media_type.startswith(SKIP_MEDIA_PREFIXES)
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        # A single body message under the threshold is sent as is; streams are always compressed
+        if compressible and "content-encoding" not in headers and (more or len(body) >= self.minimum_size):
+            self.encoder = ENCODERS[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["content-length"]
+        encoding = self.encoder.name if self.encoder is not None else "identity"
+        self.counters = (metrics.TRANSPORT_BYTES.labels("out", encoding, "wire"),
+                         metrics.TRANSPORT_BYTES.labels("out", encoding, "body"))
+        await self._send(start)
@@ -0,0 +1,233 @@
+"""
+Multi-hospital ambulance diversion: every incoming emergency goes to the nearest facility
+that still has ER headroom (below the engine's divert threshold), an ICU bed when the case
+needs one, and an HSI under the acceptable ceiling after taking the patient.
+
+Hospitals live in a static k-d tree over unit vectors on the sphere (chord distance orders
+like great-circle distance, with no dateline or pole special cases). Capacity changes as
+cases are assigned, so eligibility is checked during the nearest-neighbour search and the
+per-hospital counters (and HSI) are updated in O(1) after each assignment, and again when the
+case is released (discharged from the ER, or its ambulance stood down).
+
+The network and its counters are kept in shared_state (kv "diversion:network" and
+"diversion:counters") and published on the change feed, so every worker routes against the
+same capacity; the caller holds the "diversion" lock.
+"""
+import math
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from engine import ER_DIVERT_THRESHOLD, stress_index
+from models import NetworkHospital, EmergencyCase, DiversionAssignment
+import shared_state
+
+EARTH_RADIUS_KM = 6371.0088
+# Highest HSI a hospital may reach by accepting a diverted case ("System Overload" starts at 0.9)
+MAX_ACCEPTABLE_HSI = float(os.getenv("DIVERSION_MAX_HSI", 0.9))
+
+def to_unit_vector(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+def chord_to_km(chord_sq: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_sq) / 2))
+
+class KDTree:
+    """Static 3-d tree; nearest() skips points the accept predicate rejects."""
+
+    def __init__(self, points: Sequence[Tuple[float, float, float]]):
+        self.points = list(points)
+        self.node_point: List[int] = []
+        self.node_axis: List[int] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    def _build(self, ids: List[int], depth: int) -> int:
+        if not ids:
+            return -1
+        axis = depth % 3
+        ids.sort(key=lambda i: self.points[i][axis])
+        mid = len(ids) // 2
+        node = len(self.node_point)
+        self.node_point.append(ids[mid])
+        self.node_axis.append(axis)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.left[node] = self._build(ids[:mid], depth + 1)
+        self.right[node] = self._build(ids[mid + 1:], depth + 1)
+        return node
+
+    def nearest(self, query: Tuple[float, float, float], accept: Callable[[int], bool]) -> Tuple[int, float]:
+        """(point index, squared chord distance) of the closest accepted point, or (-1, inf)."""
+        best_i, best_d = -1, math.inf
+        points, qx, qy, qz = self.points, query[0], query[1], query[2]
+        # Entries are (node, squared distance to its splitting plane); far sides are pruned when popped
+        stack = [(self.root, 0.0)] if self.root >= 0 else []
+        while stack:
+            node, plane_d = stack.pop()
+            if plane_d >= best_d:
+                continue
+            i = self.node_point[node]
+            px, py, pz = points[i]
+            d = (px - qx) ** 2 + (py - qy) ** 2 + (pz - qz) ** 2
+            if d < best_d and accept(i):
+                best_i, best_d = i, d
+            diff = query[self.node_axis[node]] - points[i][self.node_axis[node]]
+            near, far = (self.left[node], self.right[node]) if diff < 0 else (self.right[node], self.left[node])
+            if far >= 0:
+                stack.append((far, diff * diff))
+            if near >= 0:
+                stack.append((near, 0.0))
+        return best_i, best_d
+
+class DiversionRouter:
+    def __init__(self, hospitals: List[NetworkHospital], max_hsi: float = MAX_ACCEPTABLE_HSI):
+        self.hospitals = hospitals
+        self.max_hsi = max_hsi
+        self.tree = KDTree([to_unit_vector(h.latitude, h.longitude) for h in hospitals])
+        # Mutable capacity counters, one slot per hospital
+        self.er_occupied = [h.er_occupied for h in hospitals]
+        self.icu_occupied = [h.icu_beds_occupied for h in hospitals]
+        # case_id -> (hospital index, took an ICU bed), for the cases still holding a place
+        self.assigned: Dict[str, Tuple[int, bool]] = {}
+        self.hsi = [self._hsi(i, 0, 0) for i in range(len(hospitals))]
+        # Eligibility only changes when a hospital's own counters do, so it is cached per hospital
+        self.accepting_er = [self._accepts(i, False) for i in range(len(hospitals))]
+        self.accepting_icu = [self._accepts(i, True) for i in range(len(hospitals))]
+        self.open_er, self.open_icu = sum(self.accepting_er), sum(self.accepting_icu)
+
+    def _hsi(self, i: int, extra_er: int, extra_icu: int) -> float:
+        h = self.hospitals[i]
+        icu_occupied = self.icu_occupied[i] + extra_icu
+        return stress_index(
+            (h.total_beds - h.occupied_beds) / max(1, h.total_beds),
+            (h.icu_beds_total - icu_occupied) / max(1, h.icu_beds_total),
+            (self.er_occupied[i] + extra_er) / max(1, h.er_capacity),
+            h.ongoing_operations_count / max(1, h.available_doctors),
+            icu_occupied / max(1, h.ventilators_available),
+        )
+
+    def _accepts(self, i: int, needs_icu: bool) -> bool:
+        h = self.hospitals[i]
+        if (self.er_occupied[i] + 1) / max(1, h.er_capacity) > ER_DIVERT_THRESHOLD:
+            return False
+        if needs_icu and self.icu_occupied[i] >= h.icu_beds_total:
+            return False
+        return self._hsi(i, 1, int(needs_icu)) < self.max_hsi
+
+    def set_counters(self, er_occupied: List[int], icu_occupied: List[int], assigned: Optional[dict] = None):
+        """Takes over counters routed elsewhere; only hospitals whose counters moved are refreshed."""
+        if assigned is not None:
+            self.assigned = {case_id: (i, bool(icu)) for case_id, (i, icu) in assigned.items()}
+        for i, (er, icu) in enumerate(zip(er_occupied, icu_occupied)):
+            if er != self.er_occupied[i] or icu != self.icu_occupied[i]:
+                self.er_occupied[i], self.icu_occupied[i] = er, icu
+                self._refresh(i)
+
+    def _refresh(self, i: int):
+        self.hsi[i] = self._hsi(i, 0, 0)
+        er, icu = self._accepts(i, False), self._accepts(i, True)
+        self.open_er += er - self.accepting_er[i]
+        self.open_icu += icu - self.accepting_icu[i]
+        self.accepting_er[i], self.accepting_icu[i] = er, icu
+
+    def route(self, case: EmergencyCase) -> DiversionAssignment:
+        # A case routed again gives up the place it was holding
+        self.release(case.case_id)
+        accepting, open_count = (self.accepting_icu, self.open_icu) if case.needs_icu else (self.accepting_er, self.open_er)
+        i, chord_sq = -1, 0.0
+        if open_count:
+            i, chord_sq = self.tree.nearest(to_unit_vector(case.latitude, case.longitude), accepting.__getitem__)
+        if i < 0:
+            return DiversionAssignment(case_id=case.case_id, action="NO CAPACITY - Escalate to regional command")
+
+        self.er_occupied[i] += 1
+        if case.needs_icu:
+            self.icu_occupied[i] += 1
+        self._refresh(i)
+        self.assigned[case.case_id] = (i, case.needs_icu)
+        return DiversionAssignment(
+            case_id=case.case_id,
+            hospital_id=self.hospitals[i].hospital_id,
+            distance_km=round(chord_to_km(chord_sq), 2),
+            hospital_stress_index=round(self.hsi[i], 3),
+            action="Route to ICU" if case.needs_icu else "Route to ER",
+        )
+
+    def release(self, case_id: str) -> Optional[int]:
+        """Frees the ER place (and ICU bed) a routed case took; the hospital_id, or None if it holds none."""
+        if case_id not in self.assigned:
+            return None
+        i, needs_icu = self.assigned.pop(case_id)
+        self.er_occupied[i] = max(0, self.er_occupied[i] - 1)
+        if needs_icu:
+            self.icu_occupied[i] = max(0, self.icu_occupied[i] - 1)
+        self._refresh(i)
+        return self.hospitals[i].hospital_id
+
+    def state(self) -> List[dict]:
+        return [
+            {
+                "hospital_id": h.hospital_id,
+                "er_occupied": self.er_occupied[i],
+                "er_capacity": h.er_capacity,
+                "icu_beds_occupied": self.icu_occupied[i],
+                "icu_beds_total": h.icu_beds_total,
+                "hospital_stress_index": round(self.hsi[i], 3),
+                "accepting": self.accepting_er[i],
+            }
+            for i, h in enumerate(self.hospitals)
+        ]
+
+router: Optional[DiversionRouter] = None
+
+NETWORK_KEY = "diversion:network"
+COUNTERS_KEY = "diversion:counters"
+
+def load_network(hospitals: List[NetworkHospital], max_hsi: Optional[float] = None) -> DiversionRouter:
+    global router
+    if len({h.hospital_id for h in hospitals}) != len(hospitals):
+        raise ValueError("hospital_id values must be unique within the network")
+    router = DiversionRouter(hospitals, MAX_ACCEPTABLE_HSI if max_hsi is None else max_hsi)
+    network = {"hospitals": [h.model_dump() for h in hospitals], "max_hsi": router.max_hsi}
+    shared_state.store.put(NETWORK_KEY, network)
+    shared_state.store.delete(COUNTERS_KEY)
+    shared_state.store.publish("diversion", "network", network)
+    return router
+
+def route(cases: List[EmergencyCase]) -> List[DiversionAssignment]:
+    """Routes the cases in order, then shares the new counters once for the whole batch."""
+    assignments = [router.route(case) for case in cases]
+    _share_counters()
+    return assignments
+
+def release(case_id: str) -> Optional[int]:
+    """Frees a routed case's place and shares the new counters; None if the case holds no place."""
+    hospital_id = router.release(case_id)
+    if hospital_id is not None:
+        _share_counters()
+    return hospital_id
+
+def _share_counters():
+    counters = {"er_occupied": router.er_occupied, "icu_occupied": router.icu_occupied, "assigned": router.assigned}
+    shared_state.store.put(COUNTERS_KEY, counters)
+    shared_state.store.publish("diversion", "counters", counters)
+
+def _changed_elsewhere(key: str, data: dict):
+    global router
+    if key == "network":
+        router = DiversionRouter([NetworkHospital(**h) for h in data["hospitals"]], data["max_hsi"])
+    elif router is not None:
+        router.set_counters(data["er_occupied"], data["icu_occupied"], data.get("assigned"))
+
+def load():
+    """Picks up the network other workers have loaded and routed against (at startup)."""
+    network = shared_state.store.get(NETWORK_KEY)
+    if network is not None:
+        _changed_elsewhere("network", network)
+        counters = shared_state.store.get(COUNTERS_KEY)
+        if counters is not None:
+            _changed_elsewhere("counters", counters)
+
+shared_state.store.subscribe("diversion", _changed_elsewhere)
@@ -1,101 +1,245 @@
+from bisect import bisect_right
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+
+import scoring_spec
 from models import PatientData, PatientAnalysisResult, HospitalData, HospitalAnalysisResult
 
-def bounded_poly_deviation(x: float, n_min: float, n_max: float, c_min: float, c_max: float) -> float:
-    if n_min <= x <= n_max:
-        return 0.0
-    elif x > n_max:
-        return min(1.0, ((x - n_max) / (c_max - n_max)) ** 2)
-    else:  # x < n_min
-        return min(1.0, ((n_min - x) / (n_min - c_min)) ** 2)
+# HSI weights: ICU pressure, ventilator pressure, ER load, bed pressure, operating load
+HSI_WEIGHTS = (0.35, 0.25, 0.20, 0.10, 0.10)
+ER_DIVERT_THRESHOLD = 0.90
+OXYGEN_CRISIS_LEVEL = 40
+# Forecast horizon (hours to crisis) at which the oxygen alert is raised ahead of the level
+OXYGEN_PREEMPT_HOURS = 12
 
 def calculate_bp_map(systolic: float, diastolic: float) -> float:
     return (systolic + 2 * diastolic) / 3.0
 
+class PatientRisk:
+    """
+    Internal patient result: a slotted record built without validation, for the scorer, risk
+    cache, process pool and census. to_model() makes the PatientAnalysisResult at the API boundary.
+    """
+    __slots__ = tuple(PatientAnalysisResult.model_fields)
+
+    def __init__(self, patient_id: str, base_score: float, final_risk_score: float, severity_class: str,
+                 diet_recommendation: str, target_room_temperature: float):
+        self.patient_id = patient_id
+        self.base_score = base_score
+        self.final_risk_score = final_risk_score
+        self.severity_class = severity_class
+        self.diet_recommendation = diet_recommendation
+        self.target_room_temperature = target_room_temperature
+
+    def _values(self) -> tuple:
+        return (self.patient_id, self.base_score, self.final_risk_score, self.severity_class,
+                self.diet_recommendation, self.target_room_temperature)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PatientRisk) and self._values() == other._values()
+
+    def __repr__(self) -> str:
+        return "PatientRisk(" + ", ".join(f"{name}={value!r}" for name, value in zip(self.__slots__, self._values())) + ")"
+
+    def with_patient_id(self, patient_id: str) -> "PatientRisk":
+        return PatientRisk(patient_id, *self._values()[1:])
+
+    def as_dict(self) -> dict:
+        return dict(zip(self.__slots__, self._values()))
+
+    def to_model(self) -> PatientAnalysisResult:
+        # The validating constructor runs in pydantic-core and beats model_construct's Python path
+        return PatientAnalysisResult(
+            patient_id=self.patient_id, base_score=self.base_score, final_risk_score=self.final_risk_score,
+            severity_class=self.severity_class, diet_recommendation=self.diet_recommendation,
+            target_room_temperature=self.target_room_temperature
+        )
+
 def calculate_patient_risk(patient: PatientData, is_oxygen_crisis: bool = False) -> PatientAnalysisResult:
-    # 1. Component Indexes
-    i_hr = bounded_poly_deviation(patient.heart_rate_bpm, 60, 100, 30, 180)
-    
+    return score_patient(patient, is_oxygen_crisis).to_model()
+
+def score_patient(patient: PatientData, is_oxygen_crisis: bool = False) -> PatientRisk:
+    spec = scoring_spec.current()
+    fields = patient.__dict__
     map_bp = calculate_bp_map(patient.systolic_bp_mmHg, patient.diastolic_bp_mmHg)
-    i_bp = bounded_poly_deviation(map_bp, 70, 93, 50, 130)
-    
-    # Asymmetric SpO2
-    i_spo2 = 0.0 if patient.oxygen_saturation_percent >= 95 else min(1.0, ((95 - patient.oxygen_saturation_percent) / (95 - 85)) ** 2)
-    
-    i_fever = bounded_poly_deviation(patient.body_temperature_celsius, 36.5, 37.3, 32.0, 41.0)
-    i_respi = bounded_poly_deviation(patient.respiratory_rate_bpm, 12, 18, 6, 40)
-    i_sugar = bounded_poly_deviation(patient.blood_sugar_mg_dl, 100, 180, 50, 400)
-    
-    # Age factor
-    i_age = 0.0 if patient.age <= 50 else min(1.0, ((patient.age - 50) / (100 - 50)) ** 2)
-    
-    i_bmi = bounded_poly_deviation(patient.bmi, 18.5, 24.9, 12.0, 45.0)
-    
-    if patient.gender.lower() == 'male':
-        i_hgb = bounded_poly_deviation(patient.hemoglobin_g_dl, 13.2, 16.6, 7.0, 20.0)
-    else:
-        i_hgb = bounded_poly_deviation(patient.hemoglobin_g_dl, 11.6, 15.0, 7.0, 20.0)
-        
-    i_hydr = 0.0 if patient.hydration_level_percent >= 95 else min(1.0, ((95 - patient.hydration_level_percent) / (95 - 50)) ** 2)
+
+    # 1. Component Indexes (table lookup for integer inputs, else bounded deviations with precomputed reciprocals)
+    rows = spec.rows_male if patient.gender.lower() == 'male' else spec.rows_other
+    sum_w_i = 0.0
+    for name, n_min, n_max, inv_lo, inv_hi, weight, is_map, lut in rows:
+        x = map_bp if is_map else fields[name]
+        if lut is not None:
+            w_i = lut.get(x)
+            if w_i is not None:
+                sum_w_i += w_i
+                continue
+        if x > n_max:
+            d = (x - n_max) * inv_hi
+        elif x < n_min:
+            d = (n_min - x) * inv_lo
+        else:
+            continue
+        sum_w_i += weight * min(1.0, d * d)
 
     # 2. Base Score Calculation
-    weights = [0.1, 0.1, 0.15, 0.1, 0.15, 0.05, 0.1, 0.05, 0.1, 0.1] # Sum = 1.0
-    indexes = [i_hr, i_bp, i_spo2, i_fever, i_respi, i_sugar, i_age, i_bmi, i_hgb, i_hydr]
-    
-    sum_w_i = sum(w * i for w, i in zip(weights, indexes))
     base_score = sum_w_i * 100.0
-    
+
     # 3. Modifiers
-    score_1 = base_score * 1.15 if patient.chronic_disease_flag == 1 else base_score
-    score_2 = score_1 + 15.0 if patient.emergency_case_flag == 1 else score_1
-    score_3 = min(100.0, score_2)
-    
+    score_1 = base_score * spec.chronic_multiplier if patient.chronic_disease_flag == 1 else base_score
+    score_2 = score_1 + spec.emergency_bonus if patient.emergency_case_flag == 1 else score_1
+    score_3 = min(spec.score_cap, score_2)
+
     if patient.icu_required_flag == 1:
-        final_risk_score = max(score_3, 75.0)
+        final_risk_score = max(score_3, spec.icu_floor)
     else:
         final_risk_score = score_3
-        
+
     # 4. Severity Classification
-    if final_risk_score < 20:
-        severity = "Normal"
-    elif final_risk_score < 50:
-        severity = "Watch"
-    elif final_risk_score < 75:
-        severity = "Severe"
-    else:
-        severity = "Critical"
-        
+    severity_idx = bisect_right(spec.severity_thresholds, final_risk_score)
+
     # --- Oxygen Scarcity Risk Amplifier ---
-    if is_oxygen_crisis and (severity == "Critical" or patient.icu_required_flag == 1):
-        final_risk_score = min(100.0, final_risk_score * 1.25)
+    if is_oxygen_crisis and (severity_idx == spec.critical_index or patient.icu_required_flag == 1):
+        final_risk_score = min(spec.score_cap, final_risk_score * spec.oxygen_crisis_amplifier)
         # Re-evaluate severity in case it jumped from 74->92
-        if final_risk_score >= 75:
-            severity = "Critical"
-        
+        if final_risk_score >= spec.critical_threshold:
+            severity_idx = spec.critical_index
+
     # 5. Room Temperature Recommendation
-    target_temp = 22.0 # default baseline room temp
-    if patient.body_temperature_celsius > 39.0:
-        target_temp -= 2.0
-        
-    # 6. Diet Recommendation Engine
-    if patient.blood_sugar_mg_dl > 200:
-        diet = "Diabetic strict control, low carb"
-    elif map_bp > 110:
-        diet = "Low sodium (DASH diet)"
-    elif patient.bmi > 30:
-        diet = "Caloric restriction"
+    if patient.body_temperature_celsius > spec.room_fever_threshold:
+        target_temp = spec.room_fever_temperature
     else:
-        diet = "Standard nutritional diet"
-
-    return PatientAnalysisResult(
-        patient_id=patient.patient_id,
-        base_score=round(base_score, 2),
-        final_risk_score=round(final_risk_score, 2),
-        severity_class=severity,
-        diet_recommendation=diet,
-        target_room_temperature=target_temp
+        target_temp = spec.room_baseline
+
+    # 6. Diet Recommendation Engine
+    diet = spec.diet_default
+    for name, above, label in spec.diet_rules:
+        if (map_bp if name == scoring_spec.MAP_INPUT else fields[name]) > above:
+            diet = label
+            break
+
+    return PatientRisk(
+        patient.patient_id,
+        round(base_score, 2),
+        round(final_risk_score, 2),
+        spec.severity_labels[severity_idx],
+        diet,
+        target_temp
+    )
+
+def calculate_patient_risk_batch(columns: Mapping[str, np.ndarray], is_oxygen_crisis: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Column-at-a-time twin of calculate_patient_risk. Takes one array per PatientData
+    field and returns one array per PatientAnalysisResult field.
+    """
+    spec = scoring_spec.current()
+
+    def num(name):
+        return np.asarray(columns[name], dtype=np.float64)
+
+    systolic, diastolic = num("systolic_bp_mmHg"), num("diastolic_bp_mmHg")
+    map_bp = calculate_bp_map(systolic, diastolic)
+    inputs = {scoring_spec.MAP_INPUT: map_bp}
+    # Folded MAP table key: one integer per reachable MAP value
+    lut_keys = {scoring_spec.MAP_INPUT: systolic + 2 * diastolic}
+
+    # 1. Component Indexes; gender picks row 0 (male) or row 1 (other) of the coefficients and tables
+    gender_row = (np.char.lower(np.asarray(columns["gender"], dtype=str)) != "male").astype(np.intp)
+    sum_w_i = np.zeros(len(map_bp))
+    for k, name in enumerate(spec.inputs):
+        x = inputs[name] if name in inputs else num(name)
+        if spec.luts[k] is None:
+            sum_w_i += component_batch(spec, k, x, gender_row)
+            continue
+        sum_w_i += component_lut_batch(spec, k, lut_keys.get(name, x), x, gender_row)
+
+    # 2. Base Score Calculation
+    base_score = sum_w_i * 100.0
+
+    # 3. Modifiers
+    score_1 = np.where(num("chronic_disease_flag") == 1, base_score * spec.chronic_multiplier, base_score)
+    score_2 = np.where(num("emergency_case_flag") == 1, score_1 + spec.emergency_bonus, score_1)
+    score_3 = np.minimum(spec.score_cap, score_2)
+
+    icu_required = num("icu_required_flag") == 1
+    final_risk_score = np.where(icu_required, np.maximum(score_3, spec.icu_floor), score_3)
+
+    # 4. Severity Classification
+    severity_idx = np.searchsorted(spec.severity_thresholds, final_risk_score, side="right")
+
+    # --- Oxygen Scarcity Risk Amplifier ---
+    if is_oxygen_crisis:
+        amplify = (severity_idx == spec.critical_index) | icu_required
+        final_risk_score = np.where(amplify, np.minimum(spec.score_cap, final_risk_score * spec.oxygen_crisis_amplifier), final_risk_score)
+        severity_idx = np.where(amplify & (final_risk_score >= spec.critical_threshold), spec.critical_index, severity_idx)
+
+    # 5. Room Temperature Recommendation
+    target_temp = np.where(num("body_temperature_celsius") > spec.room_fever_threshold, spec.room_fever_temperature, spec.room_baseline)
+
+    # 6. Diet Recommendation Engine
+    diet_idx = np.select(
+        [(inputs[name] if name in inputs else num(name)) > above for name, above, _ in spec.diet_rules],
+        list(range(len(spec.diet_rules))),
+        default=len(spec.diet_rules)
+    )
+
+    return {
+        "patient_id": np.asarray(columns["patient_id"], dtype=object),
+        "base_score": round_scores(base_score),
+        "final_risk_score": round_scores(final_risk_score),
+        "severity_class": spec.severity_label_array[severity_idx],
+        "diet_recommendation": spec.diet_label_array[diet_idx],
+        "target_room_temperature": target_temp,
+    }
+
+def round_scores(values: np.ndarray) -> np.ndarray:
+    """
+    Python's round(x, 2), as the scalar path uses, over an array. np.round rounds x * 100, which
+    can land on the wrong side of a .5 tie; only those near-ties are re-rounded one by one.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100.0
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if len(near_tie):
+        rounded[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return rounded
+
+def component_batch(spec: scoring_spec.CompiledSpec, k: int, x: np.ndarray, gender_row: np.ndarray) -> np.ndarray:
+    """Weighted index of component k, closed form."""
+    return scoring_spec.component_contribution(
+        x, spec.n_min[gender_row, k], spec.n_max[gender_row, k], spec.inv_lo[gender_row, k],
+        spec.inv_hi[gender_row, k], spec.weights[gender_row, k]
+    )
+
+def component_lut_batch(spec: scoring_spec.CompiledSpec, k: int, key: np.ndarray, x: np.ndarray, gender_row: np.ndarray) -> np.ndarray:
+    """Weighted index of component k gathered from its lookup table by integer key (x itself, or systolic + 2 * diastolic for MAP)."""
+    lut = spec.luts[k]
+    with np.errstate(invalid="ignore"):
+        idx = key.astype(np.intp)
+    hit = (idx == key) & (idx >= 0) & (idx < lut.shape[1])
+    idx = np.where(hit, idx, 0)
+    # Gender-neutral components gather from a single row
+    contribution = lut[0].take(idx) if spec.lut_gender_neutral[k] else lut[gender_row, idx]
+    # Off-table values (fractional, negative, beyond the span) take the closed form
+    miss = np.flatnonzero(~hit)
+    if len(miss):
+        contribution[miss] = component_batch(spec, k, x[miss], gender_row[miss])
+    return contribution
+
+def stress_index(r_bed, r_icu, r_er, r_op, r_vent):
+    """HSI from the five ratios; floats, or numpy arrays element-wise (simulation runs, hospital fleets)."""
+    alpha, beta, gamma, delta, epsilon = HSI_WEIGHTS
+    vent_load = np.minimum(1.0, r_vent) if isinstance(r_vent, np.ndarray) else min(1.0, r_vent)
+    return (
+        alpha * (1 - r_icu) +
+        beta * vent_load +
+        gamma * r_er +
+        delta * (1 - r_bed) +
+        epsilon * r_op
     )
 
-def calculate_hospital_stress(hospital: HospitalData, critical_patients_count: int = 0) -> HospitalAnalysisResult:
+def calculate_hospital_stress(hospital: HospitalData, critical_patients_count: int = 0,
+                              oxygen_hours_to_crisis: Optional[float] = None) -> HospitalAnalysisResult:
     # 1. Ratios
     r_bed = (hospital.total_beds - hospital.occupied_beds) / max(1, hospital.total_beds)
     r_icu = (hospital.icu_beds_total - hospital.icu_beds_occupied) / max(1, hospital.icu_beds_total)
@@ -105,16 +249,14 @@ def calculate_hospital_stress(hospital: HospitalData, critical_patients_count: i
     r_vent = hospital.icu_beds_occupied / max(1, hospital.ventilators_available)
     
     # 2. HSI Formula
-    alpha, beta, gamma, delta, epsilon = 0.35, 0.25, 0.20, 0.10, 0.10
-    
-    hsi = (
-        alpha * (1 - r_icu) +
-        beta * min(1.0, r_vent) +
-        gamma * r_er +
-        delta * (1 - r_bed) +
-        epsilon * r_op
-    )
-    
+    hsi = stress_index(r_bed, r_icu, r_er, r_op, r_vent)
+    return stress_result(hospital, (r_bed, r_icu, r_er, r_op, r_vent), hsi, critical_patients_count, oxygen_hours_to_crisis)
+
+def stress_result(hospital: HospitalData, ratios: tuple, hsi: float, critical_patients_count: int = 0,
+                  oxygen_hours_to_crisis: Optional[float] = None) -> HospitalAnalysisResult:
+    """Classification and actions for ratios/HSI computed elsewhere (full snapshot or incremental state)."""
+    r_bed, r_icu, r_er, r_op, r_vent = ratios
+
     # 3. Global System Classification & Routing Actions
     if hsi < 0.4:
         sys_class = "Normal Operations"
@@ -130,14 +272,16 @@ def calculate_hospital_stress(hospital: HospitalData, critical_patients_count: i
         bed_action = "Stop New Admissions"
         
     er_action = "Accepting Triage"
-    if r_er > 0.90:
+    if r_er > ER_DIVERT_THRESHOLD:
         er_action = "Divert Ambulances"
         
     # --- Ventilator Action Logic (Oxygen Scarcity / Top-K) ---
-    if hospital.oxygen_supply_level_percent < 40:
+    if hospital.oxygen_supply_level_percent < OXYGEN_CRISIS_LEVEL:
         bed_action = "OXYGEN CRISIS ALERT | " + bed_action
         if hospital.ventilators_available < critical_patients_count:
             er_action = "VENTILATOR SHORTAGE - Triage Sort Top-K Only | " + er_action
+    elif oxygen_hours_to_crisis is not None and oxygen_hours_to_crisis <= OXYGEN_PREEMPT_HOURS:
+        bed_action = f"OXYGEN CRISIS FORECAST ({oxygen_hours_to_crisis:.1f}h) - Expedite Resupply | " + bed_action
         
     if hospital.icu_beds_total - hospital.icu_beds_occupied <= 0:
         bed_action += " | Trigger high-priority facility transfer alert"
@@ -152,5 +296,6 @@ def calculate_hospital_stress(hospital: HospitalData, critical_patients_count: i
         hospital_stress_index=round(hsi, 3),
         global_system_classification=sys_class,
         bed_allocation_action=bed_action,
-        er_routing_action=er_action
+        er_routing_action=er_action,
+        oxygen_hours_to_crisis=oxygen_hours_to_crisis
     )
@@ -0,0 +1,240 @@
+"""
+ER waiting-room priority queues, one per hospital.
+
+Each queue is an indexed binary heap: the heap array holds (priority, patient_id) pairs and a
+position map follows every sift, so insert, pop, re-prioritize on re-score and removal of a
+specific patient are all O(log n), and peeking at the next patient is O(1).
+
+Priority: higher final_risk_score first, then emergency cases, then earlier arrival.
+
+Waiting patients are part of the ER load: when the hospital has server-owned state
+(hospital_state), joining the queue is an er_arrival event and leaving it an er_departure
+(plus a bed or ICU admission when the patient is moved on), so the er_routing_action reported
+with every queue decision is the one calculate_hospital_stress gives for the current ER load.
+
+Every waiting patient is also kept in shared_state (kv "er_queue:<hospital>:<patient>", with a
+shared arrival sequence) and each change is published on the change feed, so all workers hold
+the same queues; the caller holds the "hospitals" lock.
+"""
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Tuple
+
+from hospital_state import HospitalRegistry, registry as hospital_registry
+from models import ERQueueEntry, HospitalEvent
+import shared_state
+
+# Where a popped patient goes, as hospital_state events on top of leaving the ER
+ADMIT_EVENTS = {None: [], "ward": ["bed_occupied"], "icu": ["icu_admit"]}
+
+class IndexedHeap:
+    """Min-heap of (key, item) with an item -> position index."""
+
+    def __init__(self):
+        self.heap: List[Tuple[tuple, str]] = []
+        self.position: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.position
+
+    def _swap(self, i: int, j: int):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.position[heap[i][1]] = i
+        self.position[heap[j][1]] = j
+
+    def _sift_up(self, i: int):
+        heap = self.heap
+        while i > 0:
+            parent = (i - 1) >> 1
+            if heap[i][0] >= heap[parent][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        heap, n = self.heap, len(self.heap)
+        while True:
+            smallest, left = i, 2 * i + 1
+            if left < n and heap[left][0] < heap[smallest][0]:
+                smallest = left
+            if left + 1 < n and heap[left + 1][0] < heap[smallest][0]:
+                smallest = left + 1
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def push(self, key: tuple, item: str):
+        self.heap.append((key, item))
+        self.position[item] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def peek(self) -> Optional[Tuple[tuple, str]]:
+        return self.heap[0] if self.heap else None
+
+    def remove(self, item: str) -> tuple:
+        """Removes an item anywhere in the heap; returns its key."""
+        i = self.position.pop(item)
+        key = self.heap[i][0]
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.position[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self.position[last[1]])
+        return key
+
+    def pop(self) -> Tuple[tuple, str]:
+        top = self.heap[0]
+        self.remove(top[1])
+        return top
+
+    def update(self, key: tuple, item: str):
+        i = self.position[item]
+        old = self.heap[i][0]
+        self.heap[i] = (key, item)
+        if key < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+class ERQueue:
+    def __init__(self, hospital_id: int):
+        self.hospital_id = hospital_id
+        self.heap = IndexedHeap()
+        self.entries: Dict[str, ERQueueEntry] = {}
+        self._sequence = itertools.count()
+        self.seq: Dict[str, int] = {}
+
+    def _key(self, entry: ERQueueEntry) -> tuple:
+        return (-entry.final_risk_score, -entry.emergency_case_flag, entry.arrival_time, self.seq[entry.patient_id])
+
+    def push(self, entry: ERQueueEntry, seq: Optional[int] = None):
+        """seq breaks ties between equal keys (defaults to this queue's own arrival order)."""
+        self.seq[entry.patient_id] = next(self._sequence) if seq is None else seq
+        self.entries[entry.patient_id] = entry
+        self.heap.push(self._key(entry), entry.patient_id)
+
+    def rescore(self, patient_id: str, final_risk_score: float, severity_class: str):
+        entry = self.entries[patient_id].model_copy(update={"final_risk_score": final_risk_score, "severity_class": severity_class})
+        self.entries[patient_id] = entry
+        self.heap.update(self._key(entry), patient_id)
+
+    def peek(self) -> Optional[ERQueueEntry]:
+        top = self.heap.peek()
+        return None if top is None else self.entries[top[1]]
+
+    def remove(self, patient_id: str) -> ERQueueEntry:
+        self.heap.remove(patient_id)
+        del self.seq[patient_id]
+        return self.entries.pop(patient_id)
+
+    def top(self, limit: int) -> List[ERQueueEntry]:
+        """The next `limit` patients in order, without disturbing the queue (O(n log limit))."""
+        return [self.entries[item] for _, item in heapq.nsmallest(limit, self.heap.heap)]
+
+KEY_PREFIX = "er_queue:"
+
+class ERQueueRegistry:
+    def __init__(self, hospitals: HospitalRegistry = hospital_registry, store: shared_state.SharedState = shared_state.store):
+        self.queues: Dict[int, ERQueue] = {}
+        # patient_id -> hospital whose queue holds them, for re-scores arriving from elsewhere
+        self.waiting_at: Dict[str, int] = {}
+        self.hospitals = hospitals
+        self.store = store
+        store.subscribe("er_queue", self._changed_elsewhere)
+
+    def load(self):
+        """Picks up the queues other workers have saved (at startup), in arrival order."""
+        for key, data in sorted(self.store.items(KEY_PREFIX), key=lambda item: item[1]["seq"]):
+            self._changed_elsewhere(key[len(KEY_PREFIX):], data)
+
+    def _save(self, hospital_id: int, patient_id: str, entry: Optional[ERQueueEntry]):
+        key = f"{hospital_id}:{patient_id}"
+        data = None if entry is None else {"entry": entry.model_dump(), "seq": self.queues[hospital_id].seq[patient_id]}
+        if data is None:
+            self.store.delete(KEY_PREFIX + key)
+        else:
+            self.store.put(KEY_PREFIX + key, data)
+        self.store.publish("er_queue", key, data)
+
+    def _changed_elsewhere(self, key: str, data: Optional[dict]):
+        hospital_id, patient_id = key.split(":", 1)
+        hospital_id = int(hospital_id)
+        waiting = self.waiting_at.get(patient_id) == hospital_id
+        if data is None:
+            if waiting:
+                del self.waiting_at[patient_id]
+                self.queues[hospital_id].remove(patient_id)
+            return
+        entry = ERQueueEntry(**data["entry"])
+        if waiting:
+            self.queues[hospital_id].rescore(patient_id, entry.final_risk_score, entry.severity_class)
+        else:
+            self.queue(hospital_id).push(entry, data["seq"])
+            self.waiting_at[patient_id] = hospital_id
+
+    def queue(self, hospital_id: int) -> ERQueue:
+        queue = self.queues.get(hospital_id)
+        if queue is None:
+            queue = self.queues[hospital_id] = ERQueue(hospital_id)
+        return queue
+
+    def _hospital_events(self, hospital_id: int, types: List[str]):
+        if types and self.hospitals.get(hospital_id) is not None:
+            self.hospitals.apply(hospital_id, [HospitalEvent(type=t) for t in types])
+
+    def routing_action(self, hospital_id: int) -> Optional[str]:
+        state = self.hospitals.get(hospital_id)
+        return None if state is None else state.result().er_routing_action
+
+    def admit(self, hospital_id: int, entry: ERQueueEntry) -> ERQueueEntry:
+        """Raises ValueError if the patient is already waiting somewhere."""
+        if entry.patient_id in self.waiting_at:
+            raise ValueError(f"Patient {entry.patient_id} is already waiting at hospital {self.waiting_at[entry.patient_id]}")
+        if entry.arrival_time is None:
+            entry = entry.model_copy(update={"arrival_time": time.time()})
+        self._hospital_events(hospital_id, ["er_arrival"])
+        # Arrival order is shared, so equal keys break the same way on every worker
+        self.queue(hospital_id).push(entry, self.store.next_id("er_queue_seq"))
+        self.waiting_at[entry.patient_id] = hospital_id
+        self._save(hospital_id, entry.patient_id, entry)
+        return entry
+
+    def next_patient(self, hospital_id: int, admit_to: Optional[str] = None) -> Optional[ERQueueEntry]:
+        """Pops the highest-priority patient; hospital_state rejecting the move (e.g. ICU full) leaves the queue untouched."""
+        queue = self.queues.get(hospital_id)
+        entry = queue.peek() if queue is not None else None
+        if entry is None:
+            return None
+        self._hospital_events(hospital_id, ["er_departure"] + ADMIT_EVENTS[admit_to])
+        queue.remove(entry.patient_id)
+        del self.waiting_at[entry.patient_id]
+        self._save(hospital_id, entry.patient_id, None)
+        return entry
+
+    def leave(self, hospital_id: int, patient_id: str) -> Optional[ERQueueEntry]:
+        """Patient left without being seen."""
+        if self.waiting_at.get(patient_id) != hospital_id:
+            return None
+        self._hospital_events(hospital_id, ["er_departure"])
+        del self.waiting_at[patient_id]
+        entry = self.queues[hospital_id].remove(patient_id)
+        self._save(hospital_id, patient_id, None)
+        return entry
+
+    def rescore(self, patient_id: str, final_risk_score: float, severity_class: str, save: bool = True):
+        """save=False for re-scores every worker applies anyway (census changes from the change feed)."""
+        hospital_id = self.waiting_at.get(patient_id)
+        if hospital_id is not None:
+            queue = self.queues[hospital_id]
+            queue.rescore(patient_id, final_risk_score, severity_class)
+            if save:
+                self._save(hospital_id, patient_id, queue.entries[patient_id])
+
+registry = ERQueueRegistry()
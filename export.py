@@ -0,0 +1,90 @@
+"""
+Streaming CSV/XLSX writers for result exports.
+
+Rows arrive in chunks and leave as bytes after every chunk, so a download starts at once and an
+export holds one chunk in memory however many rows it has. XLSX goes through the shared
+streaming writer in xlsx.py, into a sink that cannot seek, so the zip is streamed too.
+"""
+import csv
+import io
+import os
+from typing import Iterable, Iterator, List, Sequence
+
+import xlsx
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 5000))
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FORMATS = {"csv": CSV_MEDIA_TYPE, "xlsx": XLSX_MEDIA_TYPE}
+
+def chunked(items: Iterable, size: int = EXPORT_CHUNK_ROWS) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def record_rows(columns: Sequence[str], record_chunks: Iterable[List[dict]]) -> Iterator[List[list]]:
+    for records in record_chunks:
+        yield [[record.get(column) for column in columns] for record in records]
+
+# --- CSV ---
+# Text a spreadsheet would read as a formula (OWASP CSV injection); XLSX cells are inline strings
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def iter_csv(header: Sequence[str], row_chunks: Iterable[List[list]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    for rows in row_chunks:
+        writer.writerows([[_csv_cell(value) for value in row] for row in rows])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+# --- XLSX ---
+class _Sink:
+    """Write-only byte buffer; having no seek() puts zipfile in streaming mode."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+def iter_xlsx(header: Sequence[str], row_chunks: Iterable[List[list]], sheet_name: str = "Results") -> Iterator[bytes]:
+    sink = _Sink()
+    workbook = xlsx.Workbook(sink, header, sheet_name)
+    yield sink.drain()
+    for rows in row_chunks:
+        workbook.write_rows(rows)
+        yield sink.drain()
+    workbook.close()
+    yield sink.drain()
+
+def stream(fmt: str, header: Sequence[str], row_chunks: Iterable[List[list]]) -> Iterator[bytes]:
+    """Raises KeyError for an unknown format (checked before the first byte is produced)."""
+    writer = {"csv": iter_csv, "xlsx": iter_xlsx}[fmt]
+    return writer(header, row_chunks)
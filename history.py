@@ -0,0 +1,365 @@
+"""
+Append-only, compressed time-travel history of hospital stress results and patient risk results.
+
+Each store (one per entity kind) is a pair of files:
+  <kind>.blocks  zlib-compressed blocks, appended only
+  <kind>.db      SQLite (WAL): the block index, one (start, end, offset, length) row per block in
+                 time order, and the open block's records, one row per append
+A block covers up to HISTORY_BLOCK_SECONDS and holds a keyframe (every entity's state at the
+block start) followed by deltas: time step in ms, entity, and only the fields that changed.
+Unchanged states are dropped when a block is built, so 5-second sampling of a quiet hospital
+costs one row until the block is sealed and nothing after.
+
+Every worker appends to the same store. The append that overflows the open block seals it
+inside a write transaction, so one worker at a time writes blocks, each starting from the state
+the previous one ended with. Queries read the index and the open rows in one read transaction,
+so all workers see the same history, and nothing is lost when a worker stops.
+
+A point-in-time query binary-searches the index and decodes one block; a range query decodes
+only the blocks overlapping the range.
+"""
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models import PatientAnalysisResult, HospitalAnalysisResult
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+BLOCK_SECONDS = float(os.getenv("HISTORY_BLOCK_SECONDS", 3600))
+# Seal early when this many deltas pile up, bounding memory and decode cost per block
+BLOCK_MAX_DELTAS = int(os.getenv("HISTORY_BLOCK_MAX_DELTAS", 10_000))
+BLOCK_CACHE_SIZE = int(os.getenv("HISTORY_BLOCK_CACHE_SIZE", 8))
+# Index file of the single-writer format, imported into <kind>.db on first open
+INDEX_ENTRY = struct.Struct("<ddQQ")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (seq INTEGER PRIMARY KEY, start REAL NOT NULL, end REAL NOT NULL,
+                                   offset INTEGER NOT NULL, length INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS open (id INTEGER PRIMARY KEY AUTOINCREMENT, t REAL NOT NULL, entity TEXT NOT NULL, state TEXT);
+"""
+
+PATIENT_FIELDS = tuple(f for f in PatientAnalysisResult.model_fields if f != "patient_id")
+HOSPITAL_FIELDS = tuple(f for f in HospitalAnalysisResult.model_fields if f != "hospital_id") + ("critical_patients_count",)
+
+def parse_time(value: str) -> float:
+    """Unix seconds or an ISO-8601 timestamp (naive means server local time)."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+class Block:
+    """Keyframe plus column lists of deltas (time, entity, [field index, value, ...] or None for a removal)."""
+
+    def __init__(self, start: float, keyframe: Dict[str, list]):
+        self.start = start
+        self.keyframe = keyframe
+        self.times: List[float] = []
+        self.entities: List[str] = []
+        self.changes: List[Optional[list]] = []
+
+    @property
+    def end(self) -> float:
+        return self.times[-1] if self.times else self.start
+
+    def encode(self, fields: Sequence[str]) -> bytes:
+        ms = [round(self.start * 1000)] + [round(t * 1000) for t in self.times]
+        payload = {
+            "start": self.start, "fields": list(fields), "keyframe": self.keyframe,
+            "steps": [b - a for a, b in zip(ms, ms[1:])], "entities": self.entities, "changes": self.changes,
+        }
+        return zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 6)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Block":
+        payload = json.loads(zlib.decompress(data))
+        block = cls(payload["start"], payload["keyframe"])
+        block.times = [ms / 1000 for ms in accumulate(payload["steps"], initial=round(block.start * 1000))][1:]
+        block.entities = payload["entities"]
+        block.changes = payload["changes"]
+        return block
+
+def _apply(states: Dict[str, list], entity: str, delta: Optional[list], width: int):
+    if delta is None:
+        states.pop(entity, None)
+        return
+    state = states.get(entity)
+    if state is None:
+        state = states[entity] = [None] * width
+    for i in range(0, len(delta), 2):
+        state[delta[i]] = delta[i + 1]
+
+class HistoryStore:
+    def __init__(self, kind: str, fields: Sequence[str], directory: str = HISTORY_DIR,
+                 block_seconds: float = BLOCK_SECONDS, max_deltas: int = BLOCK_MAX_DELTAS):
+        self.kind = kind
+        self.fields = tuple(fields)
+        self.block_seconds = block_seconds
+        self.max_deltas = max_deltas
+        self.directory = directory
+        self.blocks_path = os.path.join(directory, f"{kind}.blocks")
+        self.db_path = os.path.join(directory, f"{kind}.db")
+        self.index: List[Tuple[float, float, int, int]] = []
+        self.starts: List[float] = []
+        self.cache: "OrderedDict[int, Block]" = OrderedDict()
+        # Every entity's state at the end of the last sealed block: the next block's keyframe
+        self.sealed: Dict[str, list] = {}
+        # The open block as of the last read (rows up to open_id) and the states it ends with
+        self.open: Optional[Block] = None
+        self.open_id = 0
+        self.current: Dict[str, list] = {}
+        # (id, t) of the oldest open row, to notice when an append overflows the block
+        self._first: Optional[Tuple[int, float]] = None
+        self._local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        self._import_index_file()
+        self._read()
+
+    # --- PERSISTENCE ---
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread, opened (and the schema created) on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _import_index_file(self):
+        """Moves a <kind>.index written by the single-writer format into the database, sorted by start."""
+        index_path = os.path.join(self.directory, f"{self.kind}.index")
+        if not os.path.exists(index_path):
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have imported it while this one waited
+            if os.path.exists(index_path):
+                with open(index_path, "rb") as f:
+                    raw = f.read()
+                # A torn trailing entry (crash mid-append) is ignored
+                usable = len(raw) - len(raw) % INDEX_ENTRY.size
+                entries = sorted(INDEX_ENTRY.unpack_from(raw, i) for i in range(0, usable, INDEX_ENTRY.size))
+                if conn.execute("SELECT count(*) FROM blocks").fetchone()[0] == 0:
+                    conn.executemany("INSERT INTO blocks (start, end, offset, length) VALUES (?, ?, ?, ?)", entries)
+                os.replace(index_path, index_path + ".imported")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _sync(self, conn: sqlite3.Connection):
+        """Catches up with blocks sealed and rows appended since the last look; runs inside a transaction."""
+        sealed = conn.execute(
+            "SELECT start, end, offset, length FROM blocks WHERE seq > ? ORDER BY seq", (len(self.index),)
+        ).fetchall()
+        if sealed:
+            self.index.extend(sealed)
+            self.starts.extend(entry[0] for entry in sealed)
+            last = self._block(len(self.index) - 1)
+            self.sealed = self._replay(last, last.end)
+            self.open, self.open_id = None, 0
+        if self.open is None:
+            self.current = {entity: list(state) for entity, state in self.sealed.items()}
+        rows = conn.execute("SELECT id, t, entity, state FROM open WHERE id > ? ORDER BY id", (self.open_id,)).fetchall()
+        for row_id, t, entity, state in rows:
+            self.open = self._add(self.open, self.current, t, entity, state)
+            self.open_id = row_id
+
+    def _read(self):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            self._sync(conn)
+        finally:
+            conn.execute("COMMIT")
+
+    def _add(self, block: Optional[Block], states: Dict[str, list], t: float, entity: str, state: Optional[str]) -> Optional[Block]:
+        """Adds one open row to `block` (started on demand) as a delta against `states`; unchanged states are skipped."""
+        old = states.get(entity)
+        if state is None:
+            if old is None:
+                return block
+            delta = None
+        else:
+            new = json.loads(state)
+            if new == old:
+                return block
+            delta = [item for i, value in enumerate(new) if old is None or old[i] != value for item in (i, value)]
+        if block is None:
+            block = Block(max(t, self.index[-1][1]) if self.index else t, {e: list(s) for e, s in states.items()})
+        # Clock steps backwards are pinned to the last recorded time
+        block.times.append(max(t, block.end))
+        block.entities.append(entity)
+        block.changes.append(delta)
+        _apply(states, entity, delta, len(self.fields))
+        return block
+
+    def _seal(self, force: bool = False):
+        """Seals every open block that has overflowed (and the rest too if force), in one write transaction."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have sealed since this one last looked
+            self._sync(conn)
+            rows = conn.execute("SELECT id, t, entity, state FROM open ORDER BY id").fetchall()
+            while rows:
+                end = rows[0][1] + self.block_seconds
+                cut = next((k for k, row in enumerate(rows) if k >= self.max_deltas or row[1] >= end), None)
+                if cut is None:
+                    if not force:
+                        break
+                    cut = len(rows)
+                self._write_block(conn, rows[:cut])
+                rows = rows[cut:]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._first = None
+
+    def _write_block(self, conn: sqlite3.Connection, rows: list):
+        states = {entity: list(state) for entity, state in self.sealed.items()}
+        block = None
+        for _, t, entity, state in rows:
+            block = self._add(block, states, t, entity, state)
+        if block is not None:
+            data = block.encode(self.fields)
+            with open(self.blocks_path, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+            entry = (block.start, block.end, offset, len(data))
+            conn.execute("INSERT INTO blocks (start, end, offset, length) VALUES (?, ?, ?, ?)", entry)
+            self.index.append(entry)
+            self.starts.append(block.start)
+            self.sealed = states
+        conn.execute("DELETE FROM open WHERE id <= ?", (rows[-1][0],))
+        self.open, self.open_id = None, 0
+
+    def flush(self):
+        """Seals the open block (open rows are already durable, so this is optional)."""
+        self._seal(force=True)
+
+    def _block(self, i: int) -> Block:
+        block = self.cache.get(i)
+        if block is not None:
+            self.cache.move_to_end(i)
+            return block
+        _, _, offset, length = self.index[i]
+        with open(self.blocks_path, "rb") as f:
+            f.seek(offset)
+            block = Block.decode(f.read(length))
+        self.cache[i] = block
+        if len(self.cache) > BLOCK_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return block
+
+    # --- APPEND ---
+    def append(self, entity, record: Optional[dict], timestamp: Optional[float] = None):
+        """Records an entity's state (None = removed)."""
+        # Millisecond resolution, same as sealed blocks
+        t = round((time.time() if timestamp is None else timestamp) * 1000) / 1000
+        state = None if record is None else json.dumps([record.get(field) for field in self.fields], separators=(",", ":"))
+        conn = self._conn()
+        row_id = conn.execute("INSERT INTO open (t, entity, state) VALUES (?, ?, ?)", (t, str(entity), state)).lastrowid
+        if self._first is None:
+            self._first = conn.execute("SELECT id, t FROM open ORDER BY id LIMIT 1").fetchone()
+        first_id, first_t = self._first
+        if row_id - first_id >= self.max_deltas or t >= first_t + self.block_seconds:
+            self._seal()
+
+    # --- QUERIES ---
+    def _block_at(self, t: float) -> Optional[Block]:
+        """The block whose span covers t, or the last block before it."""
+        if self.open is not None and self.open.start <= t:
+            return self.open
+        i = bisect_right(self.starts, t) - 1
+        return self._block(i) if i >= 0 else None
+
+    def _replay(self, block: Block, t: float) -> Dict[str, list]:
+        states = {entity: list(state) for entity, state in block.keyframe.items()}
+        n = bisect_right(block.times, t)
+        for entity, delta in zip(block.entities[:n], block.changes[:n]):
+            _apply(states, entity, delta, len(self.fields))
+        return states
+
+    def _entity_changes(self, block: Block, entity: str, lo: int, hi: int):
+        """(time, delta) of one entity among deltas lo..hi-1."""
+        return [(block.times[i], block.changes[i]) for i in range(lo, hi) if block.entities[i] == entity]
+
+    def states_at(self, t: float) -> Dict[str, dict]:
+        """Every entity's state at time t (one block decoded)."""
+        self._read()
+        block = self._block_at(t)
+        if block is None:
+            return {}
+        return {entity: dict(zip(self.fields, state)) for entity, state in self._replay(block, t).items()}
+
+    def _state_at(self, entity: str, t: float) -> Optional[list]:
+        block = self._block_at(t)
+        if block is None:
+            return None
+        state = block.keyframe.get(entity)
+        state = {entity: list(state)} if state is not None else {}
+        for _, delta in self._entity_changes(block, entity, 0, bisect_right(block.times, t)):
+            _apply(state, entity, delta, len(self.fields))
+        return state.get(entity)
+
+    def at(self, entity, t: float) -> Optional[dict]:
+        self._read()
+        state = self._state_at(str(entity), t)
+        return None if state is None else dict(zip(self.fields, state))
+
+    def range(self, entity, start: float, end: float, limit: int = 10_000) -> List[dict]:
+        """The state at `start` followed by every change of one entity up to `end`."""
+        entity = str(entity)
+        self._read()
+        state = self._state_at(entity, start)
+        points = [{"timestamp": start, "state": None if state is None else dict(zip(self.fields, state))}]
+
+        first = max(0, bisect_right(self.starts, start) - 1)
+        blocks = [self._block(i) for i in range(first, bisect_right(self.starts, end))]
+        if self.open is not None and self.open.start <= end:
+            blocks.append(self.open)
+        current = {entity: state} if state is not None else {}
+        for block in blocks:
+            lo, hi = bisect_right(block.times, start), bisect_right(block.times, end)
+            for t, delta in self._entity_changes(block, entity, lo, hi):
+                if len(points) >= limit:
+                    return points
+                _apply(current, entity, delta, len(self.fields))
+                state = current.get(entity)
+                points.append({"timestamp": t, "state": None if state is None else dict(zip(self.fields, state))})
+        return points
+
+    def stats(self) -> dict:
+        self._read()
+        size = os.path.getsize(self.blocks_path) if os.path.exists(self.blocks_path) else 0
+        return {
+            "blocks": len(self.index),
+            "bytes_on_disk": size,
+            "first": self.index[0][0] if self.index else (self.open.start if self.open else None),
+            "open_block_deltas": len(self.open.times) if self.open else 0,
+            "entities": len(self.current),
+        }
+
+patients: Optional[HistoryStore] = None
+hospitals: Optional[HistoryStore] = None
+
+def init():
+    """Opens the stores; called from the app lifespan, so importing this module touches no files."""
+    global patients, hospitals
+    if patients is None:
+        patients = HistoryStore("patients", PATIENT_FIELDS)
+        hospitals = HistoryStore("hospitals", HOSPITAL_FIELDS)
@@ -0,0 +1,239 @@
+"""
+Server-owned hospital state driven by small events instead of full HospitalData snapshots.
+
+A hospital is seeded once from a snapshot; afterwards each event moves one counter, and only
+the HSI terms that read that counter are recomputed (HSI is the sum of the five cached terms,
+in the same order as engine.stress_index, so it matches a full recomputation exactly).
+The stress result is rebuilt lazily on read and cached until the next change.
+
+Every change is saved to shared_state (kv "hospital_state:<id>") and published on the change
+feed, so all workers serve the same state; the caller holds the "hospitals" lock.
+"""
+import time
+from typing import Dict, List, Optional
+
+from engine import HSI_WEIGHTS, stress_result
+from models import HospitalData, HospitalAnalysisResult, HospitalEvent, OxygenReading
+from oxygen_forecast import forecaster as oxygen_forecaster
+from pubsub import broadcaster
+import history
+import shared_state
+
+# event type -> (counter, direction)
+EVENT_COUNTERS = {
+    "bed_occupied": ("occupied_beds", 1),
+    "bed_freed": ("occupied_beds", -1),
+    "icu_admit": ("icu_beds_occupied", 1),
+    "icu_discharge": ("icu_beds_occupied", -1),
+    "er_arrival": ("er_occupied", 1),
+    "er_departure": ("er_occupied", -1),
+    "ventilator_in_use": ("ventilators_in_use", 1),
+    "ventilator_released": ("ventilators_in_use", -1),
+    "operation_started": ("ongoing_operations_count", 1),
+    "operation_finished": ("ongoing_operations_count", -1),
+    "doctor_on_shift": ("available_doctors", 1),
+    "doctor_off_shift": ("available_doctors", -1),
+    "patient_critical": ("critical_patients_count", 1),
+    "patient_stabilized": ("critical_patients_count", -1),
+}
+OXYGEN_EVENT = "oxygen_reading"
+EVENT_TYPES = tuple(EVENT_COUNTERS) + (OXYGEN_EVENT,)
+# Counters that may not exceed a capacity field
+UPPER_BOUNDS = {"occupied_beds": "total_beds", "icu_beds_occupied": "icu_beds_total"}
+
+# HSI term slots, in engine.stress_index order: ICU, ventilator, ER, bed, operating load
+ICU, VENT, ER, BED, OP = range(5)
+TERMS_BY_COUNTER = {
+    "occupied_beds": (BED,),
+    "icu_beds_occupied": (ICU, VENT),
+    "er_occupied": (ER,),
+    "ventilators_available": (VENT,),
+    "ongoing_operations_count": (OP,),
+    "available_doctors": (OP,),
+}
+
+class HospitalState:
+    def __init__(self, snapshot: HospitalData, ventilators_in_use: int = 0, critical_patients_count: int = 0):
+        self.hospital = snapshot.model_copy()
+        self.ventilators_in_use = ventilators_in_use
+        self.critical_patients_count = critical_patients_count
+        self.events_applied = 0
+        self.ratios = [0.0] * 5  # r_bed, r_icu, r_er, r_op, r_vent as engine.stress_result expects
+        self.terms = [0.0] * 5
+        for term in range(5):
+            self._update_term(term)
+        self.hsi = sum(self.terms)
+        self._result: Optional[HospitalAnalysisResult] = None
+        self._result_hours: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {"hospital": self.hospital.model_dump(), "ventilators_in_use": self.ventilators_in_use,
+                "critical_patients_count": self.critical_patients_count, "events_applied": self.events_applied}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HospitalState":
+        # The HSI terms are a function of the counters, so they are rebuilt rather than stored
+        state = cls(HospitalData(**data["hospital"]), data["ventilators_in_use"], data["critical_patients_count"])
+        state.events_applied = data["events_applied"]
+        return state
+
+    # --- INCREMENTAL HSI ---
+    def _update_term(self, term: int):
+        h = self.hospital
+        alpha, beta, gamma, delta, epsilon = HSI_WEIGHTS
+        if term == ICU:
+            r_icu = (h.icu_beds_total - h.icu_beds_occupied) / max(1, h.icu_beds_total)
+            self.ratios[1] = r_icu
+            self.terms[ICU] = alpha * (1 - r_icu)
+        elif term == VENT:
+            r_vent = h.icu_beds_occupied / max(1, h.ventilators_available)
+            self.ratios[4] = r_vent
+            self.terms[VENT] = beta * min(1.0, r_vent)
+        elif term == ER:
+            r_er = h.er_occupied / max(1, h.er_capacity)
+            self.ratios[2] = r_er
+            self.terms[ER] = gamma * r_er
+        elif term == BED:
+            r_bed = (h.total_beds - h.occupied_beds) / max(1, h.total_beds)
+            self.ratios[0] = r_bed
+            self.terms[BED] = delta * (1 - r_bed)
+        else:
+            r_op = h.ongoing_operations_count / max(1, h.available_doctors)
+            self.ratios[3] = r_op
+            self.terms[OP] = epsilon * r_op
+
+    def _move(self, counter: str, amount: int):
+        if counter == "ventilators_in_use":
+            # A ventilator in use is one fewer available
+            self.ventilators_in_use += amount
+            counter, amount = "ventilators_available", -amount
+        elif counter == "critical_patients_count":
+            self.critical_patients_count += amount
+            return
+        setattr(self.hospital, counter, getattr(self.hospital, counter) + amount)
+        for term in TERMS_BY_COUNTER[counter]:
+            self._update_term(term)
+
+    def _value(self, counter: str) -> int:
+        if counter in ("ventilators_in_use", "critical_patients_count"):
+            return getattr(self, counter)
+        return getattr(self.hospital, counter)
+
+    # --- EVENTS ---
+    def validate(self, events: List[HospitalEvent], now: float):
+        """Dry run over the batch so a bad event rejects the whole batch, not its tail."""
+        pending: Dict[str, int] = {}
+        forecast = oxygen_forecaster.forecast(self.hospital.hospital_id)
+        last_reading = None if forecast is None else forecast["as_of"]
+        for i, event in enumerate(events):
+            if event.type == OXYGEN_EVENT:
+                if event.value is None or not 0 <= event.value <= 100:
+                    raise ValueError(f"Event {i}: oxygen_reading needs a value between 0 and 100")
+                stamp = event.timestamp or now
+                if last_reading is not None and stamp <= last_reading:
+                    raise ValueError(f"Event {i}: oxygen_reading at {stamp} is not after the previous reading ({last_reading})")
+                last_reading = stamp
+                continue
+            if event.type not in EVENT_COUNTERS:
+                raise ValueError(f"Event {i}: unknown type {event.type}; expected one of {', '.join(EVENT_TYPES)}")
+            counter, direction = EVENT_COUNTERS[event.type]
+            pending[counter] = pending.get(counter, self._value(counter)) + direction * event.count
+            if pending[counter] < 0:
+                raise ValueError(f"Event {i}: {counter} would drop below zero")
+            if counter == "ventilators_in_use" and pending[counter] - self.ventilators_in_use > self.hospital.ventilators_available:
+                raise ValueError(f"Event {i}: no ventilator available")
+            if counter in UPPER_BOUNDS and pending[counter] > getattr(self.hospital, UPPER_BOUNDS[counter]):
+                raise ValueError(f"Event {i}: {counter} would exceed {UPPER_BOUNDS[counter]}")
+
+    def apply(self, events: List[HospitalEvent]):
+        now = time.time()
+        self.validate(events, now)
+        readings = []
+        for event in events:
+            if event.type == OXYGEN_EVENT:
+                self.hospital.oxygen_supply_level_percent = round(event.value)
+                readings.append(OxygenReading(
+                    timestamp=event.timestamp or now,
+                    oxygen_supply_level_percent=event.value,
+                    ventilators_in_use=self.ventilators_in_use,
+                    icu_beds_occupied=self.hospital.icu_beds_occupied,
+                ))
+            else:
+                counter, direction = EVENT_COUNTERS[event.type]
+                self._move(counter, direction * event.count)
+        if readings:
+            oxygen_forecaster.ingest(self.hospital.hospital_id, readings)
+        self.hsi = sum(self.terms)
+        self.events_applied += len(events)
+        self._result = None
+
+    def result(self) -> HospitalAnalysisResult:
+        hours = oxygen_forecaster.hours_to_crisis(self.hospital.hospital_id)
+        if self._result is None or hours != self._result_hours:
+            self._result = stress_result(self.hospital, tuple(self.ratios), self.hsi, self.critical_patients_count, hours)
+            self._result_hours = hours
+        return self._result
+
+KEY_PREFIX = "hospital_state:"
+
+class HospitalRegistry:
+    def __init__(self, store: shared_state.SharedState = shared_state.store):
+        self.hospitals: Dict[int, HospitalState] = {}
+        self.store = store
+        store.subscribe("hospital_state", self._changed_elsewhere)
+
+    def load(self):
+        """Picks up the states other workers have saved (at startup)."""
+        for key, data in self.store.items(KEY_PREFIX):
+            self.hospitals[int(key[len(KEY_PREFIX):])] = HospitalState.from_dict(data)
+
+    def seed(self, snapshot: HospitalData, ventilators_in_use: int = 0, critical_patients_count: int = 0) -> HospitalState:
+        state = self.hospitals[snapshot.hospital_id] = HospitalState(snapshot, ventilators_in_use, critical_patients_count)
+        self._save(snapshot.hospital_id, state)
+        self._publish(state)
+        return state
+
+    def get(self, hospital_id: int) -> Optional[HospitalState]:
+        return self.hospitals.get(hospital_id)
+
+    def apply(self, hospital_id: int, events: List[HospitalEvent]) -> HospitalState:
+        """Raises KeyError for an unknown hospital and ValueError for an invalid batch."""
+        state = self.hospitals[hospital_id]
+        state.apply(events)
+        self._save(hospital_id, state)
+        self._publish(state)
+        return state
+
+    def remove(self, hospital_id: int) -> bool:
+        if self.hospitals.pop(hospital_id, None) is None:
+            return False
+        self._save(hospital_id, None)
+        return True
+
+    def _save(self, hospital_id: int, state: Optional[HospitalState]):
+        data = None if state is None else state.to_dict()
+        if data is None:
+            self.store.delete(f"{KEY_PREFIX}{hospital_id}")
+        else:
+            self.store.put(f"{KEY_PREFIX}{hospital_id}", data)
+        self.store.publish("hospital_state", hospital_id, data)
+
+    def _changed_elsewhere(self, key: str, data: Optional[dict]):
+        hospital_id = int(key)
+        if data is None:
+            self.hospitals.pop(hospital_id, None)
+            return
+        state = self.hospitals[hospital_id] = HospitalState.from_dict(data)
+        self._push(state.result())
+
+    def _push(self, result: HospitalAnalysisResult):
+        broadcaster.hospital_evaluated(result.hospital_id, result.hospital_stress_index, result.global_system_classification,
+                                       bed_allocation_action=result.bed_allocation_action, er_routing_action=result.er_routing_action)
+
+    def _publish(self, state: HospitalState):
+        # History is recorded once, by the worker that made the change
+        result = state.result()
+        self._push(result)
+        history.hospitals.append(result.hospital_id, {**result.model_dump(), "critical_patients_count": state.critical_patients_count})
+
+registry = HospitalRegistry()
@@ -0,0 +1,339 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, Column, String, Float, Integer, Boolean, Text
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+import bulk_pool
+import columnar
+import metrics
+import scoring_spec
+import shared_state
+from engine import calculate_patient_risk_batch
+from models import ScoringJobStatus
+
+# --- CONFIG (from env) ---
+JOB_DATABASE_URL = "sqlite:///./jobs.db"
+JOB_DIR = "jobs"
+DATASET_DIR = os.getenv("JOB_DATASET_DIR", ".")
+JOB_CHUNK_ROWS = int(os.getenv("JOB_CHUNK_ROWS", 10000))
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", 2))
+# A worker owns a job through a shared_state lease it renews while the job is queued or running;
+# a worker that dies lets it lapse, and the next worker to start takes the job over
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 30))
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+FORMAT_EXTENSIONS = {"csv": ".csv", "xlsx": ".xlsx", "parquet": ".parquet", "arrow": ".arrows"}
+EXTENSION_FORMATS = {".csv": "csv", ".xlsx": "xlsx", ".parquet": "parquet", ".arrow": "arrow", ".arrows": "arrow"}
+MEDIA_TYPE_FORMATS = {
+    "text/csv": "csv",
+    XLSX_MEDIA_TYPE: "xlsx",
+    columnar.PARQUET_MEDIA_TYPE: "parquet",
+    columnar.ARROW_STREAM_MEDIA_TYPE: "arrow",
+}
+
+# --- DATABASE SETUP ---
+job_engine = create_engine(JOB_DATABASE_URL, connect_args={"check_same_thread": False})
+metrics.instrument_sqlalchemy(job_engine, "jobs")
+JobSession = sessionmaker(autocommit=False, autoflush=False, bind=job_engine)
+Base = declarative_base()
+
+class ScoringJob(Base):
+    __tablename__ = "scoring_jobs"
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, default="queued")  # queued / running / completed / failed
+    source = Column(String)
+    input_path = Column(String)
+    input_format = Column(String)
+    is_oxygen_crisis = Column(Boolean, default=False)
+    rows_total = Column(Integer, nullable=True)
+    rows_done = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    created_at = Column(Float)
+    started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+
+class ScoringJobChunk(Base):
+    __tablename__ = "scoring_job_chunks"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, index=True)
+    chunk_index = Column(Integer)
+    results = Column(Text)  # JSON list of PatientAnalysisResult records
+
+def init():
+    """Creates the job tables and the upload directory (from the app lifespan, not at import)."""
+    Base.metadata.create_all(bind=job_engine)
+    os.makedirs(JOB_DIR, exist_ok=True)
+
+class JobNotFound(Exception):
+    pass
+
+class JobNotFinished(Exception):
+    pass
+
+# --- INPUT READERS ---
+def resolve_dataset(dataset: str) -> str:
+    """Resolves a dataset reference to a file inside DATASET_DIR."""
+    root = os.path.realpath(DATASET_DIR)
+    path = os.path.realpath(os.path.join(root, dataset))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError(f"Unknown dataset: {dataset}")
+    if os.path.splitext(path)[1].lower() not in EXTENSION_FORMATS:
+        raise ValueError(f"Unsupported dataset format: {dataset}")
+    return path
+
+def format_for_path(path: str) -> str:
+    return EXTENSION_FORMATS[os.path.splitext(path)[1].lower()]
+
+def count_rows(path: str, fmt: str) -> Optional[int]:
+    if fmt == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "arrow":
+        with pa.memory_map(path) as source:
+            return ipc.open_stream(source).read_all().num_rows
+    if fmt == "csv":
+        with open(path, "rb") as f:
+            return max(0, sum(1 for _ in f) - 1)
+    return None  # xlsx: known once the sheet is loaded
+
+def iter_tables(path: str, fmt: str, chunk_rows: int) -> Iterator[pa.Table]:
+    if fmt == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield pa.Table.from_batches([batch])
+    elif fmt == "csv":
+        for df in pd.read_csv(path, chunksize=chunk_rows):
+            yield pa.Table.from_pandas(df, preserve_index=False)
+    else:
+        if fmt == "arrow":
+            with pa.memory_map(path) as source:
+                table = ipc.open_stream(source).read_all()
+        else:
+            table = pa.Table.from_pandas(pd.read_excel(path), preserve_index=False)
+        for offset in range(0, table.num_rows, chunk_rows):
+            yield table.slice(offset, chunk_rows)
+
+def score_table(table: pa.Table, is_oxygen_crisis: bool) -> List[dict]:
+    # Runs inside a pool worker
+    scoring_spec.refresh()
+    results = calculate_patient_risk_batch(columnar.table_to_columns(table), is_oxygen_crisis)
+    return columnar.results_to_table(results).to_pylist()
+
+# --- JOB LIFECYCLE ---
+_tasks: Dict[str, asyncio.Task] = {}
+_semaphore: Optional[asyncio.Semaphore] = None
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+    return _semaphore
+
+def create_job(source: str, input_path: str, input_format: str, is_oxygen_crisis: bool) -> str:
+    job_id = uuid.uuid4().hex
+    db = JobSession()
+    try:
+        db.add(ScoringJob(
+            id=job_id,
+            status="queued",
+            source=source,
+            input_path=input_path,
+            input_format=input_format,
+            is_oxygen_crisis=is_oxygen_crisis,
+            created_at=time.time()
+        ))
+        db.commit()
+    finally:
+        db.close()
+    _schedule(job_id)
+    return job_id
+
+def submit_upload(payload: bytes, input_format: str, is_oxygen_crisis: bool) -> str:
+    # Persist the upload first so the job can be resumed after a restart
+    upload_id = uuid.uuid4().hex
+    path = os.path.join(JOB_DIR, f"{upload_id}{FORMAT_EXTENSIONS[input_format]}")
+    with open(path, "wb") as f:
+        f.write(payload)
+    return create_job(f"upload:{input_format}", path, input_format, is_oxygen_crisis)
+
+def submit_dataset(dataset: str, is_oxygen_crisis: bool) -> str:
+    path = resolve_dataset(dataset)
+    return create_job(f"dataset:{dataset}", path, format_for_path(path), is_oxygen_crisis)
+
+def _schedule(job_id: str) -> bool:
+    """Runs the job on this worker if no other live worker owns it."""
+    token = uuid.uuid4().hex
+    if not shared_state.store.acquire(f"job:{job_id}", token, JOB_LEASE_SECONDS):
+        return False
+    task = asyncio.create_task(_run_owned_job(job_id, token))
+    _tasks[job_id] = task
+    task.add_done_callback(lambda _: _tasks.pop(job_id, None))
+    return True
+
+def resume_pending_jobs():
+    """Re-schedules interrupted jobs nobody else owns; finished chunks are kept."""
+    db = JobSession()
+    try:
+        pending = db.query(ScoringJob.id).filter(ScoringJob.status.in_(["queued", "running"])).all()
+    finally:
+        db.close()
+    for (job_id,) in pending:
+        if job_id not in _tasks:
+            _schedule(job_id)
+
+async def _run_owned_job(job_id: str, token: str):
+    lease = f"job:{job_id}"
+    job_task = asyncio.current_task()
+
+    async def keep_lease():
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            if not shared_state.store.renew(lease, token, JOB_LEASE_SECONDS):
+                # Another worker has taken the job over; stop rather than score it twice
+                print(f"[JOBS] Lost the lease on job {job_id}, stopping")
+                job_task.cancel()
+                return
+
+    renewer = asyncio.create_task(keep_lease())
+    try:
+        await _run_job(job_id)
+    finally:
+        renewer.cancel()
+        shared_state.store.release(lease, token)
+
+async def _run_job(job_id: str):
+    async with _get_semaphore():
+        db = JobSession()
+        try:
+            job = db.get(ScoringJob, job_id)
+            if job.status not in ("queued", "running"):
+                return  # finished by the worker that owned it before this one took the lease
+            job.status = "running"
+            job.started_at = job.started_at or time.time()
+            loop = asyncio.get_running_loop()
+            if job.rows_total is None:
+                job.rows_total = await loop.run_in_executor(None, count_rows, job.input_path, job.input_format)
+            db.commit()
+
+            # File reads run on a thread and scoring on the process pool, so the loop stays free;
+            # chunks count against the pool's in-flight bound and wait for room rather than fail
+            tables = iter_tables(job.input_path, job.input_format, JOB_CHUNK_ROWS)
+            index = 0
+            while True:
+                table = await loop.run_in_executor(None, next, tables, None)
+                if table is None:
+                    break
+                if index >= job.chunks_done:  # skip chunks scored before a restart
+                    records = (await bulk_pool.run_chunks(score_table, [(table, job.is_oxygen_crisis)], wait=True))[0]
+                    db.add(ScoringJobChunk(job_id=job_id, chunk_index=index, results=json.dumps(records)))
+                    job.rows_done += len(records)
+                    job.chunks_done = index + 1
+                    db.commit()
+                index += 1
+
+            job.status = "completed"
+            job.rows_total = job.rows_done
+            job.finished_at = time.time()
+            db.commit()
+        except Exception as e:
+            print(f"[JOBS] Job {job_id} failed: {e}")
+            db.rollback()
+            job = db.get(ScoringJob, job_id)
+            if job is not None:
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = time.time()
+                db.commit()
+        finally:
+            db.close()
+
+# --- QUERIES ---
+def get_status(job_id: str) -> ScoringJobStatus:
+    db = JobSession()
+    try:
+        job = db.get(ScoringJob, job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+
+        rate = eta = None
+        if job.started_at and job.rows_done:
+            elapsed = (job.finished_at or time.time()) - job.started_at
+            rate = job.rows_done / max(elapsed, 1e-9)
+            if job.status == "running" and job.rows_total is not None:
+                eta = max(0, job.rows_total - job.rows_done) / rate
+
+        return ScoringJobStatus(
+            job_id=job.id,
+            status=job.status,
+            source=job.source,
+            rows_total=job.rows_total,
+            rows_done=job.rows_done,
+            chunks_done=job.chunks_done,
+            rows_per_second=round(rate, 1) if rate is not None else None,
+            eta_seconds=round(eta, 1) if eta is not None else None,
+            error=job.error
+        )
+    finally:
+        db.close()
+
+def result_chunks(job_id: str) -> Iterator[List[dict]]:
+    """
+    A completed job's results, one stored chunk at a time. Raises JobNotFound/JobNotFinished
+    here, before iteration starts, so an export can fail with a status code instead of mid-stream.
+    """
+    db = JobSession()
+    try:
+        job = db.get(ScoringJob, job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+        if job.status != "completed":
+            raise JobNotFinished(job.status)
+        chunk_count = job.chunks_done
+    finally:
+        db.close()
+    return _iter_result_chunks(job_id, chunk_count)
+
+def _iter_result_chunks(job_id: str, chunk_count: int) -> Iterator[List[dict]]:
+    db = JobSession()
+    try:
+        for index in range(chunk_count):
+            chunk = db.query(ScoringJobChunk.results).filter(
+                ScoringJobChunk.job_id == job_id, ScoringJobChunk.chunk_index == index
+            ).first()
+            if chunk is not None:
+                yield json.loads(chunk.results)
+    finally:
+        db.close()
+
+def get_result_chunk(job_id: str, chunk_index: int) -> dict:
+    db = JobSession()
+    try:
+        job = db.get(ScoringJob, job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+        if job.status != "completed":
+            raise JobNotFinished(job.status)
+
+        chunk = db.query(ScoringJobChunk).filter(
+            ScoringJobChunk.job_id == job_id, ScoringJobChunk.chunk_index == chunk_index
+        ).first()
+        if chunk is None:
+            raise JobNotFound(f"{job_id} chunk {chunk_index}")
+
+        return {
+            "job_id": job_id,
+            "chunk": chunk_index,
+            "chunk_count": job.chunks_done,
+            "results": json.loads(chunk.results)
+        }
+    finally:
+        db.close()
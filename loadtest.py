@@ -0,0 +1,234 @@
+"""
+In-process HTTP load harness for the CarePulse++ FastAPI apps.
+
+    python loadtest.py --app root --concurrency 32 --requests 5000
+    python loadtest.py --app backend --concurrency 16 --duration 20
+    python loadtest.py --app both --json loadtest_report.json
+
+Requests go through httpx's ASGI transport straight into the app, so no server,
+network, SMTP relay or Google endpoint is needed: outgoing mail and Google token
+verification are replaced by local stand-ins with a configurable delay. The app
+runs inside a scratch working directory (copy of the patient workbook, fresh
+SQLite files), so the repository data is never touched.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+
+import synthetic
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(REPO_DIR, "backend")
+PATIENT_WORKBOOK = "Patient_Clinical_Data.xlsx"
+
+# Relative weights of each operation in the mixed workload
+ROOT_MIX = {"analyze": 50, "bulk": 10, "stress": 30, "add_patient": 5, "otp_send": 5}
+BACKEND_MIX = {"add_patient": 25, "me": 40, "request_otp": 20, "auth_google": 15}
+
+LOADTEST_EMAIL = "loadtest@example.com"
+
+SAMPLE_HOSPITAL = {
+    "hospital_id": 1, "total_beds": 200, "occupied_beds": 178, "icu_beds_total": 40, "icu_beds_occupied": 24,
+    "er_capacity": 30, "er_occupied": 24, "ongoing_operations_count": 10, "available_doctors": 11,
+    "available_nurses": 13, "ventilators_available": 10, "ambulance_available_count": 5,
+    "room_temperature_celsius": 25.5, "oxygen_supply_level_percent": 91, "total_patients_current": 155
+}
+
+def prepare_workdir() -> str:
+    workdir = tempfile.mkdtemp(prefix="carepulse_load_")
+    shutil.copy(os.path.join(REPO_DIR, PATIENT_WORKBOOK), os.path.join(workdir, PATIENT_WORKBOOK))
+    os.chdir(workdir)
+    return workdir
+
+# --- STAND-INS ---
+def fake_google_verifier(delay: float):
+    def verify_oauth2_token(token, request, audience):
+        time.sleep(delay)  # the real call is synchronous too
+        return {"email": LOADTEST_EMAIL, "sub": "loadtest-sub", "name": "Load Test"}
+    return verify_oauth2_token
+
+def patch_google_verifier(google_delay: float):
+    # The apps import id_token inside the handler, so the module attribute is what they call
+    from google.oauth2 import id_token
+    id_token.verify_oauth2_token = fake_google_verifier(google_delay)
+
+def load_root_app(smtp_delay: float, google_delay: float):
+    sys.path.insert(0, REPO_DIR)
+    import aiosmtplib
+    import main
+
+    async def fake_smtp_send(message, **kwargs):
+        await asyncio.sleep(smtp_delay)
+    aiosmtplib.send = fake_smtp_send
+    patch_google_verifier(google_delay)
+    return main.app, {}
+
+def load_backend_app(smtp_delay: float, google_delay: float):
+    # otp_utils validates its mail settings on import
+    os.environ.setdefault("MAIL_USERNAME", "loadtest")
+    os.environ.setdefault("MAIL_PASSWORD", "loadtest")
+    os.environ.setdefault("MAIL_FROM", LOADTEST_EMAIL)
+    # The backend ships its own models/main modules; drop the root ones synthetic pulled in
+    for name in ("models", "main"):
+        sys.modules.pop(name, None)
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    import otp_utils
+    import auth
+    import database
+    import models
+
+    async def fake_send_otp_email(email, otp):
+        await asyncio.sleep(smtp_delay)
+        return True
+    otp_utils.send_otp_email = fake_send_otp_email
+    patch_google_verifier(google_delay)
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        if not db.query(models.User).filter(models.User.email == LOADTEST_EMAIL).first():
+            db.add(models.User(email=LOADTEST_EMAIL, full_name="Load Test", role="Admin", staff_id="CP-LOADTEST-01"))
+            db.commit()
+    finally:
+        db.close()
+    token = auth.create_access_token(data={"sub": LOADTEST_EMAIL})
+    return main.app, {"Authorization": f"Bearer {token}"}
+
+# --- WORKLOAD ---
+class Workload:
+    def __init__(self, app_name: str, bulk_size: int, seed: int, auth_headers: dict):
+        self.mix = ROOT_MIX if app_name == "root" else BACKEND_MIX
+        self.ops = list(self.mix)
+        self.weights = [self.mix[op] for op in self.ops]
+        self.auth_headers = auth_headers
+        self.rng = random.Random(seed)
+        columns = synthetic.generate_patient_columns(max(bulk_size, 1000), seed)
+        self.patients = [p.model_dump() for p in synthetic.patients_from_columns(columns)]
+        self.bulk_size = bulk_size
+
+    def next_request(self):
+        op = self.rng.choices(self.ops, self.weights)[0]
+        patient = self.rng.choice(self.patients)
+        if op == "analyze":
+            return op, "POST", "/api/v1/patient/analyze", {"json": patient}
+        if op == "bulk":
+            start = self.rng.randrange(0, len(self.patients) - self.bulk_size + 1)
+            return op, "POST", "/api/v1/patient/analyze_bulk", {"json": self.patients[start:start + self.bulk_size]}
+        if op == "stress":
+            hospital = dict(SAMPLE_HOSPITAL, er_occupied=self.rng.randint(0, 40))
+            return op, "POST", "/api/v1/hospital/stress", {"json": hospital, "params": {"critical_patients_count": self.rng.randint(0, 15)}}
+        if op == "add_patient":
+            new_patient = {k: v for k, v in patient.items() if k != "patient_id"}
+            return op, "POST", "/api/v1/patients/add", {"json": {"patient": new_patient}, "headers": self.auth_headers}
+        if op == "otp_send":
+            return op, "POST", "/api/v1/auth/otp/send", {"json": {"email": LOADTEST_EMAIL}}
+        if op == "request_otp":
+            return op, "POST", "/request-otp", {"json": {"email": LOADTEST_EMAIL}}
+        if op == "auth_google":
+            return op, "POST", "/api/v1/auth/google", {"json": {"token": "stand-in"}}
+        return op, "GET", "/me", {"headers": self.auth_headers}
+
+async def run_load(app, workload: Workload, concurrency: int, total: int, duration: float) -> dict:
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker(client):
+        nonlocal issued
+        while (deadline is None and issued < total) or (deadline is not None and time.perf_counter() < deadline):
+            issued += 1
+            op, method, url, kwargs = workload.next_request()
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, url, **kwargs)
+                status = resp.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies[op].append(time.perf_counter() - t0)
+            statuses[op][status] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+            elapsed = time.perf_counter() - started
+
+    report = {"elapsed_s": round(elapsed, 3), "requests": issued, "throughput_rps": round(issued / elapsed, 1), "endpoints": {}}
+    for op, samples in sorted(latencies.items()):
+        ms = np.array(samples) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        report["endpoints"][op] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2), "max_ms": round(ms.max(), 2),
+            "status_codes": {str(k): v for k, v in statuses[op].items()}
+        }
+    return report
+
+def print_report(app_name: str, report: dict):
+    print(f"\n[{app_name}] {report['requests']} requests in {report['elapsed_s']}s -> {report['throughput_rps']} req/s")
+    print(f"{'endpoint':<14}{'reqs':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  status")
+    for op, s in report["endpoints"].items():
+        print(f"{op:<14}{s['requests']:>8}{s['throughput_rps']:>10}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}  {s['status_codes']}")
+
+def run_single(args) -> dict:
+    workdir = prepare_workdir()
+    try:
+        loader = load_root_app if args.app == "root" else load_backend_app
+        app, auth_headers = loader(args.smtp_delay, args.google_delay)
+        workload = Workload(args.app, args.bulk_size, args.seed, auth_headers)
+        return asyncio.run(run_load(app, workload, args.concurrency, args.requests, args.duration))
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="CarePulse++ in-process load test")
+    parser.add_argument("--app", choices=["root", "backend", "both"], default="root")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="run for N seconds instead of a request count")
+    parser.add_argument("--bulk-size", type=int, default=200)
+    parser.add_argument("--smtp-delay", type=float, default=0.05, help="simulated SMTP send time (s)")
+    parser.add_argument("--google-delay", type=float, default=0.02, help="simulated Google token check time (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    reports = {}
+    if args.app == "both":
+        # The two apps share module names (main, models), so each gets its own interpreter
+        for name in ("root", "backend"):
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+                out = tmp.name
+            cmd = [sys.executable, os.path.abspath(__file__), "--app", name, "--json", out] + [
+                a for a in sys.argv[1:] if a not in ("--app", "both", "--json", args.json)
+            ]
+            subprocess.run(cmd, check=True)
+            with open(out) as f:
+                reports.update(json.load(f))
+            os.unlink(out)
+    else:
+        reports[args.app] = run_single(args)
+        print_report(args.app, reports[args.app])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,123 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-from models import PatientData, PatientAnalysisResult, HospitalData, HospitalAnalysisResult
-from engine import calculate_patient_risk, calculate_hospital_stress
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from fastapi.security import OAuth2PasswordBearer
+from typing import List, Optional
+from models import (PatientData, PatientAnalysisResult, HospitalData, HospitalAnalysisResult, ScoringJobStatus, CensusPatient, CensusPage, CensusSummary,
+    NetworkHospital, EmergencyCase, DiversionAssignment, NetworkHospitalState, SimulationRequest, SimulationResult,
+    OxygenReading, OxygenForecast, HospitalEvent, HospitalStateSnapshot, ERQueueEntry, ERQueueStatus, ERDecision)
+from engine import calculate_patient_risk_batch, calculate_hospital_stress
+import columnar
+import bulk_pool
+import export
+import compression
+import scoring_spec
+import metrics
+import diversion
+import simulation
+from oxygen_forecast import forecaster as oxygen_forecaster
+from pubsub import broadcaster, TOPICS as PUSH_TOPICS, TooManySubscribers
+from hospital_state import registry as hospital_registry
+import history
+import shared_state
+from er_queue import registry as er_queues, ADMIT_EVENTS
+from risk_cache import risk_cache
+from census import census, EXCEL_FILE as CENSUS_EXCEL_FILE
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, String, Float, Integer
-from sqlalchemy.orm import sessionmaker, declarative_base, Session
-from sqlalchemy.sql import exists
 from dotenv import load_dotenv
 import os
 import json
+import asyncio
+import importlib
 import random
 import time
-import aiosmtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import pandas as pd
 
-load_dotenv()
-
-app = FastAPI(title="CarePulse++ Deterministic Healthcare Intelligence Engine")
-
-# --- DATABASE SETUP (for OTP persistence) ---
-DATABASE_URL = "sqlite:///./auth.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# Heavy dependencies (pandas, pyarrow, sqlalchemy, google-auth, aiosmtplib) and the jobs module are
+# imported where they are first used, and disk/database setup runs in the lifespan, so importing
+# this module stays within IMPORT_BUDGET_SECONDS (see test_import_time.py).
 
-class OTPRecord(Base):
-    __tablename__ = "otp_records"
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True)
-    otp = Column(String)
-    expiry = Column(Float)
-
-Base.metadata.create_all(bind=engine)
+load_dotenv()
 
+# --- LIFESPAN ---
+async def _init_module(name: str):
+    """
+    Imports a module that sets up a database (sqlalchemy, and pandas/pyarrow for jobs) and runs its
+    init() on a thread, so the event loop keeps ticking. Awaited before the app serves requests:
+    nothing may create the bulk process pool while another thread is halfway through an import.
+    """
+    loop = asyncio.get_running_loop()
+    module = await loop.run_in_executor(None, importlib.import_module, name)
+    await loop.run_in_executor(None, module.init)
+    return module
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 1. Directories, history stores and monitors
+    os.makedirs(DATA_DIR, exist_ok=True)
+    history.init()
+    app.state.loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
+    # 2. Scoring spec, census (the census needs the spec) and the state other workers saved; the
+    #    change-feed position is taken first so changes made while this one loads are replayed
+    scoring_spec.current()
+    shared_state.store.poll()
+    if os.path.exists(CENSUS_EXCEL_FILE):
+        census.load_excel()
+    hospital_registry.load()
+    oxygen_forecaster.load()
+    er_queues.load()
+    diversion.load()
+    app.state.shared_state_watch = asyncio.create_task(shared_state.store.watch())
+    # 3. OTP table and interrupted scoring jobs
+    await _init_module("auth_db")
+    jobs = await _init_module("jobs")
+    jobs.resume_pending_jobs()
+    yield
+    app.state.loop_monitor.cancel()
+    app.state.shared_state_watch.cancel()
+    bulk_pool.shutdown_pool()
+
+app = FastAPI(title="CarePulse++ Deterministic Healthcare Intelligence Engine", lifespan=lifespan)
+
+# --- DATABASE SETUP (for OTP persistence, see auth_db.py) ---
 def get_db():
-    db = SessionLocal()
+    import auth_db
+    db = auth_db.SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+# --- ADMIN ROLE CHECK ---
+# Bearer tokens are the backend's: HS256 JWTs whose "sub" is a staff email, signed with JWT_SECRET_KEY
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "clinical_precision_secret_12345")
+JWT_ALGORITHM = "HS256"
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+def check_role(roles: List[str]):
+    def role_checker(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+        import jwt
+        from sqlalchemy.exc import OperationalError
+        from auth_db import TokenBlocklist, User
+        credentials_exception = HTTPException(status_code=401, detail="Could not validate credentials",
+                                              headers={"WWW-Authenticate": "Bearer"})
+        try:
+            email = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM]).get("sub")
+        except jwt.PyJWTError:
+            raise credentials_exception
+        try:
+            blocked = db.query(TokenBlocklist).filter(TokenBlocklist.token == token).first()
+            user = None if email is None else db.query(User).filter(User.email == email).first()
+        except OperationalError:
+            # The backend has not created its accounts yet, so nobody holds a role
+            raise credentials_exception
+        if blocked or user is None:
+            raise credentials_exception
+        if user.role not in roles:
+            raise HTTPException(status_code=403, detail="Forbidden: Insufficient privileges")
+        return user
+    return role_checker
+
 # --- SMTP CONFIG (from .env) ---
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
@@ -58,13 +131,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 GOOGLE_CLIENT_ID = "625094222230-d9ihjsrcl49h5qr9ggv18spjllpa6u7i.apps.googleusercontent.com"
 DATA_DIR = "data"
 
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
-
 class AuthToken(BaseModel):
     token: str
 
@@ -85,6 +157,10 @@ def get_user_data_path(email: str):
 
 async def send_email_otp_async(target_email: str, otp: str):
     """Sends the OTP code to the user's email asynchronously."""
+    import aiosmtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     message = MIMEMultipart()
     message["From"] = SMTP_USERNAME
     message["To"] = target_email
@@ -109,22 +185,26 @@ async def send_email_otp_async(target_email: str, otp: str):
     """
     message.attach(MIMEText(body, "html"))
 
-    try:
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_SERVER,
-            port=SMTP_PORT,
-            start_tls=True,
-            username=SMTP_USERNAME,
-            password=SMTP_PASSWORD,
-        )
-        return True
-    except Exception as e:
-        print(f"[ERROR] aiosmtplib failed: {e}")
-        return False
+    with metrics.email_send() as outcome:
+        try:
+            await aiosmtplib.send(
+                message,
+                hostname=SMTP_SERVER,
+                port=SMTP_PORT,
+                start_tls=True,
+                username=SMTP_USERNAME,
+                password=SMTP_PASSWORD,
+            )
+            return True
+        except Exception as e:
+            outcome["ok"] = False
+            print(f"[ERROR] aiosmtplib failed: {e}")
+            return False
 
 @app.post("/api/v1/auth/google")
 async def auth_google(auth: AuthToken):
+    from google.oauth2 import id_token
+    from google.auth.transport import requests
     try:
         idinfo = id_token.verify_oauth2_token(auth.token, requests.Request(), GOOGLE_CLIENT_ID)
         email = idinfo['email']
@@ -149,7 +229,8 @@ async def auth_google(auth: AuthToken):
         return {"success": False, "error": str(e)}
 
 @app.post("/api/v1/auth/otp/send")
-async def send_otp(req: OTPRequest, db: Session = Depends(get_db)):
+async def send_otp(req: OTPRequest, db=Depends(get_db)):
+    from auth_db import OTPRecord
     otp = str(random.randint(100000, 999999))
     expiry = time.time() + 300 # 5 min
 
@@ -172,7 +253,8 @@ async def send_otp(req: OTPRequest, db: Session = Depends(get_db)):
     return {"success": True, "message": "OTP sent to your email"}
 
 @app.post("/api/v1/auth/otp/verify")
-async def verify_otp(req: OTPVerify, db: Session = Depends(get_db)):
+async def verify_otp(req: OTPVerify, db=Depends(get_db)):
+    from auth_db import OTPRecord
     record = db.query(OTPRecord).filter(OTPRecord.email == req.email).first()
     if not record:
         return {"success": False, "error": "No OTP found for this email"}
@@ -210,35 +292,437 @@ async def verify_otp(req: OTPVerify, db: Session = Depends(get_db)):
 async def save_user_data(data: UserDataStore):
     try:
         path = get_user_data_path(data.email)
-        with open(path, "w") as f:
+        # Write-then-rename, so a worker reading concurrently never sees a half-written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
             json.dump({
                 "patients": data.patients,
                 "hospital": data.hospital
             }, f)
+        os.replace(tmp_path, path)
         return {"success": True}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+def _patient_changed(patient_id: str, result: dict):
+    # Census and ER mutations only: the /patient/analyze* endpoints are stateless what-if scoring
+    # Live push to open screens plus the time-travel history
+    broadcaster.patient_scored(patient_id, result["final_risk_score"], result["severity_class"])
+    history.patients.append(patient_id, result)
+    er_queues.rescore(patient_id, result["final_risk_score"], result["severity_class"])
+
+# --- CROSS-WORKER CENSUS SYNC ---
+# Census changes are published on the shared_state change feed; the other workers apply them
+# to their own census (history is recorded once, by the worker that made the change).
+def _publish_census_change(patient_id: str, patient: Optional[PatientData]):
+    shared_state.store.publish("census", patient_id, None if patient is None else patient.model_dump())
+
+def _census_changed_elsewhere(patient_id: str, patient: Optional[dict]):
+    if patient is None:
+        if census.discharge(patient_id):
+            broadcaster.patient_discharged(patient_id)
+        return
+    census_patient = PatientData(**patient)
+    record = census.upsert(census_patient, risk_cache.score(census_patient))
+    broadcaster.patient_scored(patient_id, record["final_risk_score"], record["severity_class"])
+    # The worker that made the change saves the queue entry; this one only reorders its own copy
+    er_queues.rescore(patient_id, record["final_risk_score"], record["severity_class"], save=False)
+
+def _census_reloaded_elsewhere(_key: str, _payload):
+    census.load_excel()
+    broadcaster.resync_all()
+
+shared_state.store.subscribe("census", _census_changed_elsewhere)
+shared_state.store.subscribe("census_reload", _census_reloaded_elsewhere)
+
+# Hospital states, ER queues, oxygen models and the diversion network are saved and published
+# by their modules; writers take the lock and catch up with the change feed first, so every
+# change applies to the latest state whichever worker served the last one.
+@asynccontextmanager
+async def _shared_write(lock: str):
+    try:
+        async with shared_state.store.alock(lock):
+            shared_state.store.poll()
+            yield
+    except shared_state.LockTimeout:
+        raise HTTPException(status_code=503, detail="Shared state is busy, retry shortly", headers={"Retry-After": "1"})
+
 @app.post("/api/v1/patient/analyze", response_model=PatientAnalysisResult)
 async def analyze_patient(patient: PatientData, is_oxygen_crisis: bool = False):
     """
     Computes mathematical risk score and classifications for a single patient in O(1) time.
     """
-    return calculate_patient_risk(patient, is_oxygen_crisis)
+    scoring_spec.refresh()
+    with metrics.engine_stage("patient_risk"):
+        result = risk_cache.score(patient, is_oxygen_crisis)
+    return result.to_model()
 
 @app.post("/api/v1/patient/analyze_bulk", response_model=List[PatientAnalysisResult])
 async def analyze_patient_bulk(patients: List[PatientData], is_oxygen_crisis: bool = False):
     """
     Computes mathematical risk scores for a list of patients in O(n) time.
+    Large batches are split across the scoring process pool to keep the event loop free.
+    """
+    scoring_spec.refresh()
+    try:
+        with metrics.engine_stage("patient_risk_bulk", len(patients)):
+            results = await bulk_pool.score_bulk(patients, is_oxygen_crisis)
+    except bulk_pool.PoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Bulk scoring capacity exhausted, retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return [result.to_model() for result in results]
+
+@app.post("/api/v1/patient/analyze_columnar")
+async def analyze_patient_columnar(request: Request, is_oxygen_crisis: bool = False):
+    """
+    Scores an Arrow IPC stream or Parquet file of patient columns in one vectorized pass.
+    Results are returned in the same columnar format as the request body.
+    """
+    media_type = columnar.resolve_media_type(request.headers.get("content-type"))
+    if media_type is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content type. Use {columnar.ARROW_STREAM_MEDIA_TYPE} or {columnar.PARQUET_MEDIA_TYPE}"
+        )
+
+    body = await request.body()
+    try:
+        columns = columnar.table_to_columns(columnar.read_patient_table(body, media_type))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid columnar payload: {str(e)}")
+
+    scoring_spec.refresh()
+    with metrics.engine_stage("patient_risk_batch", len(columns["patient_id"])):
+        results = calculate_patient_risk_batch(columns, is_oxygen_crisis)
+    return Response(content=columnar.write_table(columnar.results_to_table(results), media_type), media_type=media_type)
+
+@app.get("/api/v1/scoring/spec")
+async def get_scoring_spec():
+    """
+    The active declarative scoring spec (ranges, weights, modifiers, cut-offs).
+    """
+    return scoring_spec.refresh().to_dict()
+
+@app.post("/api/v1/scoring/spec/reload")
+async def reload_scoring_spec(current_user=Depends(check_role(["Admin"]))):
+    """
+    Forces an immediate re-read of the spec file (Admin only); other workers follow within SCORING_SPEC_CHECK_INTERVAL.
+    """
+    try:
+        spec = scoring_spec.reload()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Scoring spec rejected: {str(e)}")
+    return {"success": True, "version": spec.version}
+
+@app.get("/api/v1/patient/cache_stats")
+async def get_risk_cache_stats():
+    """
+    Hit/miss/eviction counters of the opt-in risk cache (enable with RISK_CACHE_SIZE).
     """
-    return [calculate_patient_risk(p, is_oxygen_crisis) for p in patients]
+    return risk_cache.stats()
 
 @app.post("/api/v1/hospital/stress", response_model=HospitalAnalysisResult)
 async def check_hospital_stress(hospital: HospitalData, critical_patients_count: int = 0):
     """
     Computes Hospital Stress Index (HSI) and bed routing actions mathematically.
+    Uses the hospital's latest oxygen forecast, if readings were posted, to alert ahead of the crisis level.
+    """
+    with metrics.engine_stage("hospital_stress"):
+        result = calculate_hospital_stress(hospital, critical_patients_count, oxygen_forecaster.hours_to_crisis(hospital.hospital_id))
+    broadcaster.hospital_evaluated(result.hospital_id, result.hospital_stress_index, result.global_system_classification,
+                                   bed_allocation_action=result.bed_allocation_action, er_routing_action=result.er_routing_action)
+    history.hospitals.append(result.hospital_id, {**result.model_dump(), "critical_patients_count": critical_patients_count})
+    return result
+
+def _state_snapshot(state) -> dict:
+    return {
+        "hospital": state.hospital,
+        "ventilators_in_use": state.ventilators_in_use,
+        "critical_patients_count": state.critical_patients_count,
+        "events_applied": state.events_applied,
+        "stress": state.result(),
+    }
+
+@app.put("/api/v1/hospital/{hospital_id}/state", response_model=HospitalStateSnapshot)
+async def seed_hospital_state(hospital_id: int, hospital: HospitalData, ventilators_in_use: int = 0, critical_patients_count: int = 0):
+    """
+    Seeds (or re-seeds) the server-owned state of a hospital from one full snapshot; events take over from there.
     """
-    return calculate_hospital_stress(hospital, critical_patients_count)
+    if hospital.hospital_id != hospital_id:
+        raise HTTPException(status_code=400, detail="hospital_id in the body does not match the path")
+    if ventilators_in_use < 0 or critical_patients_count < 0:
+        raise HTTPException(status_code=400, detail="ventilators_in_use and critical_patients_count must be >= 0")
+    async with _shared_write("hospitals"):
+        return _state_snapshot(hospital_registry.seed(hospital, ventilators_in_use, critical_patients_count))
+
+@app.get("/api/v1/hospital/{hospital_id}/state", response_model=HospitalStateSnapshot)
+async def get_hospital_state(hospital_id: int):
+    """
+    Current counters and stress result of a seeded hospital.
+    """
+    state = hospital_registry.get(hospital_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Hospital state not seeded")
+    return _state_snapshot(state)
+
+@app.post("/api/v1/hospital/{hospital_id}/events", response_model=HospitalAnalysisResult)
+async def apply_hospital_events(hospital_id: int, events: List[HospitalEvent]):
+    """
+    Applies bed/ICU/ER/ventilator/operation/staff/oxygen events in order; each moves one counter and its HSI terms in O(1).
+    The batch is rejected as a whole if any event is invalid.
+    """
+    try:
+        async with _shared_write("hospitals"):
+            with metrics.engine_stage("hospital_events", len(events)):
+                return hospital_registry.apply(hospital_id, events).result()
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Hospital state not seeded")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/hospital/{hospital_id}/stress", response_model=HospitalAnalysisResult)
+async def get_hospital_stress(hospital_id: int):
+    """
+    HSI and routing actions of a seeded hospital, served from memory.
+    """
+    state = hospital_registry.get(hospital_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Hospital state not seeded")
+    return state.result()
+
+@app.delete("/api/v1/hospital/{hospital_id}/state")
+async def remove_hospital_state(hospital_id: int):
+    """
+    Stops tracking a hospital.
+    """
+    async with _shared_write("hospitals"):
+        if not hospital_registry.remove(hospital_id):
+            raise HTTPException(status_code=404, detail="Hospital state not seeded")
+    return {"success": True}
+
+def _er_decision(hospital_id: int, entry: ERQueueEntry) -> dict:
+    return {
+        "hospital_id": hospital_id,
+        "patient": entry,
+        "waiting": len(er_queues.queue(hospital_id).heap),
+        "er_routing_action": er_queues.routing_action(hospital_id),
+    }
+
+@app.post("/api/v1/er/{hospital_id}/queue", response_model=ERDecision)
+async def join_er_queue(hospital_id: int, patient: PatientData, arrival_time: Optional[float] = None):
+    """
+    Scores a patient and puts them in the hospital's ER waiting queue (risk, then emergency flag, then arrival order).
+    """
+    scoring_spec.refresh()
+    result = risk_cache.score(patient)
+    entry = ERQueueEntry(patient_id=patient.patient_id, final_risk_score=result.final_risk_score, severity_class=result.severity_class,
+                         emergency_case_flag=patient.emergency_case_flag, arrival_time=arrival_time)
+    async with _shared_write("hospitals"):
+        try:
+            entry = er_queues.admit(hospital_id, entry)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        _patient_changed(patient.patient_id, result.as_dict())
+        return _er_decision(hospital_id, entry)
+
+@app.post("/api/v1/er/{hospital_id}/next", response_model=ERDecision)
+async def next_er_patient(hospital_id: int, admit_to: Optional[str] = None):
+    """
+    Takes the highest-priority waiting patient out of the queue, optionally admitting them to a ward bed or the ICU.
+    """
+    if admit_to not in ADMIT_EVENTS:
+        raise HTTPException(status_code=400, detail="admit_to must be ward or icu")
+    async with _shared_write("hospitals"):
+        try:
+            entry = er_queues.next_patient(hospital_id, admit_to)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Nobody is waiting")
+        return _er_decision(hospital_id, entry)
+
+@app.get("/api/v1/er/{hospital_id}/queue", response_model=ERQueueStatus)
+async def get_er_queue(hospital_id: int, limit: int = 20):
+    """
+    The next `limit` waiting patients in priority order, queue length and the current ER routing action.
+    """
+    if not 0 < limit <= 1000:
+        raise HTTPException(status_code=400, detail="0 < limit <= 1000")
+    queue = er_queues.queue(hospital_id)
+    return {
+        "hospital_id": hospital_id,
+        "waiting": len(queue.heap),
+        "er_routing_action": er_queues.routing_action(hospital_id),
+        "entries": queue.top(limit),
+    }
+
+@app.delete("/api/v1/er/{hospital_id}/queue/{patient_id}", response_model=ERDecision)
+async def leave_er_queue(hospital_id: int, patient_id: str):
+    """
+    Removes a patient who left without being seen.
+    """
+    async with _shared_write("hospitals"):
+        try:
+            entry = er_queues.leave(hospital_id, patient_id)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Patient is not waiting at this hospital")
+        return _er_decision(hospital_id, entry)
+
+@app.post("/api/v1/hospital/{hospital_id}/oxygen", response_model=OxygenForecast)
+async def ingest_oxygen_readings(hospital_id: int, readings: List[OxygenReading]):
+    """
+    Appends oxygen level + ventilator/ICU occupancy readings (in time order) and refits the consumption model.
+    """
+    if not readings:
+        raise HTTPException(status_code=400, detail="No readings provided")
+    try:
+        async with _shared_write("hospitals"):
+            return oxygen_forecaster.ingest(hospital_id, readings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/hospital/{hospital_id}/oxygen/forecast", response_model=OxygenForecast)
+async def get_oxygen_forecast(hospital_id: int):
+    """
+    Latest consumption rate and time-to-threshold forecast (computed at ingest, not per request).
+    """
+    forecast = oxygen_forecaster.forecast(hospital_id)
+    if forecast is None:
+        raise HTTPException(status_code=404, detail="No oxygen readings for this hospital")
+    return forecast
+
+@app.delete("/api/v1/hospital/{hospital_id}/oxygen")
+async def reset_oxygen_history(hospital_id: int):
+    """
+    Drops a hospital's oxygen history and model (e.g. after a supply system change).
+    """
+    async with _shared_write("hospitals"):
+        if not oxygen_forecaster.reset(hospital_id):
+            raise HTTPException(status_code=404, detail="No oxygen readings for this hospital")
+    return {"success": True}
+
+@app.put("/api/v1/network/hospitals", response_model=List[NetworkHospitalState])
+async def load_hospital_network(hospitals: List[NetworkHospital], max_hsi: Optional[float] = None):
+    """
+    Replaces the diversion network (hospital snapshots with coordinates) and resets its capacity counters.
+    """
+    if not hospitals:
+        raise HTTPException(status_code=400, detail="Network needs at least one hospital")
+    try:
+        async with _shared_write("diversion"):
+            return diversion.load_network(hospitals, max_hsi).state()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/network/hospitals", response_model=List[NetworkHospitalState])
+async def get_hospital_network():
+    """
+    Live capacity counters and HSI of every network hospital.
+    """
+    if diversion.router is None:
+        raise HTTPException(status_code=404, detail="No hospital network loaded")
+    return diversion.router.state()
+
+@app.post("/api/v1/network/route", response_model=List[DiversionAssignment])
+async def route_emergencies(cases: List[EmergencyCase]):
+    """
+    Assigns each emergency, in order, to the nearest hospital with ER/ICU headroom and an acceptable HSI.
+    """
+    async with _shared_write("diversion"):
+        if diversion.router is None:
+            raise HTTPException(status_code=404, detail="No hospital network loaded")
+        with metrics.engine_stage("diversion_route", len(cases)):
+            return diversion.route(cases)
+
+@app.delete("/api/v1/network/route/{case_id}")
+async def release_emergency(case_id: str):
+    """
+    Frees the ER place (and ICU bed) a routed emergency took, once it is discharged or stood down.
+    """
+    async with _shared_write("diversion"):
+        if diversion.router is None:
+            raise HTTPException(status_code=404, detail="No hospital network loaded")
+        hospital_id = diversion.release(case_id)
+    if hospital_id is None:
+        raise HTTPException(status_code=404, detail="Case holds no place in the network")
+    return {"success": True, "hospital_id": hospital_id}
+
+@app.post("/api/v1/simulation/run", response_model=SimulationResult)
+async def run_surge_simulation(request: SimulationRequest):
+    """
+    Monte Carlo distributions of ICU/ventilator shortfall, HSI and oxygen depletion under random
+    surges, arrivals and supply disruptions. Uses the server-side census unless patients are given.
+    """
+    scoring_spec.refresh()
+    if request.patients is not None:
+        columns = columnar.records_to_columns([p.model_dump() for p in request.patients])
+    else:
+        columns = census.to_columns()
+    if len(columns["patient_id"]) == 0:
+        raise HTTPException(status_code=400, detail="Simulation needs a census: load one or pass patients")
+    try:
+        with metrics.engine_stage("simulation", request.config.runs):
+            return await simulation.run_simulation(request.hospital, request.config, columns)
+    except bulk_pool.PoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Bulk scoring capacity exhausted, retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+def _append_to_workbook(patient: dict):
+    """
+    Gives the patient the next ID and appends them to the global workbook. Blocking (the
+    cross-worker lock and the Excel read/write), so add_patient runs it on an executor.
+    """
+    import pandas as pd
+    # Every worker shares the workbook: the read-modify-write runs under a cross-worker lock and
+    # IDs come from the shared sequence (caught up with the highest ID already in the workbook)
+    with shared_state.store.lock("patient_workbook"):
+        new_id = 1
+        if os.path.exists(CENSUS_EXCEL_FILE):
+            try:
+                with metrics.EXCEL_SECONDS.labels("read").time():
+                    df = pd.read_excel(CENSUS_EXCEL_FILE)
+                if not df.empty and 'patient_id' in df.columns:
+                    # Filter out non-numeric IDs if any, then find max
+                    numeric_ids = pd.to_numeric(df['patient_id'], errors='coerce')
+                    if not numeric_ids.isna().all():
+                        new_id = int(numeric_ids.max()) + 1
+                    else:
+                        new_id = len(df) + 1
+            except Exception as e:
+                print(f"ID Gen Error: {e}")
+                new_id = random.randint(10000, 99999) # Fallback
+
+        patient["patient_id"] = str(shared_state.store.next_id("patient_id", at_least=new_id))
+
+        # 2. Update Excel
+        try:
+            if os.path.exists(CENSUS_EXCEL_FILE):
+                with metrics.EXCEL_SECONDS.labels("read").time():
+                    df = pd.read_excel(CENSUS_EXCEL_FILE)
+                new_row_df = pd.DataFrame([patient])
+                # Ensure columns match
+                for col in df.columns:
+                    if col not in new_row_df.columns:
+                        new_row_df[col] = None
+                # Reorder columns to match
+                new_row_df = new_row_df[df.columns]
+                df = pd.concat([df, new_row_df], ignore_index=True)
+                with metrics.EXCEL_SECONDS.labels("write").time():
+                    df.to_excel(CENSUS_EXCEL_FILE, index=False)
+            else:
+                with metrics.EXCEL_SECONDS.labels("write").time():
+                    pd.DataFrame([patient]).to_excel(CENSUS_EXCEL_FILE, index=False)
+        except Exception as e:
+            print(f"Excel Update Error: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to update Excel: {str(e)}")
 
 @app.post("/api/v1/patients/add")
 async def add_patient(req: dict):
@@ -250,45 +734,284 @@ async def add_patient(req: dict):
     if not patient:
         raise HTTPException(status_code=400, detail="Missing patient data")
 
-    EXCEL_FILE = "Patient_Clinical_Data.xlsx"
-    new_id = 1
-    if os.path.exists(EXCEL_FILE):
-        try:
-            df = pd.read_excel(EXCEL_FILE)
-            if not df.empty and 'patient_id' in df.columns:
-                # Filter out non-numeric IDs if any, then find max
-                numeric_ids = pd.to_numeric(df['patient_id'], errors='coerce')
-                if not numeric_ids.isna().all():
-                    new_id = int(numeric_ids.max()) + 1
-                else:
-                    new_id = len(df) + 1
-        except Exception as e:
-            print(f"ID Gen Error: {e}")
-            new_id = random.randint(10000, 99999) # Fallback
-    
-    patient["patient_id"] = str(new_id)
+    await asyncio.get_running_loop().run_in_executor(None, _append_to_workbook, patient)
 
-    # 2. Update Excel
+    # 3. Feed the server-side census
     try:
-        if os.path.exists(EXCEL_FILE):
-            df = pd.read_excel(EXCEL_FILE)
-            new_row_df = pd.DataFrame([patient])
-            # Ensure columns match
-            for col in df.columns:
-                if col not in new_row_df.columns:
-                    new_row_df[col] = None
-            # Reorder columns to match
-            new_row_df = new_row_df[df.columns]
-            df = pd.concat([df, new_row_df], ignore_index=True)
-            df.to_excel(EXCEL_FILE, index=False)
-        else:
-             pd.DataFrame([patient]).to_excel(EXCEL_FILE, index=False)
-    except Exception as e:
-        print(f"Excel Update Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to update Excel: {str(e)}")
+        census_patient = PatientData(**patient)
+        record = census.upsert(census_patient, risk_cache.score(census_patient))
+        _patient_changed(record["patient_id"], record)
+        _publish_census_change(record["patient_id"], census_patient)
+    except ValueError as e:
+        print(f"Census Update Skipped: {e}")
 
     return {"success": True, "patient": patient}
 
+@app.get("/api/v1/census/patients", response_model=CensusPage)
+async def query_census(severity: Optional[str] = None, search: Optional[str] = None, sort: str = "final_risk_score",
+                       order: str = "desc", offset: int = 0, limit: int = 50):
+    """
+    One page of the census, filtered by severity and/or a patient_id / diagnosis prefix,
+    sorted by an indexed column, plus population aggregates.
+    """
+    if order not in ("asc", "desc") or offset < 0 or not 0 < limit <= 1000:
+        raise HTTPException(status_code=400, detail="order must be asc/desc, offset >= 0 and 0 < limit <= 1000")
+    census.sync_spec()
+    try:
+        matched, items = census.query(severity, search, sort, order == "desc", offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return CensusPage(matched=matched, offset=offset, limit=limit, items=items, **census.page_aggregates())
+
+@app.get("/api/v1/census/summary", response_model=CensusSummary)
+async def get_census_summary():
+    """
+    Dashboard KPIs in O(1): severity/diet/diagnosis counts, risk mean and variance, risk histograms.
+    """
+    census.sync_spec()
+    return census.aggregates.summary()
+
+@app.put("/api/v1/census/patients", response_model=CensusPatient)
+async def upsert_census_patient(patient: PatientData):
+    """
+    Adds or re-scores one patient in the census (keyed by patient_id).
+    """
+    scoring_spec.refresh()
+    record = census.upsert(patient, risk_cache.score(patient))
+    _patient_changed(record["patient_id"], record)
+    _publish_census_change(record["patient_id"], patient)
+    return record
+
+@app.delete("/api/v1/census/patients/{patient_id}")
+async def discharge_census_patient(patient_id: str):
+    """
+    Discharges a patient from the census.
+    """
+    if not census.discharge(patient_id):
+        raise HTTPException(status_code=404, detail="Patient not in census")
+    broadcaster.patient_discharged(patient_id)
+    history.patients.append(patient_id, None)
+    _publish_census_change(patient_id, None)
+    return {"success": True, "patient_id": patient_id}
+
+@app.post("/api/v1/census/reload")
+async def reload_census():
+    """
+    Rebuilds the census from the patient workbook.
+    """
+    try:
+        census.load_excel()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load census: {str(e)}")
+    broadcaster.resync_all()
+    shared_state.store.publish("census_reload", CENSUS_EXCEL_FILE)
+    return {"success": True, **census.page_aggregates()}
+
+@app.get("/api/v1/stream")
+async def stream_changes(topics: Optional[str] = None):
+    """
+    Server-sent events with only the changes: patient risk/severity deltas and hospital HSI/classification
+    transitions. A `resync` event means the screen fell too far behind and should re-query.
+    """
+    wanted = set(topics.split(",")) if topics else set(PUSH_TOPICS)
+    if not wanted <= set(PUSH_TOPICS):
+        raise HTTPException(status_code=400, detail=f"topics must be a comma-separated subset of {', '.join(PUSH_TOPICS)}")
+    try:
+        subscriber = broadcaster.subscribe(wanted)
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "30"})
+    return StreamingResponse(
+        broadcaster.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/v1/jobs", response_model=ScoringJobStatus, status_code=202)
+async def submit_scoring_job(request: Request, dataset: Optional[str] = None, is_oxygen_crisis: bool = False):
+    """
+    Queues a background scoring run over an uploaded file (CSV, XLSX, Parquet or Arrow IPC,
+    chosen by Content-Type) or a server-side dataset reference. Poll the returned job ID.
+    """
+    import jobs
+    try:
+        if dataset:
+            job_id = jobs.submit_dataset(dataset, is_oxygen_crisis)
+        else:
+            content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+            input_format = jobs.MEDIA_TYPE_FORMATS.get(columnar.resolve_media_type(content_type) or content_type)
+            if input_format is None:
+                raise HTTPException(status_code=415, detail="Unsupported content type for job input")
+            body = await request.body()
+            if not body:
+                raise HTTPException(status_code=400, detail="Provide a request body or a dataset reference")
+            job_id = jobs.submit_upload(body, input_format, is_oxygen_crisis)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return jobs.get_status(job_id)
+
+@app.get("/api/v1/jobs/{job_id}", response_model=ScoringJobStatus)
+async def get_scoring_job(job_id: str):
+    """
+    Reports job progress: rows done, throughput and ETA.
+    """
+    import jobs
+    try:
+        return jobs.get_status(job_id)
+    except jobs.JobNotFound:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@app.get("/api/v1/jobs/{job_id}/results")
+async def get_scoring_job_results(job_id: str, chunk: int = 0):
+    """
+    Returns one chunk of a completed job's results; chunk_count tells how many to fetch.
+    """
+    import jobs
+    try:
+        return jobs.get_result_chunk(job_id, chunk)
+    except jobs.JobNotFound:
+        raise HTTPException(status_code=404, detail="Job or chunk not found")
+    except jobs.JobNotFinished as e:
+        raise HTTPException(status_code=409, detail=f"Job is {e}, results are not ready")
+
+# --- EXPORTS ---
+def _export_response(fmt: str, filename: str, header: List[str], record_chunks) -> StreamingResponse:
+    # The sync generator is drained on the threadpool, so formatting never blocks the loop
+    return StreamingResponse(
+        export.stream(fmt, header, export.record_rows(header, record_chunks)),
+        media_type=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+def _check_export_format(fmt: str):
+    if fmt not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(export.FORMATS)}")
+
+@app.get("/api/v1/export/census")
+async def export_census(fmt: str = Query("csv", alias="format"), severity: Optional[str] = None, search: Optional[str] = None,
+                        sort: str = "final_risk_score", order: str = "desc"):
+    """
+    Streams the scored census (same filters and order as the census query) as CSV or XLSX.
+    """
+    _check_export_format(fmt)
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc/desc")
+    census.sync_spec()
+    try:
+        chunks = census.export_chunks(severity, search, sort, order == "desc", export.EXPORT_CHUNK_ROWS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _export_response(fmt, "census_export", list(CensusPatient.model_fields), chunks)
+
+@app.get("/api/v1/jobs/{job_id}/export")
+async def export_scoring_job(job_id: str, fmt: str = Query("csv", alias="format")):
+    """
+    Streams a completed job's results as CSV or XLSX, one stored chunk at a time.
+    """
+    import jobs
+    _check_export_format(fmt)
+    try:
+        chunks = jobs.result_chunks(job_id)
+    except jobs.JobNotFound:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except jobs.JobNotFinished as e:
+        raise HTTPException(status_code=409, detail=f"Job is {e}, results are not ready")
+    return _export_response(fmt, f"job_{job_id}", list(PatientAnalysisResult.model_fields), chunks)
+
+@app.get("/api/v1/export/hospitals")
+async def export_hospitals(fmt: str = Query("csv", alias="format")):
+    """
+    Current stress results of every hospital with server-owned state, as CSV or XLSX.
+    """
+    _check_export_format(fmt)
+    records = [{**state.result().model_dump(), "critical_patients_count": state.critical_patients_count}
+               for state in list(hospital_registry.hospitals.values())]
+    header = list(HospitalAnalysisResult.model_fields) + ["critical_patients_count"]
+    return _export_response(fmt, "hospital_stress", header, export.chunked(records))
+
+def _history_window(start: str, end: str, limit: int):
+    try:
+        t0, t1 = history.parse_time(start), history.parse_time(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be Unix seconds or ISO-8601")
+    if t1 < t0 or not 0 < limit <= 100_000:
+        raise HTTPException(status_code=400, detail="end must not precede start and 0 < limit <= 100000")
+    return t0, t1
+
+def _history_time(at: str) -> float:
+    try:
+        return history.parse_time(at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="at must be Unix seconds or ISO-8601")
+
+@app.get("/api/v1/history/hospitals/{hospital_id}")
+async def get_hospital_history_at(hospital_id: int, at: str):
+    """
+    A hospital's stress result as it was at one point in time.
+    """
+    state = history.hospitals.at(hospital_id, _history_time(at))
+    if state is None:
+        raise HTTPException(status_code=404, detail="No history for this hospital at that time")
+    return {"hospital_id": hospital_id, **state}
+
+@app.get("/api/v1/history/hospitals/{hospital_id}/range")
+async def get_hospital_history_range(hospital_id: int, start: str, end: str, limit: int = 10_000):
+    """
+    A hospital's state at `start` and every change up to `end`.
+    """
+    t0, t1 = _history_window(start, end, limit)
+    return history.hospitals.range(hospital_id, t0, t1, limit)
+
+@app.get("/api/v1/history/patients/{patient_id}")
+async def get_patient_history_at(patient_id: str, at: str):
+    """
+    A patient's risk result as it was at one point in time.
+    """
+    state = history.patients.at(patient_id, _history_time(at))
+    if state is None:
+        raise HTTPException(status_code=404, detail="No history for this patient at that time")
+    return {"patient_id": patient_id, **state}
+
+@app.get("/api/v1/history/patients/{patient_id}/range")
+async def get_patient_history_range(patient_id: str, start: str, end: str, limit: int = 10_000):
+    """
+    A patient's risk result at `start` and every change up to `end`.
+    """
+    t0, t1 = _history_window(start, end, limit)
+    return history.patients.range(patient_id, t0, t1, limit)
+
+@app.get("/api/v1/history/snapshot")
+async def get_history_snapshot(at: str):
+    """
+    Incident review: every hospital's HSI/classification and the patient severity counts at one point in time.
+    """
+    t = _history_time(at)
+    patients = history.patients.states_at(t)
+    severity_counts = {}
+    for state in patients.values():
+        severity_counts[state["severity_class"]] = severity_counts.get(state["severity_class"], 0) + 1
+    critical = scoring_spec.current().severity_labels[-1]
+    return {
+        "at": t,
+        "hospitals": history.hospitals.states_at(t),
+        "patients": len(patients),
+        "severity_counts": severity_counts,
+        "critical_count": severity_counts.get(critical, 0),
+    }
+
+@app.get("/api/v1/history/stats")
+async def get_history_stats():
+    """
+    Block counts and on-disk size of the history stores.
+    """
+    return {"hospitals": history.hospitals.stats(), "patients": history.patients.stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus text exposition: route latency, engine stages, Excel/DB/email timings, loop lag.
+    """
+    return Response(content=metrics.render_latest(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,224 @@
+"""
+Minimal Prometheus text-format metrics shared by both apps (no client library needed).
+Updates happen on the event loop thread and cost a dict lookup plus a bisect,
+so everything here is meant to stay enabled in production.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values, **kwargs):
+        key = tuple(str(v) for v in values) if values else tuple(str(kwargs[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels(*[""] * len(self.labelnames)) if self.labelnames else self.labels()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return "\n".join(lines)
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_label_str(self.labelnames, key)} {child.value}"]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, key, child):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {child.sum}")
+        lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+REGISTRY = []
+
+def render_latest() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+# --- METRICS ---
+REQUEST_SECONDS = Histogram("carepulse_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+REQUESTS_IN_PROGRESS = Gauge("carepulse_http_requests_in_progress", "HTTP requests currently being served")
+ENGINE_SECONDS = Histogram("carepulse_engine_stage_duration_seconds", "Scoring engine stage duration", ("stage",), FAST_BUCKETS)
+ENGINE_ITEMS = Counter("carepulse_engine_items_total", "Patients or hospitals processed per engine stage", ("stage",))
+EXCEL_SECONDS = Histogram("carepulse_excel_io_duration_seconds", "Patient workbook read/write duration", ("operation",))
+DB_QUERY_SECONDS = Histogram("carepulse_db_query_duration_seconds", "SQL statement duration", ("database",), FAST_BUCKETS)
+EMAIL_QUEUE_DEPTH = Gauge("carepulse_email_queue_depth", "Outgoing emails waiting on SMTP")
+EMAIL_SECONDS = Histogram("carepulse_email_send_duration_seconds", "SMTP send duration", ("outcome",))
+EVENT_LOOP_LAG = Gauge("carepulse_event_loop_lag_seconds", "Most recent event loop scheduling delay")
+EVENT_LOOP_LAG_SECONDS = Histogram("carepulse_event_loop_lag_distribution_seconds", "Event loop scheduling delay", (), FAST_BUCKETS)
+PUSH_SUBSCRIBERS = Gauge("carepulse_push_subscribers", "Open push (SSE) subscriptions")
+PUSH_EVENTS = Counter("carepulse_push_events_total", "Push events per subscriber by outcome", ("outcome",))
+TRANSPORT_BYTES = Counter("carepulse_transport_bytes_total", "Request/response bytes on the wire and decoded, by Content-Encoding", ("direction", "encoding", "stage"))
+
+@contextmanager
+def engine_stage(stage: str, items: int = 1):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ENGINE_SECONDS.labels(stage).observe(time.perf_counter() - t0)
+        ENGINE_ITEMS.labels(stage).inc(items)
+
+@contextmanager
+def email_send():
+    """Tracks one outgoing email; set the yielded dict's "ok" to False on failure."""
+    outcome = {"ok": True}
+    EMAIL_QUEUE_DEPTH.inc()
+    t0 = time.perf_counter()
+    try:
+        yield outcome
+    finally:
+        EMAIL_QUEUE_DEPTH.dec()
+        EMAIL_SECONDS.labels("sent" if outcome["ok"] else "failed").observe(time.perf_counter() - t0)
+
+def instrument_sqlalchemy(engine, database: str):
+    """Times every statement executed through a SQLAlchemy engine."""
+    from sqlalchemy import event
+    histogram = DB_QUERY_SECONDS.labels(database)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("carepulse_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        histogram.observe(time.perf_counter() - conn.info["carepulse_query_start"].pop())
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Background task: how late does a sleep(interval) wake up?"""
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - t0 - interval)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; labels by route template so path params do not explode cardinality."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status["code"]
+            ).observe(time.perf_counter() - t0)
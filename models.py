@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 class PatientData(BaseModel):
     patient_id: str
@@ -57,3 +57,179 @@ class HospitalAnalysisResult(BaseModel):
     global_system_classification: str
     bed_allocation_action: str
     er_routing_action: str
+    oxygen_hours_to_crisis: Optional[float] = None
+
+class ScoringJobStatus(BaseModel):
+    job_id: str
+    status: str
+    source: str
+    rows_total: Optional[int] = None
+    rows_done: int
+    chunks_done: int
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class CensusPatient(PatientData):
+    base_score: float
+    final_risk_score: float
+    severity_class: str
+    diet_recommendation: str
+    target_room_temperature: float
+
+class CensusPage(BaseModel):
+    total: int
+    matched: int
+    offset: int
+    limit: int
+    items: List[CensusPatient]
+    severity_counts: Dict[str, int]
+    average_risk_score: float
+
+class RunningStatsSummary(BaseModel):
+    count: int
+    mean: float
+    variance: float
+    std: float
+
+class HistogramBin(BaseModel):
+    range: str
+    count: int
+
+class CensusSummary(BaseModel):
+    total: int
+    severity_counts: Dict[str, int]
+    diet_counts: Dict[str, int]
+    diagnosis_counts: Dict[str, int]
+    final_risk_score: RunningStatsSummary
+    base_score: RunningStatsSummary
+    final_risk_histogram: List[HistogramBin]
+    base_score_histogram: List[HistogramBin]
+
+class NetworkHospital(HospitalData):
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+
+class EmergencyCase(BaseModel):
+    case_id: str
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    needs_icu: bool = False
+
+class DiversionAssignment(BaseModel):
+    case_id: str
+    hospital_id: Optional[int] = None
+    distance_km: Optional[float] = None
+    hospital_stress_index: Optional[float] = None
+    action: str
+
+class NetworkHospitalState(BaseModel):
+    hospital_id: int
+    er_occupied: int
+    er_capacity: int
+    icu_beds_occupied: int
+    icu_beds_total: int
+    hospital_stress_index: float
+    accepting: bool
+
+class SimulationConfig(BaseModel):
+    runs: int = Field(default=2000, ge=1, le=500_000)
+    horizon_hours: int = Field(default=72, ge=1, le=24 * 30)
+    seed: int = 42
+    arrival_rate_per_hour: float = Field(default=4.0, ge=0)
+    surge_probability: float = Field(default=0.3, ge=0, le=1)
+    surge_multiplier: float = Field(default=3.0, ge=1)
+    surge_duration_hours: float = Field(default=12.0, gt=0)
+    # Share of the census pushed into emergency status when a surge hits (the dashboard's 15%)
+    surge_census_fraction: float = Field(default=0.15, ge=0, le=1)
+    ward_admission_fraction: float = Field(default=0.3, ge=0, le=1)
+    er_length_of_stay_hours: float = Field(default=4.0, gt=0)
+    icu_length_of_stay_hours: float = Field(default=96.0, gt=0)
+    ward_length_of_stay_hours: float = Field(default=120.0, gt=0)
+    oxygen_base_consumption_per_hour: float = Field(default=0.2, ge=0)
+    oxygen_consumption_per_ventilated_hour: float = Field(default=0.01, ge=0)
+    oxygen_disruption_probability: float = Field(default=0.1, ge=0, le=1)
+    oxygen_resupply_probability_per_hour: float = Field(default=0.05, ge=0, le=1)
+
+class SimulationRequest(BaseModel):
+    hospital: HospitalData
+    config: SimulationConfig = SimulationConfig()
+    # Defaults to the server-side census when omitted
+    patients: Optional[List[PatientData]] = None
+
+class DistributionSummary(BaseModel):
+    mean: float
+    p5: float
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+    max: float
+
+class SimulationResult(BaseModel):
+    runs: int
+    horizon_hours: int
+    census_size: int
+    seconds: float
+    peak_icu_shortfall: DistributionSummary
+    peak_ventilator_shortfall: DistributionSummary
+    peak_hsi: DistributionSummary
+    final_hsi: DistributionSummary
+    min_oxygen_percent: DistributionSummary
+    oxygen_crisis_hours: DistributionSummary
+    probabilities: Dict[str, float]
+
+class OxygenReading(BaseModel):
+    # Unix seconds; stamped on arrival when omitted
+    timestamp: Optional[float] = None
+    oxygen_supply_level_percent: float = Field(ge=0, le=100)
+    ventilators_in_use: int = Field(default=0, ge=0)
+    icu_beds_occupied: int = Field(default=0, ge=0)
+
+class OxygenForecast(BaseModel):
+    hospital_id: int
+    as_of: float
+    oxygen_supply_level_percent: float
+    consumption_rate_per_hour: Optional[float]
+    hours_to_crisis: Optional[float]
+    hours_to_empty: Optional[float]
+    observations: int
+    resupplies: int
+    coefficients: Dict[str, float]
+
+class HospitalEvent(BaseModel):
+    # bed_occupied/freed, icu_admit/discharge, er_arrival/departure, ventilator_in_use/released,
+    # operation_started/finished, doctor_on/off_shift, patient_critical/stabilized, oxygen_reading
+    type: str
+    count: int = Field(default=1, ge=1)
+    # oxygen_reading only: supply level in percent
+    value: Optional[float] = None
+    # oxygen_reading only: Unix seconds, stamped on arrival when omitted
+    timestamp: Optional[float] = None
+
+class HospitalStateSnapshot(BaseModel):
+    hospital: HospitalData
+    ventilators_in_use: int
+    critical_patients_count: int
+    events_applied: int
+    stress: HospitalAnalysisResult
+
+class ERQueueEntry(BaseModel):
+    patient_id: str
+    final_risk_score: float
+    severity_class: str
+    emergency_case_flag: int = 0
+    # Unix seconds; stamped on arrival when omitted
+    arrival_time: Optional[float] = None
+
+class ERQueueStatus(BaseModel):
+    hospital_id: int
+    waiting: int
+    er_routing_action: Optional[str] = None
+    entries: List[ERQueueEntry]
+
+class ERDecision(BaseModel):
+    hospital_id: int
+    patient: ERQueueEntry
+    waiting: int
+    er_routing_action: Optional[str] = None
@@ -0,0 +1,192 @@
+"""
+Oxygen depletion forecasting from a hospital's reading history.
+
+Consumption is modelled as a linear rate in percent per hour:
+    rate = c0 + c1 * ventilators_in_use + c2 * icu_beds_occupied
+fitted by recursive least squares with a forgetting factor, so every reading is an O(1)
+update (3x3 covariance) and the fit follows slow drift in per-patient consumption.
+Rises in the level (a resupply) re-anchor the series without contributing a rate sample.
+
+The forecast (rate at the latest occupancy, hours until OXYGEN_CRISIS_LEVEL and until empty)
+is recomputed when a reading is ingested and read back as-is by the stress endpoint.
+Each hospital's model is saved to shared_state (kv "oxygen:<id>") and published on the change
+feed after every batch, so all workers forecast from the same fit.
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+from engine import OXYGEN_CRISIS_LEVEL
+from models import OxygenReading
+import shared_state
+
+# 1.0 = never forget; 0.98 gives the last ~50 intervals most of the weight
+FORGETTING_FACTOR = float(os.getenv("OXYGEN_FORGETTING_FACTOR", 0.98))
+# Rate samples needed before a forecast is published
+MIN_OBSERVATIONS = int(os.getenv("OXYGEN_MIN_OBSERVATIONS", 3))
+INITIAL_COVARIANCE = 1000.0
+N_FEATURES = 3
+
+def _features(ventilators_in_use: float, icu_beds_occupied: float) -> List[float]:
+    return [1.0, ventilators_in_use, icu_beds_occupied]
+
+class ConsumptionModel:
+    """Recursive least squares over the consumption features."""
+
+    def __init__(self, forgetting: float = FORGETTING_FACTOR):
+        self.forgetting = forgetting
+        self.theta = [0.0] * N_FEATURES
+        self.P = [[INITIAL_COVARIANCE if i == j else 0.0 for j in range(N_FEATURES)] for i in range(N_FEATURES)]
+        self.observations = 0
+
+    def predict(self, x: List[float]) -> float:
+        return sum(t * xi for t, xi in zip(self.theta, x))
+
+    def update(self, x: List[float], rate: float):
+        lam, P = self.forgetting, self.P
+        Px = [sum(P[i][j] * x[j] for j in range(N_FEATURES)) for i in range(N_FEATURES)]
+        denom = lam + sum(x[i] * Px[i] for i in range(N_FEATURES))
+        gain = [v / denom for v in Px]
+        error = rate - self.predict(x)
+        self.theta = [t + g * error for t, g in zip(self.theta, gain)]
+        # P = (P - k x'P) / lambda; P stays symmetric so x'P == (Px)'
+        self.P = [[(P[i][j] - gain[i] * Px[j]) / lam for j in range(N_FEATURES)] for i in range(N_FEATURES)]
+        self.observations += 1
+
+    def to_dict(self) -> dict:
+        return {"forgetting": self.forgetting, "theta": self.theta, "P": self.P, "observations": self.observations}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConsumptionModel":
+        model = cls(data["forgetting"])
+        model.theta, model.P, model.observations = data["theta"], data["P"], data["observations"]
+        return model
+
+class HospitalOxygenState:
+    def __init__(self, hospital_id: int):
+        self.hospital_id = hospital_id
+        self.model = ConsumptionModel()
+        self.last: Optional[OxygenReading] = None
+        self.resupplies = 0
+        self.forecast: Optional[dict] = None
+
+    def ingest(self, reading: OxygenReading):
+        last = self.last
+        if last is not None:
+            hours = (reading.timestamp - last.timestamp) / 3600.0
+            drop = last.oxygen_supply_level_percent - reading.oxygen_supply_level_percent
+            if drop < 0:
+                self.resupplies += 1
+            else:
+                # Occupancy over the interval: mean of both ends
+                x = _features(
+                    (last.ventilators_in_use + reading.ventilators_in_use) / 2,
+                    (last.icu_beds_occupied + reading.icu_beds_occupied) / 2,
+                )
+                self.model.update(x, drop / hours)
+        self.last = reading
+        self._refresh_forecast()
+
+    def to_dict(self) -> dict:
+        return {"model": self.model.to_dict(), "last": self.last.model_dump(), "resupplies": self.resupplies}
+
+    @classmethod
+    def from_dict(cls, hospital_id: int, data: dict) -> "HospitalOxygenState":
+        state = cls(hospital_id)
+        state.model = ConsumptionModel.from_dict(data["model"])
+        state.last = OxygenReading(**data["last"])
+        state.resupplies = data["resupplies"]
+        state._refresh_forecast()
+        return state
+
+    def _refresh_forecast(self):
+        reading = self.last
+        level = reading.oxygen_supply_level_percent
+        rate = None
+        hours_to_crisis = hours_to_empty = None
+        if self.model.observations >= MIN_OBSERVATIONS:
+            rate = max(0.0, self.model.predict(_features(reading.ventilators_in_use, reading.icu_beds_occupied)))
+            if rate > 0:
+                hours_to_crisis = max(0.0, (level - OXYGEN_CRISIS_LEVEL) / rate)
+                hours_to_empty = level / rate
+        self.forecast = {
+            "hospital_id": self.hospital_id,
+            "as_of": reading.timestamp,
+            "oxygen_supply_level_percent": level,
+            "consumption_rate_per_hour": None if rate is None else round(rate, 4),
+            "hours_to_crisis": None if hours_to_crisis is None else round(hours_to_crisis, 2),
+            "hours_to_empty": None if hours_to_empty is None else round(hours_to_empty, 2),
+            "observations": self.model.observations,
+            "resupplies": self.resupplies,
+            "coefficients": {
+                "base": round(self.model.theta[0], 5),
+                "per_ventilator": round(self.model.theta[1], 5),
+                "per_icu_bed": round(self.model.theta[2], 5),
+            },
+        }
+
+KEY_PREFIX = "oxygen:"
+
+class OxygenForecaster:
+    def __init__(self, store: shared_state.SharedState = shared_state.store):
+        self.hospitals: Dict[int, HospitalOxygenState] = {}
+        self.store = store
+        store.subscribe("oxygen", self._changed_elsewhere)
+
+    def load(self):
+        """Picks up the models other workers have saved (at startup)."""
+        for key, data in self.store.items(KEY_PREFIX):
+            hospital_id = int(key[len(KEY_PREFIX):])
+            self.hospitals[hospital_id] = HospitalOxygenState.from_dict(hospital_id, data)
+
+    def _save(self, hospital_id: int, state: Optional[HospitalOxygenState]):
+        data = None if state is None else state.to_dict()
+        if data is None:
+            self.store.delete(f"{KEY_PREFIX}{hospital_id}")
+        else:
+            self.store.put(f"{KEY_PREFIX}{hospital_id}", data)
+        self.store.publish("oxygen", hospital_id, data)
+
+    def _changed_elsewhere(self, key: str, data: Optional[dict]):
+        hospital_id = int(key)
+        if data is None:
+            self.hospitals.pop(hospital_id, None)
+        else:
+            self.hospitals[hospital_id] = HospitalOxygenState.from_dict(hospital_id, data)
+
+    def ingest(self, hospital_id: int, readings: List[OxygenReading]) -> dict:
+        """
+        Readings must be strictly after each other and after the last ingested one; a reading
+        without a timestamp is stamped now. The batch is checked before anything is applied.
+        """
+        state = self.hospitals.get(hospital_id)
+        now = time.time()
+        readings = [r if r.timestamp is not None else r.model_copy(update={"timestamp": now}) for r in readings]
+        previous = state.last.timestamp if state is not None and state.last is not None else None
+        for reading in readings:
+            if previous is not None and reading.timestamp <= previous:
+                raise ValueError(f"Reading at {reading.timestamp} is not after the previous one ({previous})")
+            previous = reading.timestamp
+
+        if state is None:
+            state = self.hospitals[hospital_id] = HospitalOxygenState(hospital_id)
+        for reading in readings:
+            state.ingest(reading)
+        self._save(hospital_id, state)
+        return state.forecast
+
+    def forecast(self, hospital_id: int) -> Optional[dict]:
+        state = self.hospitals.get(hospital_id)
+        return None if state is None else state.forecast
+
+    def hours_to_crisis(self, hospital_id: int) -> Optional[float]:
+        forecast = self.forecast(hospital_id)
+        return None if forecast is None else forecast["hours_to_crisis"]
+
+    def reset(self, hospital_id: int) -> bool:
+        if self.hospitals.pop(hospital_id, None) is None:
+            return False
+        self._save(hospital_id, None)
+        return True
+
+forecaster = OxygenForecaster()
@@ -0,0 +1,197 @@
+"""
+On-demand profiling of a live worker process.
+
+Two collectors:
+  - "sample":   a daemon thread reads every thread's stack from sys._current_frames()
+                every interval and counts collapsed stacks (flamegraph.pl / speedscope input).
+  - "cprofile": deterministic cProfile on the event loop thread, returned as a pstats dump.
+                Sync endpoints run in the threadpool and only show up in "sample" mode.
+
+A session runs for N seconds, or for the next N requests whose path matches a route
+template (collectors are only active while such a request is in flight). With no
+session, the middleware is a single attribute check and no thread or hook exists.
+Each uvicorn worker profiles itself only.
+"""
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from starlette.routing import compile_path
+
+MODES = ("sample", "cprofile")
+MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", 300))
+DEFAULT_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+
+class ProfilerBusy(Exception):
+    pass
+
+class ProfileNotReady(Exception):
+    pass
+
+class ProfileSession:
+    def __init__(self, mode: str, seconds: Optional[float], route: Optional[str], requests: Optional[int], interval_ms: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.route = route
+        self.route_regex = compile_path(route)[0] if route else None
+        self.requests_target = requests
+        self.requests_seen = 0
+        self.in_flight = 0
+        self.interval = interval_ms / 1000.0
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + min(seconds or MAX_SECONDS, MAX_SECONDS)
+        self.finished_at: Optional[float] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._profile: Optional[cProfile.Profile] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    def start(self):
+        if self.mode == "sample":
+            self._thread = threading.Thread(target=self._sample_loop, name="carepulse-profiler", daemon=True)
+            self._thread.start()
+        else:
+            self._profile = cProfile.Profile()
+            if self.route_regex is None:
+                self._profile.enable()
+        # Deadline enforcement runs on the loop thread so cProfile is disabled where it was enabled
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(max(0.0, self.deadline - time.monotonic()), self.finish)
+
+    def finish(self):
+        if not self.running:
+            return
+        self.finished_at = time.time()
+        if self._timer is not None:
+            self._timer.cancel()
+        self._stop.set()
+        if self._profile is not None:
+            self._profile.disable()
+
+    # --- route mode hooks (called by the middleware on the loop thread) ---
+    def request_started(self):
+        self.in_flight += 1
+        if self._profile is not None and self.in_flight == 1:
+            self._profile.enable()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        self.requests_seen += 1
+        if self._profile is not None and self.in_flight == 0:
+            self._profile.disable()
+        if self.requests_seen >= self.requests_target:
+            self.finish()
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.route_regex is not None and self.in_flight == 0:
+                continue
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def status(self) -> dict:
+        return {
+            "session_id": self.id,
+            "mode": self.mode,
+            "running": self.running,
+            "route": self.route,
+            "requests_target": self.requests_target,
+            "requests_seen": self.requests_seen,
+            "samples": self.samples,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def artifact(self):
+        """Returns (content, media_type, filename)."""
+        if self.mode == "sample":
+            lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+            return "\n".join(lines) + "\n", "text/plain", f"profile-{self.id}.collapsed"
+        stats = pstats.Stats(self._profile, stream=io.StringIO())
+        return marshal.dumps(stats.stats), "application/octet-stream", f"profile-{self.id}.pstats"
+
+# --- MODULE STATE ---
+_active: Optional[ProfileSession] = None
+_last: Optional[ProfileSession] = None
+
+def start(mode: str = "sample", seconds: Optional[float] = None, route: Optional[str] = None,
+          requests: Optional[int] = None, interval_ms: float = DEFAULT_INTERVAL_MS) -> dict:
+    """Must be called from the event loop (i.e. from an endpoint)."""
+    global _active, _last
+    if _active is not None and _active.running:
+        raise ProfilerBusy(_active.id)
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    if (seconds is None) == (route is None):
+        raise ValueError("Give either seconds, or a route with a request count")
+    if seconds is not None and not 0 < seconds <= MAX_SECONDS:
+        raise ValueError(f"seconds must be in (0, {MAX_SECONDS:g}]")
+    if route is not None and (not requests or requests < 1):
+        raise ValueError("requests must be a positive count when profiling a route")
+    if interval_ms <= 0:
+        raise ValueError("interval_ms must be positive")
+
+    session = ProfileSession(mode, seconds, route, requests if route else None, interval_ms)
+    session.start()
+    _active = _last = session
+    return session.status()
+
+def stop() -> Optional[dict]:
+    global _active
+    session, _active = _active, None
+    if session is None or not session.running:
+        return None
+    session.finish()
+    return session.status()
+
+def status() -> Optional[dict]:
+    return _last.status() if _last else None
+
+def result():
+    """(content, media_type, filename) of the most recent session."""
+    if _last is None:
+        raise LookupError("No profile has been recorded")
+    if _last.running:
+        raise ProfileNotReady(_last.id)
+    return _last.artifact()
+
+class ProfilerMiddleware:
+    """Feeds route-scoped sessions; a no-op unless such a session is running."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = _active
+        if session is None or session.route_regex is None or not session.running or scope["type"] != "http" \
+                or not session.route_regex.match(scope["path"]):
+            return await self.app(scope, receive, send)
+        session.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.request_finished()
@@ -0,0 +1,145 @@
+"""
+Push channel for dashboard screens: only deltas are sent, never whole result sets.
+
+  - patient events when a patient's final_risk_score or severity_class changes (or on discharge)
+  - hospital events when a hospital's HSI or system classification changes
+
+Every subscriber owns a bounded buffer keyed by entity, so a slow screen that misses several
+updates of the same patient receives only the latest one (coalescing). If more distinct entities
+than SUBSCRIBER_BUFFER change before it reads, the buffer is dropped and a single resync event tells
+the screen to re-query the census instead. Publishing is O(subscribers) dict writes and a
+wakeup; each wakeup drains the whole buffer in one write.
+"""
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+import metrics
+
+TOPICS = ("patient", "hospital")
+SUBSCRIBER_BUFFER = int(os.getenv("PUSH_SUBSCRIBER_BUFFER", 1000))
+MAX_SUBSCRIBERS = int(os.getenv("PUSH_MAX_SUBSCRIBERS", 1000))
+HEARTBEAT_SECONDS = float(os.getenv("PUSH_HEARTBEAT_SECONDS", 15))
+
+class TooManySubscribers(Exception):
+    pass
+
+class Subscriber:
+    def __init__(self, topics: Set[str], capacity: int = SUBSCRIBER_BUFFER):
+        self.topics = topics
+        self.capacity = capacity
+        self.pending: "OrderedDict[Tuple[str, object], dict]" = OrderedDict()
+        self.resync = False
+        self.wakeup = asyncio.Event()
+
+    def offer(self, topic: str, key, event: dict):
+        if topic not in self.topics:
+            return
+        slot = (topic, key)
+        if slot in self.pending:
+            # Keeps its place in the queue, carries the newest values
+            self.pending[slot] = event
+            metrics.PUSH_EVENTS.labels("coalesced").inc()
+            return
+        if len(self.pending) >= self.capacity:
+            metrics.PUSH_EVENTS.labels("dropped").inc(len(self.pending))
+            self.pending.clear()
+            self.resync = True
+        self.pending[slot] = event
+        self.wakeup.set()
+
+    def request_resync(self):
+        self.pending.clear()
+        self.resync = True
+        self.wakeup.set()
+
+    def drain(self) -> str:
+        """Everything buffered as one block of SSE frames."""
+        self.wakeup.clear()
+        frames = []
+        if self.resync:
+            frames.append("event: resync\ndata: {}\n\n")
+            self.resync = False
+        for (topic, _), event in self.pending.items():
+            frames.append(f"id: {event['seq']}\nevent: {topic}\ndata: {json.dumps(event)}\n\n")
+        metrics.PUSH_EVENTS.labels("delivered").inc(len(self.pending))
+        self.pending.clear()
+        return "".join(frames)
+
+class Broadcaster:
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        # Last published values, so re-scoring an unchanged patient/hospital stays silent
+        self.patients: Dict[str, Tuple[float, str]] = {}
+        self.hospitals: Dict[int, Tuple[float, str]] = {}
+        self.sequence = 0
+
+    def subscribe(self, topics: Optional[Set[str]] = None) -> Subscriber:
+        if len(self.subscribers) >= MAX_SUBSCRIBERS:
+            raise TooManySubscribers()
+        subscriber = Subscriber(set(topics or TOPICS))
+        self.subscribers.add(subscriber)
+        metrics.PUSH_SUBSCRIBERS.set(len(self.subscribers))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        metrics.PUSH_SUBSCRIBERS.set(len(self.subscribers))
+
+    def _publish(self, topic: str, key, event: dict):
+        self.sequence += 1
+        event["seq"] = self.sequence
+        for subscriber in self.subscribers:
+            subscriber.offer(topic, key, event)
+
+    # --- CHANGE SOURCES ---
+    def patient_scored(self, patient_id: str, final_risk_score: float, severity_class: str):
+        state = (final_risk_score, severity_class)
+        if self.patients.get(patient_id) == state:
+            return
+        self.patients[patient_id] = state
+        self._publish("patient", patient_id, {
+            "patient_id": patient_id, "final_risk_score": final_risk_score, "severity_class": severity_class, "discharged": False,
+        })
+
+    def patient_discharged(self, patient_id: str):
+        self.patients.pop(patient_id, None)
+        self._publish("patient", patient_id, {"patient_id": patient_id, "discharged": True})
+
+    def hospital_evaluated(self, hospital_id: int, hospital_stress_index: float, classification: str, **actions):
+        state = (hospital_stress_index, classification)
+        previous = self.hospitals.get(hospital_id)
+        if previous == state:
+            return
+        self.hospitals[hospital_id] = state
+        self._publish("hospital", hospital_id, {
+            "hospital_id": hospital_id,
+            "hospital_stress_index": hospital_stress_index,
+            "global_system_classification": classification,
+            "previous_classification": None if previous is None else previous[1],
+            **actions,
+        })
+
+    def resync_all(self):
+        """Bulk replacement (census reload): screens re-query instead of receiving n deltas."""
+        self.patients.clear()
+        for subscriber in self.subscribers:
+            subscriber.request_resync()
+
+    async def stream(self, subscriber: Subscriber, heartbeat: float = HEARTBEAT_SECONDS):
+        """SSE body for one subscriber; unsubscribes when the client goes away."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield subscriber.drain()
+        finally:
+            self.unsubscribe(subscriber)
+
+broadcaster = Broadcaster()
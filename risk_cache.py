@@ -0,0 +1,127 @@
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import scoring_spec
+from models import PatientData
+from engine import PatientRisk, score_patient
+
+# Fields that do not influence the score are left out of the cache key
+NON_SCORING_FIELDS = {"patient_id", "gender", "admission_type", "diagnosis_category"}
+SCORING_FIELDS = tuple(name for name in PatientData.model_fields if name not in NON_SCORING_FIELDS)
+
+CacheKey = Tuple
+
+class RiskCache:
+    """
+    Bounded LRU memo of engine.score_patient keyed on the scoring inputs.
+    A max_size of 0 disables caching (and bulk de-duplication) entirely.
+    """
+
+    def __init__(self, max_size: int = 0):
+        self.max_size = max_size
+        self._entries: "OrderedDict[CacheKey, PatientRisk]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.deduplicated = 0
+        self._spec = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def key(patient: PatientData, is_oxygen_crisis: bool) -> CacheKey:
+        values = patient.__dict__
+        # Only male/non-male matters for the hemoglobin bounds
+        return (is_oxygen_crisis, patient.gender.lower() == "male") + tuple(values[name] for name in SCORING_FIELDS)
+
+    def get(self, key: CacheKey) -> Optional[PatientRisk]:
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: CacheKey, result: PatientRisk):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def _sync_spec(self):
+        # Entries computed under a previous scoring spec are stale
+        spec = scoring_spec.current()
+        if spec is not self._spec:
+            self._entries.clear()
+            self._spec = spec
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "deduplicated": self.deduplicated,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def score(self, patient: PatientData, is_oxygen_crisis: bool = False) -> PatientRisk:
+        if not self.enabled:
+            return score_patient(patient, is_oxygen_crisis)
+        self._sync_spec()
+        key = self.key(patient, is_oxygen_crisis)
+        cached = self.get(key)
+        if cached is not None:
+            return _for_patient(cached, patient)
+        result = score_patient(patient, is_oxygen_crisis)
+        self.put(key, result)
+        return result
+
+    def plan_bulk(self, patients: List[PatientData], is_oxygen_crisis: bool):
+        """
+        Resolves cache hits and collapses identical rows. Returns (keys, results, todo)
+        where todo holds one representative patient per key that still needs scoring.
+        """
+        self._sync_spec()
+        keys = []
+        results: List[Optional[PatientRisk]] = [None] * len(patients)
+        todo: Dict[CacheKey, PatientData] = {}
+        for i, patient in enumerate(patients):
+            key = self.key(patient, is_oxygen_crisis)
+            keys.append(key)
+            if key in todo:
+                self.deduplicated += 1
+                continue
+            cached = self.get(key)
+            if cached is not None:
+                results[i] = _for_patient(cached, patient)
+            else:
+                todo[key] = patient
+        return keys, results, todo
+
+    def finish_bulk(self, patients, keys, results, todo, scored: List[PatientRisk]) -> List[PatientRisk]:
+        by_key = dict(zip(todo.keys(), scored))
+        for key, result in by_key.items():
+            self.put(key, result)
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = _for_patient(by_key[keys[i]], patients[i])
+        return results
+
+def _for_patient(result: PatientRisk, patient: PatientData) -> PatientRisk:
+    if result.patient_id == patient.patient_id:
+        return result
+    return result.with_patient_id(patient.patient_id)
+
+risk_cache = RiskCache(int(os.getenv("RISK_CACHE_SIZE", 0)))
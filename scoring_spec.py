@@ -0,0 +1,185 @@
+import json
+import math
+import os
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from models import PatientData
+
+SPEC_PATH = os.getenv("SCORING_SPEC_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_spec.json"))
+# How often (seconds) refresh() looks at the spec file's mtime
+SPEC_CHECK_INTERVAL = float(os.getenv("SCORING_SPEC_CHECK_INTERVAL", 2.0))
+
+# Derived input: mean arterial pressure from the systolic/diastolic pair
+MAP_INPUT = "map"
+NUMERIC_INPUTS = {name for name, field in PatientData.model_fields.items() if field.annotation in (int, float)}
+INTEGER_INPUTS = {name for name, field in PatientData.model_fields.items() if field.annotation is int}
+# MAP = (systolic + 2 * diastolic) / 3: integer BP pairs only reach multiples of 1/3
+MAP_FOLD = 3
+# Lookup tables cover 0..LUT_SPAN * (largest finite bound); larger specs keep the closed form only
+LUT_SPAN = 2
+LUT_MAX_ENTRIES = int(os.getenv("SCORING_LUT_MAX_ENTRIES", 4096))
+
+class SpecError(ValueError):
+    pass
+
+class CompiledSpec:
+    """
+    Scoring spec flattened into coefficient tuples (scalar path) and arrays (batch path).
+    Each component is a bounded deviation; a missing bound compiles to +/-inf, so the
+    one-sided SpO2/age/hydration indexes need no special case.
+    Row layout: (input, n_min, n_max, 1/(n_min - c_min), 1/(c_max - n_max), weight, is_map, lut).
+
+    Integer-valued inputs (heart rate, respiratory rate, age) and MAP also get lookup tables of
+    their weighted contribution, computed once with the same arithmetic as the closed form so
+    results are bit-identical. Scalar: lut maps input value -> contribution (MAP keyed by
+    k / 3.0). Batch: luts[k] is a (2, size) array indexed by gender row and integer key (MAP
+    keyed by systolic + 2 * diastolic). Values off the table fall back to the closed form.
+    """
+
+    def __init__(self, raw: dict, mtime: float = 0.0, lut_max_entries: int = LUT_MAX_ENTRIES):
+        self.raw = raw
+        self.mtime = mtime
+        self.version = raw.get("version", 1)
+
+        components = raw["components"]
+        self.component_names = tuple(c["name"] for c in components)
+        self.inputs = tuple(_check_input(c["input"]) for c in components)
+        rows_male = [_compile_row(c, "male") for c in components]
+        rows_other = [_compile_row(c, "other") for c in components]
+
+        weight_sum = sum(row[5] for row in rows_male)
+        if abs(weight_sum - 1.0) > 1e-9:
+            raise SpecError(f"Component weights must sum to 1.0, got {weight_sum}")
+
+        # Batch coefficients: row 0 = male, row 1 = other
+        def coeffs(i):
+            return np.array([[row[i] for row in rows_male], [row[i] for row in rows_other]], dtype=np.float64)
+        self.n_min, self.n_max, self.inv_lo, self.inv_hi, self.weights = (coeffs(i) for i in range(1, 6))
+
+        # Lookup tables (None where the input is not integer-valued or the table would be too large)
+        self.luts = tuple(_compile_lut(male, other, lut_max_entries) for male, other in zip(rows_male, rows_other))
+        self.lut_gender_neutral = tuple(lut is not None and np.array_equal(lut[0], lut[1]) for lut in self.luts)
+        self.rows_male = tuple(_attach_lut(row, lut, 0) for row, lut in zip(rows_male, self.luts))
+        self.rows_other = tuple(_attach_lut(row, lut, 1) for row, lut in zip(rows_other, self.luts))
+
+        mods = raw["modifiers"]
+        self.chronic_multiplier = float(mods["chronic_multiplier"])
+        self.emergency_bonus = float(mods["emergency_bonus"])
+        self.score_cap = float(mods["score_cap"])
+        self.icu_floor = float(mods["icu_floor"])
+        self.oxygen_crisis_amplifier = float(mods["oxygen_crisis_amplifier"])
+
+        severity = raw["severity"]
+        self.severity_thresholds = tuple(float(t) for t in severity["thresholds"])
+        self.severity_labels = tuple(severity["labels"])
+        if len(self.severity_labels) != len(self.severity_thresholds) + 1 or list(self.severity_thresholds) != sorted(self.severity_thresholds):
+            raise SpecError("Severity needs ascending thresholds and one more label than thresholds")
+        # Top band is the one the oxygen amplifier and ICU floor refer to
+        self.critical_threshold = self.severity_thresholds[-1]
+        self.critical_index = len(self.severity_thresholds)
+        self.severity_label_array = np.array(self.severity_labels, dtype=object)
+
+        room = raw["room_temperature"]
+        self.room_baseline = float(room["baseline"])
+        self.room_fever_threshold = float(room["fever_threshold"])
+        self.room_fever_temperature = self.room_baseline + float(room["fever_adjustment"])
+
+        diet = raw["diet"]
+        self.diet_rules = tuple((_check_input(r["input"]), float(r["above"]), r["label"]) for r in diet["rules"])
+        self.diet_default = diet["default"]
+        self.diet_label_array = np.array([r[2] for r in self.diet_rules] + [self.diet_default], dtype=object)
+
+    def to_dict(self) -> dict:
+        return self.raw
+
+def _check_input(name: str) -> str:
+    if name != MAP_INPUT and name not in NUMERIC_INPUTS:
+        raise SpecError(f"Unknown scoring input: {name}")
+    return name
+
+def _bound(value, default: float) -> float:
+    return default if value is None else float(value)
+
+def _compile_row(component: dict, gender: str) -> Tuple:
+    ranges = component["by_gender"][gender] if "by_gender" in component else component
+    n_min = _bound(ranges["normal"][0], -math.inf)
+    n_max = _bound(ranges["normal"][1], math.inf)
+    c_min = _bound(ranges["critical"][0], -math.inf)
+    c_max = _bound(ranges["critical"][1], math.inf)
+    if not (c_min <= n_min <= n_max <= c_max) or (c_min == n_min != -math.inf) or (c_max == n_max != math.inf):
+        raise SpecError(f"Component {component['name']}: normal range must sit strictly inside the critical range")
+    inv_lo = 0.0 if math.isinf(n_min) else 1.0 / (n_min - c_min)
+    inv_hi = 0.0 if math.isinf(n_max) else 1.0 / (c_max - n_max)
+    return (component["input"], n_min, n_max, inv_lo, inv_hi, float(component["weight"]), component["input"] == MAP_INPUT)
+
+def component_contribution(x, n_min, n_max, inv_lo, inv_hi, weight):
+    """Weighted bounded deviation, weight * min(1, d^2), for arrays of inputs (closed form)."""
+    # inf * 0 on the side of a one-sided component is discarded by np.where
+    with np.errstate(invalid="ignore"):
+        d = np.where(x > n_max, (x - n_max) * inv_hi, np.where(x < n_min, (n_min - x) * inv_lo, 0.0))
+    return weight * np.minimum(1.0, d * d)
+
+def _compile_lut(male: Tuple, other: Tuple, max_entries: int) -> Optional[np.ndarray]:
+    fold = MAP_FOLD if male[6] else 1
+    if male[0] not in INTEGER_INPUTS and not male[6]:
+        return None
+    # Past the top critical bound a component is saturated or zero, so twice that covers the physiological range
+    top = max([b for _, n_min, n_max, _, inv_hi, *_ in (male, other)
+               for b in (n_min, n_max, n_max + 1.0 / inv_hi if inv_hi else n_max) if math.isfinite(b)], default=0.0)
+    size = fold * LUT_SPAN * math.ceil(top) + 1
+    if size > max_entries:
+        return None
+    x = np.arange(size) / fold
+    return np.array([component_contribution(x, *row[1:6]) for row in (male, other)])
+
+def _attach_lut(row: Tuple, lut: Optional[np.ndarray], gender_row: int) -> Tuple:
+    if lut is None:
+        return row + (None,)
+    keys = (np.arange(lut.shape[1]) / MAP_FOLD).tolist() if row[6] else range(lut.shape[1])
+    return row + (dict(zip(keys, lut[gender_row].tolist())),)
+
+# --- LOADING & HOT RELOAD ---
+_current: Optional[CompiledSpec] = None
+_last_check = 0.0
+
+def load(path: Optional[str] = None) -> CompiledSpec:
+    path = path or SPEC_PATH
+    with open(path, "r") as f:
+        raw = json.load(f)
+    try:
+        return CompiledSpec(raw, os.path.getmtime(path))
+    except (KeyError, TypeError, IndexError) as e:
+        raise SpecError(f"Malformed scoring spec: {e}")
+
+def current() -> CompiledSpec:
+    global _current
+    if _current is None:
+        _current = load()
+    return _current
+
+def reload() -> CompiledSpec:
+    """Re-reads the spec file. A broken file leaves the active spec in place."""
+    global _current
+    _current = load()
+    return _current
+
+def refresh() -> CompiledSpec:
+    """
+    Cheap per-request check: reloads when the spec file changed on disk.
+    Every process (uvicorn workers, pool workers) picks up edits on its own.
+    """
+    global _last_check
+    spec = current()
+    now = time.monotonic()
+    if now - _last_check < SPEC_CHECK_INTERVAL:
+        return spec
+    _last_check = now
+    try:
+        if os.path.getmtime(SPEC_PATH) != spec.mtime:
+            return reload()
+    except (OSError, ValueError) as e:
+        print(f"[SCORING SPEC] Keeping version {spec.version}, reload failed: {e}")
+    return spec
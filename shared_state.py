@@ -0,0 +1,234 @@
+"""
+Host-local state shared by every uvicorn worker process.
+
+One SQLite database in WAL mode (readers never block the writer) holds:
+  kv        key -> JSON value with a version
+  counters  name -> integer, for counters and ID sequences (atomic upsert ... RETURNING)
+  locks     leased named locks for read-modify-write of shared files (the patient workbook) and
+            for ownership of long-running work (scoring jobs, renewed while the job runs)
+  changes   an append-only change feed (seq, topic, key, JSON payload, origin worker)
+
+Each worker polls the change feed every SHARED_STATE_POLL_SECONDS and hands changes made by
+other workers to the handler subscribed to their topic, which is how in-process state stays
+coherent: the census, and the hospital states, ER queues, oxygen models and diversion network,
+which also keep their latest value in kv so a worker that starts later loads them. Changes to
+those go through a lock and a poll first, so every writer starts from the latest state.
+Locks are leases, renewed while held, so a worker that dies holding one does not wedge the
+others for longer than SHARED_STATE_LOCK_LEASE_SECONDS.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+POLL_SECONDS = float(os.getenv("SHARED_STATE_POLL_SECONDS", 0.5))
+LOCK_TIMEOUT_SECONDS = float(os.getenv("SHARED_STATE_LOCK_TIMEOUT_SECONDS", 30))
+LOCK_LEASE_SECONDS = float(os.getenv("SHARED_STATE_LOCK_LEASE_SECONDS", 60))
+# Feed entries older than this are trimmed; a live worker reads them within one poll
+CHANGE_RETENTION_SECONDS = float(os.getenv("SHARED_STATE_CHANGE_RETENTION_SECONDS", 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, key TEXT NOT NULL,
+    payload TEXT, origin TEXT NOT NULL, created REAL NOT NULL
+);
+"""
+
+class LockTimeout(Exception):
+    pass
+
+class SharedState:
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        self.path = path
+        # Tells this worker's own changes apart in the feed
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Callable[[str, Any], None]] = {}
+        self.last_seq: Optional[int] = None
+        self._local = threading.local()
+        self._publishes = 0
+
+    # --- CONNECTION ---
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread, opened (and the schema created) on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # --- KEY/VALUE ---
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._conn().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> int:
+        """Stores a JSON-serialisable value; returns its new version."""
+        return self._conn().execute(
+            "INSERT INTO kv (key, value, version) VALUES (?, ?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = version + 1 RETURNING version",
+            (key, json.dumps(value))
+        ).fetchone()[0]
+
+    def delete(self, key: str) -> bool:
+        return self._conn().execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount > 0
+
+    def items(self, prefix: str) -> List[Tuple[str, Any]]:
+        """(key, value) of every key starting with `prefix`, in key order."""
+        rows = self._conn().execute(
+            "SELECT key, value FROM kv WHERE key >= ? AND key < ? ORDER BY key", (prefix, prefix + "\U0010ffff")
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    # --- COUNTERS AND SEQUENCES ---
+    def increment(self, name: str, amount: int = 1) -> int:
+        return self._conn().execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value RETURNING value",
+            (name, amount)
+        ).fetchone()[0]
+
+    def counter(self, name: str) -> int:
+        row = self._conn().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def next_id(self, name: str, at_least: int = 1) -> int:
+        """Next value of a sequence, never below at_least (lets a sequence catch up with IDs already on disk)."""
+        return self._conn().execute(
+            "INSERT INTO counters (name, value) VALUES (?, max(?, 1)) "
+            "ON CONFLICT(name) DO UPDATE SET value = max(value + 1, excluded.value) RETURNING value",
+            (name, at_least)
+        ).fetchone()[0]
+
+    # --- LOCKS ---
+    def acquire(self, name: str, token: str, lease: float = LOCK_LEASE_SECONDS) -> bool:
+        """One non-blocking attempt at a leased lock; an expired lease is taken over."""
+        conn, now = self._conn(), time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM locks WHERE name = ? AND expires < ?", (name, now))
+            return conn.execute(
+                "INSERT OR IGNORE INTO locks (name, owner, expires) VALUES (?, ?, ?)", (name, token, now + lease)
+            ).rowcount > 0
+        finally:
+            conn.execute("COMMIT")
+
+    def renew(self, name: str, token: str, lease: float = LOCK_LEASE_SECONDS) -> bool:
+        """Extends a lease still held by `token`; False once it has expired and been taken over."""
+        return self._conn().execute(
+            "UPDATE locks SET expires = ? WHERE name = ? AND owner = ?", (time.time() + lease, name, token)
+        ).rowcount > 0
+
+    def release(self, name: str, token: str):
+        self._conn().execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, token))
+
+    def _keep_renewed(self, name: str, token: str, lease: float, done: threading.Event):
+        """Renews a held lease every third of its length until `done` is set."""
+        while not done.wait(lease / 3):
+            if not self.renew(name, token, lease):
+                print(f"[SHARED STATE] Lost lock {name} while holding it")
+                return
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = LOCK_TIMEOUT_SECONDS, lease: float = LOCK_LEASE_SECONDS):
+        """
+        Cross-worker mutex; raises LockTimeout if not acquired within `timeout` seconds. Blocks
+        the calling thread, so async code runs the locked section on an executor. The lease is
+        renewed while the lock is held and only lapses if this worker dies.
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self.acquire(name, token, lease):
+            if time.monotonic() > deadline:
+                raise LockTimeout(name)
+            time.sleep(0.01)
+        done = threading.Event()
+        renewer = threading.Thread(target=self._keep_renewed, args=(name, token, lease, done), daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            done.set()
+            renewer.join()
+            self.release(name, token)
+
+    @asynccontextmanager
+    async def alock(self, name: str, timeout: float = LOCK_TIMEOUT_SECONDS, lease: float = LOCK_LEASE_SECONDS):
+        """lock() for the event loop: waits with asyncio.sleep and renews the lease from a task."""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self.acquire(name, token, lease):
+            if time.monotonic() > deadline:
+                raise LockTimeout(name)
+            await asyncio.sleep(0.01)
+
+        async def keep_renewed():
+            while True:
+                await asyncio.sleep(lease / 3)
+                self.renew(name, token, lease)
+
+        renewer = asyncio.create_task(keep_renewed())
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            self.release(name, token)
+
+    # --- CHANGE FEED ---
+    def subscribe(self, topic: str, handler: Callable[[str, Any], None]):
+        """handler(key, payload) runs for every change on `topic` made by another worker."""
+        self.handlers[topic] = handler
+
+    def publish(self, topic: str, key: str, payload: Any = None) -> int:
+        conn = self._conn()
+        now = time.time()
+        seq = conn.execute(
+            "INSERT INTO changes (topic, key, payload, origin, created) VALUES (?, ?, ?, ?, ?) RETURNING seq",
+            (topic, str(key), json.dumps(payload), self.origin, now)
+        ).fetchone()[0]
+        self._publishes += 1
+        if self._publishes % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE created < ?", (now - CHANGE_RETENTION_SECONDS,))
+        return seq
+
+    def poll(self) -> int:
+        """Applies changes from other workers since the last poll; returns how many were applied."""
+        conn = self._conn()
+        if self.last_seq is None:
+            # A worker starts from the files and databases, so only later changes matter
+            self.last_seq = conn.execute("SELECT coalesce(max(seq), 0) FROM changes").fetchone()[0]
+            return 0
+        rows = conn.execute(
+            "SELECT seq, topic, key, payload, origin FROM changes WHERE seq > ? ORDER BY seq", (self.last_seq,)
+        ).fetchall()
+        applied = 0
+        for seq, topic, key, payload, origin in rows:
+            self.last_seq = seq
+            handler = self.handlers.get(topic)
+            if origin == self.origin or handler is None:
+                continue
+            try:
+                handler(key, json.loads(payload))
+                applied += 1
+            except Exception as e:
+                print(f"[SHARED STATE] Change {seq} ({topic}:{key}) failed: {e}")
+        return applied
+
+    async def watch(self, interval: float = POLL_SECONDS):
+        """Polls the change feed until cancelled (run as a task from the app lifespan)."""
+        while True:
+            self.poll()
+            await asyncio.sleep(interval)
+
+store = SharedState()
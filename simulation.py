@@ -0,0 +1,186 @@
+"""
+Monte Carlo surge / arrival / oxygen-depletion simulator.
+
+Each run steps one hospital hour by hour over the horizon. Poisson ER arrivals (multiplied
+during a randomly timed surge), census deterioration when a surge hits or oxygen first drops
+into crisis, ICU boarding when beds run out, length-of-stay discharges, and oxygen drawn
+down by ventilated patients with random supply disruptions and resupply.
+Runs are vectorized within a block (every array is one value per run). The block layout and
+seeds depend on the run count alone, so a seed gives the same result on any machine; blocks
+are then grouped over the bulk scoring process pool, and nothing runs on the event loop.
+
+The census only enters through its critical shares, computed once per request with the
+batch engine: how many patients are critical now, and how many more would be under a surge
+(emergency flag) and/or the oxygen-crisis amplifier.
+"""
+import asyncio
+import math
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+import bulk_pool
+import scoring_spec
+from engine import calculate_patient_risk_batch, stress_index, OXYGEN_CRISIS_LEVEL
+from models import HospitalData, SimulationConfig
+
+# Runs per independently seeded block; a single block runs on a thread, the pool round trip is not worth it
+RUNS_PER_BLOCK = int(os.getenv("SIMULATION_RUNS_PER_BLOCK", 2000))
+PERCENTILES = (5, 50, 90, 95, 99)
+
+def census_profile(columns: Dict[str, np.ndarray]) -> dict:
+    """Critical counts under {normal, oxygen crisis} x {as admitted, surged to emergency}."""
+    critical = scoring_spec.current().severity_labels[-1]
+    n = len(columns["patient_id"])
+    surged = dict(columns, emergency_case_flag=np.ones(n))
+
+    profile = {"census_size": n, "critical": [], "surge_converts": [], "arrival_critical_share": []}
+    for crisis in (False, True):
+        base = calculate_patient_risk_batch(columns, crisis)["severity_class"] == critical
+        surge = calculate_patient_risk_batch(surged, crisis)["severity_class"] == critical
+        profile["critical"].append(int(base.sum()))
+        profile["surge_converts"].append(int((surge & ~base).sum()))
+        # Arrivals are emergencies with the census case mix
+        profile["arrival_critical_share"].append(float(surge.mean()) if n else 0.0)
+    return profile
+
+def simulate_block(hospital: dict, config: dict, profile: dict, seed, runs: int) -> Dict[str, np.ndarray]:
+    """Simulates `runs` independent runs; returns one array per outcome metric."""
+    rng = np.random.default_rng(seed)
+    H = config["horizon_hours"]
+    icu_total, vents = hospital["icu_beds_total"], hospital["ventilators_available"]
+    beds_total, er_capacity = hospital["total_beds"], hospital["er_capacity"]
+    r_op = np.full(runs, hospital["ongoing_operations_count"] / max(1, hospital["available_doctors"]))
+
+    # 1. Per-run state
+    icu = np.full(runs, hospital["icu_beds_occupied"], dtype=np.int64)
+    er = np.full(runs, hospital["er_occupied"], dtype=np.int64)
+    beds = np.full(runs, hospital["occupied_beds"], dtype=np.int64)
+    boarding = np.zeros(runs, dtype=np.int64)  # critical patients waiting for an ICU bed
+    oxygen = np.full(runs, float(hospital["oxygen_supply_level_percent"]))
+
+    # 2. Per-run scenario draws
+    has_surge = rng.random(runs) < config["surge_probability"]
+    surge_start = np.floor(rng.uniform(0, H, runs))
+    surge_end = surge_start + config["surge_duration_hours"]
+    surge_mult = 1 + (config["surge_multiplier"] - 1) * rng.lognormal(0.0, 0.25, runs)
+    disruption = np.where(rng.random(runs) < config["oxygen_disruption_probability"], rng.uniform(2.0, 4.0, runs), 1.0)
+
+    surge_converts = np.array(profile["surge_converts"])
+    crisis_converts = max(0, profile["critical"][1] - profile["critical"][0])
+    arrival_share = np.array(profile["arrival_critical_share"])
+    ever_crisis = oxygen < OXYGEN_CRISIS_LEVEL
+    # Hourly discharge probability for an exponential stay with the configured mean; stays under
+    # an hour approach 1 instead of exceeding it
+    discharge_p = {unit: -math.expm1(-1 / config[f"{unit}_length_of_stay_hours"]) for unit in ("icu", "er", "ward")}
+
+    peak_icu_short = np.zeros(runs, dtype=np.int64)
+    peak_vent_short = np.zeros(runs, dtype=np.int64)
+    peak_hsi = np.zeros(runs)
+    min_oxygen = oxygen.copy()
+    crisis_hours = np.zeros(runs, dtype=np.int64)
+    hsi = np.zeros(runs)
+
+    for t in range(H):
+        crisis = oxygen < OXYGEN_CRISIS_LEVEL
+        c = crisis.astype(np.intp)
+
+        # 3. Arrivals and census deterioration
+        surging = has_surge & (t >= surge_start) & (t < surge_end)
+        arrivals = rng.poisson(config["arrival_rate_per_hour"] * np.where(surging, surge_mult, 1.0))
+        critical_arrivals = rng.binomial(arrivals, arrival_share[c])
+        onset = has_surge & (t == surge_start)
+        deteriorated = np.where(onset, rng.binomial(surge_converts[c], config["surge_census_fraction"]), 0)
+        first_crisis = crisis & ~ever_crisis
+        deteriorated += np.where(first_crisis, crisis_converts, 0)
+        ever_crisis |= crisis
+
+        # 4. Discharges, then admissions (ICU from the boarding queue, ward share of the rest)
+        icu -= rng.binomial(icu, discharge_p["icu"])
+        er -= rng.binomial(er, discharge_p["er"])
+        beds -= rng.binomial(beds, discharge_p["ward"])
+        boarding += critical_arrivals + deteriorated
+        admitted = np.minimum(boarding, np.maximum(0, icu_total - icu))
+        icu += admitted
+        boarding -= admitted
+        er += arrivals
+        beds = np.minimum(beds_total, beds + rng.binomial(arrivals - critical_arrivals, config["ward_admission_fraction"]))
+
+        # 5. Oxygen: base draw plus every ventilated patient, resupply resets to full
+        ventilated = np.minimum(icu + boarding, vents)
+        oxygen = np.maximum(0.0, oxygen - (config["oxygen_base_consumption_per_hour"]
+                                           + config["oxygen_consumption_per_ventilated_hour"] * ventilated) * disruption)
+        oxygen = np.where(rng.random(runs) < config["oxygen_resupply_probability_per_hour"], 100.0, oxygen)
+
+        # 6. Outcomes (icu_beds_occupied stands in for ventilated patients, as in the engine)
+        hsi = stress_index(
+            (beds_total - beds) / max(1, beds_total),
+            (icu_total - icu) / max(1, icu_total),
+            er / max(1, er_capacity),
+            r_op,
+            (icu + boarding) / max(1, vents),
+        )
+        np.maximum(peak_icu_short, boarding, out=peak_icu_short)
+        np.maximum(peak_vent_short, np.maximum(0, icu + boarding - vents), out=peak_vent_short)
+        np.maximum(peak_hsi, hsi, out=peak_hsi)
+        np.minimum(min_oxygen, oxygen, out=min_oxygen)
+        crisis_hours += crisis
+
+    return {
+        "peak_icu_shortfall": peak_icu_short,
+        "peak_ventilator_shortfall": peak_vent_short,
+        "peak_hsi": peak_hsi,
+        "final_hsi": hsi,
+        "min_oxygen_percent": min_oxygen,
+        "oxygen_crisis_hours": crisis_hours,
+    }
+
+def simulate_blocks(hospital: dict, config: dict, profile: dict, blocks: List[tuple]) -> Dict[str, np.ndarray]:
+    """Simulates (seed, runs) blocks one after another; outcome arrays are concatenated in block order."""
+    parts = [simulate_block(hospital, config, profile, seed, runs) for seed, runs in blocks]
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+def summarize(values: np.ndarray) -> dict:
+    p = np.percentile(values, PERCENTILES)
+    return {
+        "mean": round(float(values.mean()), 4),
+        **{f"p{q}": round(float(v), 4) for q, v in zip(PERCENTILES, p)},
+        "max": round(float(values.max()), 4),
+    }
+
+async def run_simulation(hospital: HospitalData, config: SimulationConfig, columns: Dict[str, np.ndarray]) -> dict:
+    """
+    Raises bulk_pool.PoolSaturated when the pool is busy, like bulk scoring.
+    Results depend only on the seed and run count, not on the pool size or scheduling.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    profile = await loop.run_in_executor(None, census_profile, columns)
+    n_blocks = math.ceil(config.runs / RUNS_PER_BLOCK)
+    sizes = [len(part) for part in np.array_split(np.arange(config.runs), n_blocks)]
+    blocks = list(zip(np.random.SeedSequence(config.seed).spawn(n_blocks), sizes))
+
+    if n_blocks == 1:
+        parts = [await loop.run_in_executor(None, simulate_blocks, hospital.model_dump(), config.model_dump(), profile, blocks)]
+    else:
+        # Consecutive blocks per task, never more tasks than the pool runs at once
+        per_task = math.ceil(n_blocks / min(n_blocks, bulk_pool.POOL_WORKERS, bulk_pool.MAX_INFLIGHT_CHUNKS))
+        args = [(hospital.model_dump(), config.model_dump(), profile, blocks[i:i + per_task]) for i in range(0, n_blocks, per_task)]
+        parts = await bulk_pool.run_chunks(simulate_blocks, args)
+    outcomes = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    return {
+        "runs": config.runs,
+        "horizon_hours": config.horizon_hours,
+        "census_size": profile["census_size"],
+        "seconds": round(time.perf_counter() - started, 3),
+        **{key: summarize(values) for key, values in outcomes.items()},
+        "probabilities": {
+            "icu_shortfall": round(float((outcomes["peak_icu_shortfall"] > 0).mean()), 4),
+            "ventilator_shortfall": round(float((outcomes["peak_ventilator_shortfall"] > 0).mean()), 4),
+            "system_overload": round(float((outcomes["peak_hsi"] >= 0.9).mean()), 4),
+            "oxygen_crisis": round(float((outcomes["oxygen_crisis_hours"] > 0).mean()), 4),
+        },
+    }
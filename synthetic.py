@@ -0,0 +1,396 @@
+"""
+Deterministic synthetic cohorts for PatientData, HospitalData and the bedside vitals stream.
+
+    python synthetic.py patients 2000000 --out patients.parquet --severity-mix Normal=0.5,Watch=0.3,Severe=0.1,Critical=0.1
+    python synthetic.py hospitals 5000 --out hospitals.xlsx --scenario oxygen_crisis
+    python synthetic.py vitals 10000000 --out vitals.csv --steps 720
+
+Files are written chunk by chunk (chunk i is seeded from (seed, i)), so memory stays
+flat whatever the row count and the same arguments always produce the same file.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import xlsx
+from models import PatientData, HospitalData
+
+GENDERS = np.array(["male", "female"], dtype=object)
+ADMISSION_TYPES = np.array(["ER", "ICU", "General", "Elective"], dtype=object)
+DIAGNOSIS_CATEGORIES = np.array(["Respiratory", "Cardiac", "Neurological", "Metabolic", "Trauma", "Infectious"], dtype=object)
+
+SCENARIOS = ("normal", "oxygen_crisis", "mass_casualty", "heatwave")
+TRAJECTORIES = ("stable", "improving", "deteriorating", "crashing")
+DEFAULT_TRAJECTORY_MIX = (0.55, 0.2, 0.2, 0.05)
+# Column names of care_pulse_vitals_crisis_dataset.xlsx
+VITALS_FIELDS = ("timestamp", "patient_id", "heart_rate", "spo2", "systolic_bp", "diastolic_bp", "resp_rate")
+VITALS_START = "2026-03-01T14:00:00"
+
+FORMAT_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet", ".xlsx": "xlsx"}
+MIX_MAX_ROUNDS = 60
+
+def _clip_int(x, lo, hi):
+    return np.clip(np.rint(x), lo, hi).astype(np.int64)
+
+def _check_scenario(scenario: str):
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario {scenario!r}, expected one of {', '.join(SCENARIOS)}")
+
+# --- PATIENTS ---
+def _draw_patients(rng, acuity: np.ndarray, scenario: str) -> Dict[str, np.ndarray]:
+    n = len(acuity)
+    sign = np.where(rng.random(n) < 0.7, 1.0, -1.0)  # most deteriorations are tachy/hyper
+
+    gender = GENDERS[rng.integers(0, 2, n)]
+    is_male = gender == "male"
+
+    columns = {
+        "patient_id": None,
+        "age": _clip_int(rng.normal(52, 19, n) + 25 * acuity, 0, 105),
+        "gender": gender,
+        "heart_rate_bpm": _clip_int(rng.normal(80, 11, n) + sign * 70 * acuity, 25, 220),
+        "systolic_bp_mmHg": _clip_int(rng.normal(124, 14, n) + sign * 55 * acuity, 50, 250),
+        "diastolic_bp_mmHg": _clip_int(rng.normal(79, 9, n) + sign * 30 * acuity, 25, 150),
+        "oxygen_saturation_percent": np.round(np.clip(99 - rng.gamma(1.2, 1.2, n) - 18 * acuity, 60, 100), 1),
+        "body_temperature_celsius": np.round(np.clip(rng.normal(36.9, 0.35, n) + 3.5 * acuity * (rng.random(n) < 0.6), 33, 42.5), 1),
+        "respiratory_rate_bpm": _clip_int(rng.normal(16, 2.5, n) + 22 * acuity, 5, 60),
+        "blood_sugar_mg_dl": np.round(np.clip(rng.lognormal(np.log(115), 0.25, n) + 250 * acuity * (rng.random(n) < 0.3), 40, 600), 1),
+        "bmi": np.round(np.clip(rng.normal(26, 5, n), 13, 60), 1),
+        "chronic_disease_flag": (rng.random(n) < 0.2 + 0.5 * acuity).astype(np.int64),
+        "emergency_case_flag": (rng.random(n) < 0.05 + 0.6 * acuity).astype(np.int64),
+        "icu_required_flag": (rng.random(n) < np.clip(1.2 * acuity - 0.25, 0, 1)).astype(np.int64),
+        "admission_type": ADMISSION_TYPES[rng.integers(0, len(ADMISSION_TYPES), n)],
+        "diagnosis_category": DIAGNOSIS_CATEGORIES[rng.integers(0, len(DIAGNOSIS_CATEGORIES), n)],
+        "hydration_level_percent": np.round(np.clip(99 - rng.gamma(1.5, 2.5, n) - 40 * acuity, 30, 100), 1),
+        "hemoglobin_g_dl": np.round(np.clip(np.where(is_male, 14.8, 13.2) + rng.normal(0, 1.1, n) - 5 * acuity, 4, 20), 1),
+    }
+
+    # Scenario shifts draw after everything else, so "normal" cohorts stay bit-identical
+    if scenario == "oxygen_crisis":
+        columns["oxygen_saturation_percent"] = np.round(np.clip(columns["oxygen_saturation_percent"] - rng.gamma(2.0, 1.5, n), 60, 100), 1)
+    elif scenario == "mass_casualty":
+        trauma = rng.random(n) < 0.6
+        columns["diagnosis_category"] = np.where(trauma, "Trauma", columns["diagnosis_category"])
+        columns["admission_type"] = np.where(trauma | (rng.random(n) < 0.3), "ER", columns["admission_type"])
+        columns["emergency_case_flag"] = np.maximum(columns["emergency_case_flag"], (rng.random(n) < 0.5).astype(np.int64))
+    elif scenario == "heatwave":
+        columns["body_temperature_celsius"] = np.round(np.clip(columns["body_temperature_celsius"] + rng.gamma(1.5, 0.4, n), 33, 42.5), 1)
+        columns["hydration_level_percent"] = np.round(np.clip(columns["hydration_level_percent"] - rng.gamma(2.0, 6.0, n), 30, 100), 1)
+    return columns
+
+def parse_severity_mix(mix) -> Dict[str, float]:
+    """Accepts {"Critical": 0.1, ...} or "Normal=0.6,Critical=0.4"; labels must come from the scoring spec."""
+    import scoring_spec
+    if isinstance(mix, str):
+        mix = {k.strip(): float(v) for k, v in (part.split("=") for part in mix.split(",") if part.strip())}
+    labels = scoring_spec.current().severity_labels
+    unknown = set(mix) - set(labels)
+    if unknown:
+        raise ValueError(f"Unknown severity labels {sorted(unknown)}, expected {list(labels)}")
+    total = sum(mix.values())
+    if total <= 0 or any(v < 0 for v in mix.values()):
+        raise ValueError("Severity mix fractions must be non-negative and not all zero")
+    return {label: mix.get(label, 0.0) / total for label in labels}
+
+def _draw_with_mix(rng, n: int, mix: Dict[str, float], scenario: str) -> Dict[str, np.ndarray]:
+    """
+    Rejection sampling against the scoring engine: each severity class draws candidates
+    from the acuity band where it is most common and keeps only those the engine puts in
+    that class, so the mix is exact rather than approximate.
+    """
+    from engine import calculate_patient_risk_batch
+
+    if n == 0:
+        return _draw_patients(rng, np.empty(0), scenario)
+    labels = list(mix)
+    counts = np.floor(np.array([mix[label] for label in labels]) * n).astype(np.int64)
+    counts[np.argmax([mix[label] for label in labels])] += n - counts.sum()
+
+    accepted: List[Dict[str, np.ndarray]] = []
+    for i, (label, need) in enumerate(zip(labels, counts)):
+        lo, hi = i / len(labels) * 0.9, min(1.0, (i + 1.5) / len(labels))
+        for _ in range(MIX_MAX_ROUNDS):
+            if need == 0:
+                break
+            candidates = _draw_patients(rng, rng.uniform(lo, hi, max(4 * need, 256)), scenario)
+            candidates["patient_id"] = np.zeros(len(candidates["age"]), dtype=object)
+            severity = calculate_patient_risk_batch(candidates, scenario == "oxygen_crisis")["severity_class"]
+            keep = np.flatnonzero(severity == label)[:need]
+            accepted.append({k: v[keep] for k, v in candidates.items()})
+            need -= len(keep)
+        if need:
+            raise ValueError(f"Severity class {label!r} is unreachable under the current scoring spec")
+
+    order = rng.permutation(n)
+    return {k: np.concatenate([part[k] for part in accepted])[order] for k in accepted[0]}
+
+def generate_patient_columns(n: int, seed: int = 42, id_offset: int = 0, severity_mix=None, scenario: str = "normal") -> Dict[str, np.ndarray]:
+    """
+    Seeded cohort with one array per PatientData field. A latent acuity in [0, 1]
+    pushes every vital away from its normal range together, so sick patients look
+    sick across the board instead of having independent random outliers.
+    With severity_mix the engine-assigned severity classes follow those fractions exactly.
+    """
+    _check_scenario(scenario)
+    rng = np.random.default_rng(seed)
+    if severity_mix is None:
+        columns = _draw_patients(rng, rng.beta(1.3, 5.0, n), scenario)
+    else:
+        columns = _draw_with_mix(rng, n, parse_severity_mix(severity_mix), scenario)
+    columns["patient_id"] = np.array([f"SYN{i}" for i in range(id_offset, id_offset + n)], dtype=object)
+    return columns
+
+def generate_uniform_patient_columns(n: int, seed: int = 42) -> Dict[str, np.ndarray]:
+    """
+    Independent uniform draws across and beyond every clinical range, at full float precision,
+    for property tests: unlike the cohort above, scores land anywhere, rounding boundaries included.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        "patient_id": np.array([f"UNI{i}" for i in range(n)], dtype=object),
+        "age": rng.integers(0, 110, n),
+        "gender": GENDERS[rng.integers(0, 2, n)],
+        "heart_rate_bpm": rng.integers(20, 230, n),
+        "systolic_bp_mmHg": rng.integers(50, 250, n),
+        "diastolic_bp_mmHg": rng.integers(20, 150, n),
+        "oxygen_saturation_percent": rng.uniform(60, 100, n),
+        "body_temperature_celsius": rng.uniform(30, 43, n),
+        "respiratory_rate_bpm": rng.integers(3, 60, n),
+        "blood_sugar_mg_dl": rng.uniform(30, 600, n),
+        "bmi": rng.uniform(10, 60, n),
+        "chronic_disease_flag": rng.integers(0, 2, n),
+        "emergency_case_flag": rng.integers(0, 2, n),
+        "icu_required_flag": rng.integers(0, 2, n),
+        "admission_type": ADMISSION_TYPES[rng.integers(0, len(ADMISSION_TYPES), n)],
+        "diagnosis_category": DIAGNOSIS_CATEGORIES[rng.integers(0, len(DIAGNOSIS_CATEGORIES), n)],
+        "hydration_level_percent": rng.uniform(20, 100, n),
+        "hemoglobin_g_dl": rng.uniform(3, 22, n),
+    }
+
+def patients_from_columns(columns: Dict[str, np.ndarray], start: int = 0, stop: int = None) -> List[PatientData]:
+    """Materializes rows [start, stop) as PatientData (values are already valid, so validation is skipped)."""
+    names = list(PatientData.model_fields)
+    lists = [columns[name][start:stop].tolist() for name in names]
+    return [PatientData.model_construct(**dict(zip(names, row))) for row in zip(*lists)]
+
+# --- HOSPITALS ---
+def generate_hospital_columns(n: int, seed: int = 42, id_offset: int = 0, scenario: str = "normal") -> Dict[str, np.ndarray]:
+    """Seeded HospitalData snapshots; scenarios skew the resources that crisis is about."""
+    _check_scenario(scenario)
+    rng = np.random.default_rng(seed)
+    load = rng.beta(4.0, 2.0, n)  # overall pressure on the site
+    beds = _clip_int(rng.lognormal(np.log(220), 0.5, n), 30, 2000)
+    icu = _clip_int(beds * rng.uniform(0.06, 0.14, n), 2, 300)
+    er = _clip_int(beds * rng.uniform(0.08, 0.2, n), 5, 400)
+    occupied = _clip_int(beds * np.clip(load + rng.normal(0, 0.05, n), 0, 1), 0, beds)
+
+    columns = {
+        "hospital_id": np.arange(id_offset, id_offset + n, dtype=np.int64),
+        "total_beds": beds,
+        "occupied_beds": occupied,
+        "icu_beds_total": icu,
+        "icu_beds_occupied": _clip_int(icu * np.clip(load + rng.normal(0.05, 0.1, n), 0, 1), 0, icu),
+        "er_capacity": er,
+        "er_occupied": _clip_int(er * np.clip(load * 1.1 + rng.normal(0, 0.1, n), 0, 1.4), 0, None),
+        "ongoing_operations_count": _clip_int(beds / 40 * rng.uniform(0.3, 1.2, n), 0, None),
+        "available_doctors": _clip_int(beds / 12 * (1.2 - 0.6 * load) * rng.uniform(0.7, 1.1, n), 1, None),
+        "available_nurses": _clip_int(beds / 4 * (1.2 - 0.6 * load) * rng.uniform(0.7, 1.1, n), 1, None),
+        "ventilators_available": _clip_int(icu * rng.uniform(0.2, 0.8, n), 0, None),
+        "ambulance_available_count": _clip_int(rng.poisson(beds / 50 + 1), 0, None),
+        "room_temperature_celsius": np.round(rng.normal(23.0, 1.2, n), 1),
+        "oxygen_supply_level_percent": _clip_int(100 - rng.gamma(1.5, 8.0, n), 5, 100),
+        "total_patients_current": occupied,
+    }
+
+    if scenario == "oxygen_crisis":
+        columns["oxygen_supply_level_percent"] = _clip_int(rng.uniform(8, 45, n), 5, 100)
+    elif scenario == "mass_casualty":
+        columns["er_occupied"] = _clip_int(er * rng.uniform(1.1, 1.6, n), 0, None)
+        columns["ambulance_available_count"] = _clip_int(columns["ambulance_available_count"] * rng.uniform(0, 0.3, n), 0, None)
+        columns["ongoing_operations_count"] = columns["ongoing_operations_count"] * 2
+    elif scenario == "heatwave":
+        columns["room_temperature_celsius"] = np.round(rng.uniform(27.0, 33.0, n), 1)
+    return columns
+
+def hospitals_from_columns(columns: Dict[str, np.ndarray], start: int = 0, stop: int = None) -> List[HospitalData]:
+    names = list(HospitalData.model_fields)
+    lists = [columns[name][start:stop].tolist() for name in names]
+    return [HospitalData.model_construct(**dict(zip(names, row))) for row in zip(*lists)]
+
+# --- VITALS STREAM ---
+def generate_vitals_columns(n_patients: int, steps: int, seed: int = 42, id_offset: int = 0, interval_seconds: int = 5,
+                            start: str = VITALS_START, trajectory_mix=DEFAULT_TRAJECTORY_MIX, scenario: str = "normal") -> Dict[str, np.ndarray]:
+    """
+    steps readings per patient, patient-major like the bedside export. Every patient
+    follows a trajectory (stable / improving / deteriorating / crashing) on its latent
+    acuity, plus a random walk, so series are smooth but not scripted.
+    """
+    _check_scenario(scenario)
+    rng = np.random.default_rng(seed)
+    mix = np.asarray(trajectory_mix, dtype=np.float64)
+    trajectory = rng.choice(len(TRAJECTORIES), n_patients, p=mix / mix.sum())
+
+    acuity0 = rng.beta(1.3, 5.0, n_patients)
+    t = np.linspace(0.0, 1.0, steps)[None, :]
+    drift = np.select(
+        [trajectory == 1, trajectory == 2, trajectory == 3],
+        [-0.7 * acuity0, rng.uniform(0.2, 0.5, n_patients), np.zeros(n_patients)],
+        0.0
+    )[:, None] * t
+    onset = rng.uniform(0.3, 0.8, n_patients)[:, None]
+    crash = np.where((trajectory == 3)[:, None], np.clip((t - onset) * 4.0, 0, 1) * 0.8, 0.0)
+    walk = np.cumsum(rng.normal(0, 0.01, (n_patients, steps)), axis=1)
+    acuity = np.clip(acuity0[:, None] + drift + crash + walk, 0.0, 1.0)
+
+    sign = np.where(rng.random(n_patients) < 0.7, 1.0, -1.0)[:, None]
+    noise = lambda scale: rng.normal(0, scale, (n_patients, steps))
+    spo2_drop = 18 + (6 if scenario == "oxygen_crisis" else 0)
+
+    ids = np.array([f"SYN{i}" for i in range(id_offset, id_offset + n_patients)], dtype=object)
+    start_ts = np.datetime64(start, "s")
+    offsets = np.arange(steps, dtype=np.int64) * interval_seconds
+    return {
+        "timestamp": (start_ts + offsets.astype("timedelta64[s]"))[None, :].repeat(n_patients, axis=0).ravel(),
+        "patient_id": np.repeat(ids, steps),
+        "heart_rate": _clip_int(rng.normal(78, 9, n_patients)[:, None] + sign * 70 * acuity + noise(2.0), 25, 220).ravel(),
+        "spo2": _clip_int(99 - spo2_drop * acuity - np.abs(noise(0.8)), 60, 100).ravel(),
+        "systolic_bp": _clip_int(rng.normal(124, 12, n_patients)[:, None] + sign * 55 * acuity + noise(2.5), 50, 250).ravel(),
+        "diastolic_bp": _clip_int(rng.normal(79, 7, n_patients)[:, None] + sign * 30 * acuity + noise(1.5), 25, 150).ravel(),
+        "resp_rate": _clip_int(rng.normal(16, 2, n_patients)[:, None] + 22 * acuity + noise(0.8), 5, 60).ravel(),
+    }
+
+# --- CHUNKED WRITERS ---
+class _CsvWriter:
+    def __init__(self, path):
+        self.path, self.header = path, True
+
+    def write(self, df: pd.DataFrame):
+        df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        pass
+
+class _NdjsonWriter:
+    def __init__(self, path):
+        self.f = open(path, "w")
+
+    def write(self, df: pd.DataFrame):
+        text = df.to_json(orient="records", lines=True, date_format="iso")
+        self.f.write(text if text.endswith("\n") else text + "\n")
+
+    def close(self):
+        self.f.close()
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.path, self.writer = path, None
+
+    def write(self, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+class _XlsxWriter:
+    """
+    The shared streaming SpreadsheetML writer (xlsx.py); openpyxl's write-only mode manages
+    ~4k rows/s, this is an order of magnitude faster. Rolls over to a new sheet at Excel's row limit.
+    """
+
+    def __init__(self, path):
+        self.path, self.workbook = path, None
+
+    def write(self, df: pd.DataFrame):
+        if self.workbook is None:
+            self.workbook = xlsx.Workbook(self.path, list(df.columns), "Data")
+        self.workbook.write_rows(list(zip(*(df[c].tolist() for c in df.columns))))
+
+    def close(self):
+        if self.workbook is None:
+            self.workbook = xlsx.Workbook(self.path, [], "Data")
+        self.workbook.close()
+
+WRITERS = {"csv": _CsvWriter, "ndjson": _NdjsonWriter, "parquet": _ParquetWriter, "xlsx": _XlsxWriter}
+
+def _chunk_seed(seed: int, chunk: int) -> int:
+    return int(np.random.SeedSequence([seed, chunk]).generate_state(1)[0])
+
+def write_dataset(kind: str, rows: int, path: str, fmt: Optional[str] = None, chunk_rows: int = 100_000, seed: int = 42,
+                  scenario: str = "normal", severity_mix=None, steps: int = 720, progress=None) -> dict:
+    """
+    Generates `rows` rows of patients / hospitals / vitals into path, one chunk at a time.
+    For vitals a chunk holds whole patients (chunk_rows // steps of them).
+    """
+    fmt = fmt or FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown output format for {path!r}, use one of {', '.join(WRITERS)}")
+    if kind not in ("patients", "hospitals", "vitals"):
+        raise ValueError("kind must be patients, hospitals or vitals")
+    if kind == "patients" and severity_mix is not None:
+        severity_mix = parse_severity_mix(severity_mix)
+
+    per_chunk = max(1, chunk_rows // steps) if kind == "vitals" else chunk_rows
+    units = math.ceil(rows / steps) if kind == "vitals" else rows
+
+    writer = WRITERS[fmt](path)
+    written, started = 0, time.perf_counter()
+    try:
+        for chunk, offset in enumerate(range(0, units, per_chunk)):
+            size, chunk_seed = min(per_chunk, units - offset), _chunk_seed(seed, chunk)
+            if kind == "patients":
+                columns = generate_patient_columns(size, chunk_seed, offset, severity_mix, scenario)
+            elif kind == "hospitals":
+                columns = generate_hospital_columns(size, chunk_seed, offset, scenario)
+            else:
+                columns = generate_vitals_columns(size, steps, chunk_seed, offset, scenario=scenario)
+            df = pd.DataFrame(columns)
+            if kind == "vitals" and written + len(df) > rows:
+                df = df.iloc[:rows - written]
+            writer.write(df)
+            written += len(df)
+            if progress:
+                progress(written, time.perf_counter() - started)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {"kind": kind, "format": fmt, "path": path, "rows": written, "seconds": round(elapsed, 3),
+            "rows_per_second": round(written / elapsed, 1) if elapsed else None}
+
+def main():
+    parser = argparse.ArgumentParser(description="CarePulse++ synthetic data generator")
+    parser.add_argument("kind", choices=["patients", "hospitals", "vitals"])
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--out", required=True, help="output file; format from extension (.csv .ndjson .parquet .xlsx)")
+    parser.add_argument("--format", choices=list(WRITERS))
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario", choices=SCENARIOS, default="normal")
+    parser.add_argument("--severity-mix", help="e.g. Normal=0.5,Watch=0.3,Severe=0.1,Critical=0.1 (patients only)")
+    parser.add_argument("--steps", type=int, default=720, help="vitals readings per patient (5 s apart)")
+    args = parser.parse_args()
+
+    def progress(done, elapsed):
+        print(f"\r{done:>12,} rows  {done / max(elapsed, 1e-9):>12,.0f} rows/s", end="", file=sys.stderr)
+
+    report = write_dataset(args.kind, args.rows, args.out, args.format, args.chunk_rows, args.seed,
+                           args.scenario, args.severity_mix, args.steps, progress)
+    print(file=sys.stderr)
+    print(json.dumps(report))
+
+if __name__ == "__main__":
+    main()
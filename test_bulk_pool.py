@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fastapi import HTTPException
+
+import bulk_pool
+import main
+import synthetic
+from engine import score_patient
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# A worker stuck on a lock inherited through fork hangs the request; fail instead of waiting forever
+STARTUP_TIMEOUT_SECONDS = 120
+
+# Fresh interpreter: a bulk request and a job go out the moment the app is up
+STARTUP_PROBE = """
+import io, json, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+from fastapi.testclient import TestClient
+import main, synthetic
+
+columns = synthetic.generate_patient_columns(600, seed=3)
+patients = [p.model_dump() for p in synthetic.patients_from_columns(columns)]
+upload = pd.DataFrame(columns).to_csv(index=False).encode()
+with TestClient(main.app) as client:
+    bulk = client.post("/api/v1/patient/analyze_bulk", json=patients)
+    job = client.post("/api/v1/jobs", content=upload, headers={{"content-type": "text/csv"}}).json()
+    deadline = time.monotonic() + 60
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.1)
+        job = client.get(f"/api/v1/jobs/{{job['job_id']}}").json()
+print(json.dumps({{"bulk_status": bulk.status_code, "bulk_rows": len(bulk.json()), "job": job}}))
+"""
+
+def _echo_after(value, delay):
+    # Module level so the pool's workers can unpickle it
+    time.sleep(delay)
+    return value
+
+def _small_pool(**tuning):
+    """Shrinks the offload thresholds for a test; returns the values to restore."""
+    saved = {name: getattr(bulk_pool, name) for name in tuning}
+    for name, value in tuning.items():
+        setattr(bulk_pool, name, value)
+    return saved
+
+def test_chunks_come_back_in_order_and_match_inline():
+    print("\n--- Testing Bulk Pool Order And Parity ---")
+    saved = _small_pool(OFFLOAD_THRESHOLD=100, MIN_CHUNK_SIZE=50, POOL_WORKERS=2, MAX_INFLIGHT_CHUNKS=8)
+    try:
+        # The first chunk finishes last; results still follow the argument order
+        args = [(i, 0.3 - 0.1 * i) for i in range(3)]
+        assert asyncio.run(bulk_pool.run_chunks(_echo_after, args)) == [0, 1, 2]
+        assert bulk_pool.inflight_chunks() == 0
+
+        patients = synthetic.patients_from_columns(synthetic.generate_patient_columns(600, seed=27))
+        for crisis in (False, True):
+            pooled = asyncio.run(bulk_pool._score_uncached(patients, crisis))
+            assert pooled == [score_patient(p, crisis) for p in patients]
+        assert len(bulk_pool.partition(patients, 2)) == 2 and len(bulk_pool.partition(patients[:50], 2)) == 1
+    finally:
+        bulk_pool.shutdown_pool()
+        _small_pool(**saved)
+    print("Bulk Pool Order And Parity Test: PASSED")
+
+def test_saturated_pool_answers_503():
+    print("\n--- Testing Bulk Pool Saturation ---")
+    saved = _small_pool(OFFLOAD_THRESHOLD=100, MIN_CHUNK_SIZE=50, POOL_WORKERS=2, MAX_INFLIGHT_CHUNKS=4)
+    patients = synthetic.patients_from_columns(synthetic.generate_patient_columns(300, seed=28))
+    try:
+        # Other requests hold all but one slot: a two-chunk request is refused, not queued
+        bulk_pool._inflight_chunks = 3
+        try:
+            asyncio.run(main.analyze_patient_bulk(patients))
+            raise AssertionError("A saturated pool must refuse the request!")
+        except HTTPException as e:
+            assert e.status_code == 503 and e.headers["Retry-After"] == str(bulk_pool.RETRY_AFTER_SECONDS)
+        assert bulk_pool.inflight_chunks() == 3, "A refused request must not keep slots"
+        # Small batches never touch the pool
+        assert len(asyncio.run(main.analyze_patient_bulk(patients[:50]))) == 50
+    finally:
+        bulk_pool._inflight_chunks = 0
+        bulk_pool.shutdown_pool()
+        _small_pool(**saved)
+    print("Bulk Pool Saturation Test: PASSED")
+
+def test_background_chunks_share_the_inflight_bound():
+    print("\n--- Testing Background Chunks In The In-Flight Bound ---")
+    saved = _small_pool(POOL_WORKERS=1, MAX_INFLIGHT_CHUNKS=1)
+
+    async def scenario():
+        # A job chunk waits for the slot a request holds, then holds it itself
+        request = asyncio.create_task(bulk_pool.run_chunks(_echo_after, [("request", 0.3)]))
+        await asyncio.sleep(0.05)
+        job = asyncio.create_task(bulk_pool.run_chunks(_echo_after, [("job", 0.3)], wait=True))
+        await asyncio.sleep(0.05)
+        assert bulk_pool.inflight_chunks() == 1 and not job.done()
+        assert await request == ["request"]
+        await asyncio.sleep(0.1)
+        assert bulk_pool.inflight_chunks() == 1
+        try:
+            await bulk_pool.run_chunks(_echo_after, [("request", 0)])
+            raise AssertionError("A slot held by a job must count against requests!")
+        except bulk_pool.PoolSaturated:
+            pass
+        assert await job == ["job"] and bulk_pool.inflight_chunks() == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        bulk_pool.shutdown_pool()
+        _small_pool(**saved)
+    print("Background Chunks In The In-Flight Bound Test: PASSED")
+
+def test_bulk_request_right_after_startup():
+    print("\n--- Testing Bulk Pool Right After Startup ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, BULK_OFFLOAD_THRESHOLD="100", BULK_MIN_CHUNK_SIZE="50", BULK_POOL_WORKERS="2",
+                   JOB_CHUNK_ROWS="200", SHARED_STATE_PATH=os.path.join(tmp, "shared.db"), HISTORY_DIR=os.path.join(tmp, "history"))
+        out = subprocess.run([sys.executable, "-c", STARTUP_PROBE.format(root=ROOT)], capture_output=True, text=True,
+                             cwd=tmp, env=env, timeout=STARTUP_TIMEOUT_SECONDS)
+        assert out.returncode == 0, out.stderr[-2000:]
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+    assert run["bulk_status"] == 200 and run["bulk_rows"] == 600
+    assert run["job"]["status"] == "completed" and run["job"]["rows_done"] == 600, run["job"]
+    print("Bulk Pool Right After Startup Test: PASSED")
+
+if __name__ == "__main__":
+    test_chunks_come_back_in_order_and_match_inline()
+    test_saturated_pool_answers_503()
+    test_background_chunks_share_the_inflight_bound()
+    test_bulk_request_right_after_startup()
@@ -0,0 +1,78 @@
+import random
+from collections import Counter
+
+import numpy as np
+
+import aggregates
+import synthetic
+from census import CensusStore
+from engine import calculate_patient_risk, score_patient
+from models import PatientData
+
+def brute_force(store, severity, column, descending):
+    records = [r for r in store.records.values() if severity is None or r["severity_class"] == severity]
+    return sorted(records, key=lambda r: (r[column], r["patient_id"]), reverse=descending)
+
+def test_indexes_match_brute_force_under_churn():
+    print("\n--- Testing Census Indexes ---")
+    store = CensusStore()
+    store.load_columns(synthetic.generate_patient_columns(400, seed=3))
+    patients = synthetic.patients_from_columns(synthetic.generate_patient_columns(300, seed=4, id_offset=200))
+
+    rng = random.Random(0)
+    for patient in patients:                  # half re-scores of existing IDs, half admissions
+        store.upsert(patient, calculate_patient_risk(patient))
+        if rng.random() < 0.3:
+            store.discharge(rng.choice(list(store.records)))
+
+    for severity in (None, "Normal", "Critical"):
+        for column in ("final_risk_score", "age", "diagnosis_category"):
+            for descending in (True, False):
+                matched, page = store.query(severity, None, column, descending, offset=7, limit=20)
+                expected = brute_force(store, severity, column, descending)
+                assert matched == len(expected)
+                assert [r["patient_id"] for r in page] == [r["patient_id"] for r in expected[7:27]], (severity, column, descending)
+
+    print("Census Index Test: PASSED")
+
+    print("\n--- Testing Incremental Aggregates ---")
+    records = list(store.records.values())
+    scores = np.array([r["final_risk_score"] for r in records])
+    summary = store.aggregates.summary()
+    assert summary["total"] == len(records)
+    assert summary["severity_counts"] == dict(Counter(r["severity_class"] for r in records))
+    assert summary["diet_counts"] == dict(Counter(r["diet_recommendation"] for r in records))
+    assert abs(summary["final_risk_score"]["mean"] - scores.mean()) < 1e-3
+    assert abs(summary["final_risk_score"]["variance"] - scores.var()) < 1e-3
+    n_bins = int(np.ceil(aggregates.SCORE_MAX / aggregates.HISTOGRAM_WIDTH))
+    expected_bins = np.bincount(np.minimum(scores // aggregates.HISTOGRAM_WIDTH, n_bins - 1).astype(int), minlength=n_bins)
+    assert [b["count"] for b in summary["final_risk_histogram"]] == expected_bins.tolist()
+    # The default width gives the dashboard's own buckets
+    assert [b["range"] for b in summary["final_risk_histogram"]] == ["0-20", "20-40", "40-60", "60-80", "80-100"]
+    print("Incremental Aggregates Test: PASSED")
+
+def test_prefix_search():
+    print("\n--- Testing Census Prefix Search ---")
+    store = CensusStore()
+    store.load_columns(synthetic.generate_patient_columns(250, seed=5))
+    matched, page = store.query(search="syn1", sort="patient_id", descending=False, limit=500)
+    assert matched == len([pid for pid in store.records if pid.lower().startswith("syn1")])
+    matched, page = store.query(search="CARD", limit=500)
+    assert matched and all(r["diagnosis_category"] == "Cardiac" for r in page)
+    assert [r["final_risk_score"] for r in page] == sorted((r["final_risk_score"] for r in page), reverse=True)
+    print("Census Prefix Search Test: PASSED")
+
+def test_patient_id_sort_with_non_ascii_digits():
+    print("\n--- Testing Census Patient ID Sort ---")
+    store = CensusStore()
+    for pid in ("12", "\u00b2", "3", "\u0663", "abc"):
+        patient = PatientData(patient_id=pid)
+        store.upsert(patient, score_patient(patient))
+    _, page = store.query(sort="patient_id", descending=False, limit=10)
+    assert [r["patient_id"] for r in page] == ["3", "12", "abc", "\u00b2", "\u0663"]
+    print("Census Patient ID Sort Test: PASSED")
+
+if __name__ == "__main__":
+    test_indexes_match_brute_force_under_churn()
+    test_prefix_search()
+    test_patient_id_sort_with_non_ascii_digits()
@@ -0,0 +1,57 @@
+import pyarrow as pa
+import pandas as pd
+
+import columnar
+import synthetic
+from models import PatientData
+from engine import calculate_patient_risk, calculate_patient_risk_batch, score_patient
+
+# Large enough that scores hit the rounding ties where np.round and round() used to disagree
+PROPERTY_ROWS = 100_000
+
+def load_sample_table():
+    df = pd.read_excel("Patient_Clinical_Data.xlsx")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def test_batch_matches_scalar():
+    print("\n--- Testing Batch Engine Parity ---")
+    table = load_sample_table()
+    columns = columnar.table_to_columns(table)
+    for crisis in (False, True):
+        batch = calculate_patient_risk_batch(columns, crisis)
+        for i, row in enumerate(table.to_pylist()):
+            row["patient_id"] = str(row["patient_id"])
+            expected = calculate_patient_risk(PatientData(**row), crisis).model_dump()
+            for key, value in expected.items():
+                assert batch[key][i] == value, f"Row {i} {key}: {batch[key][i]} != {value}"
+    print(f"Batch engine matched scalar engine on {table.num_rows} patients: PASSED")
+
+def test_batch_matches_scalar_on_random_patients():
+    print("\n--- Testing Batch Engine Parity On Random Patients ---")
+    columns = synthetic.generate_uniform_patient_columns(PROPERTY_ROWS, seed=2024)
+    patients = synthetic.patients_from_columns(columns)
+    for crisis in (False, True):
+        batch = calculate_patient_risk_batch(columns, crisis)
+        expected = [score_patient(p, crisis) for p in patients]
+        for key in ("base_score", "final_risk_score", "severity_class", "diet_recommendation", "target_room_temperature"):
+            mismatched = [i for i, r in enumerate(expected) if getattr(r, key) != batch[key][i]]
+            assert not mismatched, f"{key} differs on {len(mismatched)} rows, first {mismatched[:5]}"
+    print(f"Batch engine matched scalar engine on {PROPERTY_ROWS} random patients: PASSED")
+
+def test_arrow_and_parquet_round_trip():
+    print("\n--- Testing Arrow/Parquet Round Trip ---")
+    table = load_sample_table().drop_columns(["hemoglobin_g_dl"])  # falls back to the default
+    for media_type in (columnar.ARROW_STREAM_MEDIA_TYPE, columnar.PARQUET_MEDIA_TYPE):
+        payload = columnar.write_table(table, media_type)
+        decoded = columnar.read_patient_table(payload, media_type)
+        results = calculate_patient_risk_batch(columnar.table_to_columns(decoded))
+        out = columnar.read_patient_table(columnar.write_table(columnar.results_to_table(results), media_type), media_type)
+        assert out.num_rows == table.num_rows, "Row count changed in transit!"
+        assert out.column("patient_id").to_pylist()[0] == "1", "patient_id must be returned as a string!"
+        assert set(out.column("severity_class").to_pylist()) <= {"Normal", "Watch", "Severe", "Critical"}
+    print("Arrow/Parquet Round Trip Test: PASSED")
+
+if __name__ == "__main__":
+    test_batch_matches_scalar()
+    test_batch_matches_scalar_on_random_patients()
+    test_arrow_and_parquet_round_trip()
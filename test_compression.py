@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import json
+import tracemalloc
+import zlib
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+import compression
+
+def build_app():
+    app = FastAPI()
+
+    @app.post("/api/v1/patient/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"size": len(body), "encoding": request.headers.get("content-encoding")}
+
+    @app.get("/api/v1/export/rows")
+    async def rows(n: int = 3):
+        return StreamingResponse((f"{i},{'x' * 2000}\n".encode() for i in range(n)), media_type="text/csv")
+
+    @app.get("/api/v1/patient/small")
+    async def small():
+        return {"ok": True}
+
+    app.add_middleware(compression.CompressionMiddleware)
+    return app
+
+def call(app, method, path, body=b"", headers=()):
+    """Runs one request through the ASGI app and returns (status, headers, body messages)."""
+    sent, incoming = [], [{"type": "http.request", "body": body[i:i + 4096], "more_body": i + 4096 < len(body)}
+                          for i in range(0, max(len(body), 1), 4096)]
+
+    async def receive():
+        if not incoming:
+            # The client stays connected until the response is done
+            await asyncio.Event().wait()
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [(k.encode(), v.encode()) for k, v in headers], "http_version": "1.1", "scheme": "http",
+             "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, [m["body"] for m in sent[1:]]
+
+def test_request_bodies_are_decoded_and_capped():
+    print("\n--- Testing Compressed Request Bodies ---")
+    app = build_app()
+    payload = json.dumps([{"patient_id": str(i), "age": 70} for i in range(5000)]).encode()
+    status, _, body = call(app, "POST", "/api/v1/patient/echo", gzip.compress(payload), [("content-encoding", "gzip")])
+    # The route sees the decoded body with the encoding header removed
+    assert status == 200 and json.loads(b"".join(body)) == {"size": len(payload), "encoding": None}
+
+    assert call(app, "POST", "/api/v1/patient/echo", b"not gzip", [("content-encoding", "gzip")])[0] == 400
+    assert call(app, "POST", "/api/v1/patient/echo", b"x", [("content-encoding", "br")])[0] == 415
+    cap, compression.MAX_DECODED_BYTES = compression.MAX_DECODED_BYTES, 64 * 1024
+    try:
+        bomb = gzip.compress(b" " * (1024 * 1024))
+        assert call(app, "POST", "/api/v1/patient/echo", bomb, [("content-encoding", "gzip")])[0] == 413
+    finally:
+        compression.MAX_DECODED_BYTES = cap
+    print("Compressed Request Bodies Test: PASSED")
+
+def test_zstd_request_bodies_are_capped():
+    print("\n--- Testing zstd Request Body Cap ---")
+    if compression.zstandard is None:
+        print("zstd Request Body Cap Test: SKIPPED (zstandard not installed)")
+        return
+    zstd = compression.zstandard.ZstdCompressor()
+    app = build_app()
+    payload = json.dumps([{"patient_id": str(i), "age": 70} for i in range(5000)]).encode()
+    status, _, body = call(app, "POST", "/api/v1/patient/echo", zstd.compress(payload), [("content-encoding", "zstd")])
+    assert status == 200 and json.loads(b"".join(body))["size"] == len(payload)
+    assert call(app, "POST", "/api/v1/patient/echo", zstd.compress(payload)[:-8], [("content-encoding", "zstd")])[0] == 400
+
+    cap, compression.MAX_DECODED_BYTES = compression.MAX_DECODED_BYTES, 64 * 1024
+    try:
+        # A few kilobytes that expand to 256 MiB: refused long before it is decoded
+        bomb = zstd.compress(b" " * (256 * 1024 * 1024))
+        decoder = compression._ZstdDecoder()
+        tracemalloc.start()
+        try:
+            decoder.decode(bomb, compression.MAX_DECODED_BYTES)
+            raise AssertionError("A body past the cap must be refused!")
+        except HTTPException as e:
+            assert e.status_code == 413
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        assert peak < 8 * 1024 * 1024, f"Held {peak} bytes to find a 64 KiB cap exceeded"
+        assert call(app, "POST", "/api/v1/patient/echo", bomb, [("content-encoding", "zstd")])[0] == 413
+    finally:
+        compression.MAX_DECODED_BYTES = cap
+    print("zstd Request Body Cap Test: PASSED")
+
+def test_responses_are_negotiated_and_streamed():
+    print("\n--- Testing Compressed Responses ---")
+    app = build_app()
+    assert compression.negotiate("gzip;q=0, identity") is None
+    assert compression.negotiate("br, *;q=0.5") in compression.ENCODERS
+
+    status, headers, parts = call(app, "GET", "/api/v1/export/rows", headers=[("accept-encoding", "gzip")])
+    assert status == 200 and headers["content-encoding"] == "gzip" and "accept-encoding" in headers["vary"].lower()
+    # One flushed gzip block per streamed chunk, each decodable as it arrives
+    decoder = zlib.decompressobj(31)
+    decoded = [decoder.decompress(part) for part in parts if part]
+    assert decoded[:3] == [f"{i},{'x' * 2000}\n".encode() for i in range(3)] and decoder.eof
+    assert sum(map(len, parts)) < sum(map(len, decoded)) / 10
+
+    # Under the threshold, or not asked for: sent as is
+    assert "content-encoding" not in call(app, "GET", "/api/v1/patient/small", headers=[("accept-encoding", "gzip")])[1]
+    assert "content-encoding" not in call(app, "GET", "/api/v1/export/rows")[1]
+    print("Compressed Responses Test: PASSED")
+
+if __name__ == "__main__":
+    test_request_bodies_are_decoded_and_capped()
+    test_zstd_request_bodies_are_capped()
+    test_responses_are_negotiated_and_streamed()
@@ -0,0 +1,75 @@
+import math
+import random
+
+import synthetic
+from diversion import DiversionRouter, to_unit_vector
+from models import NetworkHospital, EmergencyCase
+
+def make_network(n, seed):
+    rng = random.Random(seed)
+    hospitals = synthetic.hospitals_from_columns(synthetic.generate_hospital_columns(n, seed))
+    return [NetworkHospital(**h.model_dump(), latitude=rng.uniform(8, 35), longitude=rng.uniform(68, 97)) for h in hospitals]
+
+def test_routes_match_brute_force_as_capacity_fills():
+    print("\n--- Testing Diversion Router ---")
+    network = make_network(120, seed=9)
+    router, reference = DiversionRouter(network), DiversionRouter(network)
+    rng = random.Random(1)
+
+    for k in range(1500):
+        case = EmergencyCase(case_id=str(k), latitude=rng.uniform(8, 35), longitude=rng.uniform(68, 97), needs_icu=rng.random() < 0.25)
+        got = router.route(case)
+
+        q = to_unit_vector(case.latitude, case.longitude)
+        candidates = [
+            (sum((a - b) ** 2 for a, b in zip(reference.tree.points[i], q)), i)
+            for i in range(len(network)) if reference._accepts(i, case.needs_icu)
+        ]
+        if not candidates:
+            assert got.hospital_id is None, got
+            continue
+        i = min(candidates)[1]
+        reference.er_occupied[i] += 1
+        reference.icu_occupied[i] += case.needs_icu
+        assert got.hospital_id == network[i].hospital_id, (k, got, network[i].hospital_id)
+        assert got.hospital_stress_index < router.max_hsi
+
+    assert router.er_occupied == reference.er_occupied and router.icu_occupied == reference.icu_occupied
+    assert router.open_er == sum(router._accepts(i, False) for i in range(len(network)))
+    # Another worker taking over these counters ends up routing exactly the same way
+    replica = DiversionRouter(network)
+    replica.set_counters(router.er_occupied, router.icu_occupied)
+    assert replica.state() == router.state()
+    assert (replica.open_er, replica.open_icu, replica.accepting_icu) == (router.open_er, router.open_icu, router.accepting_icu)
+    print("Diversion Router Test: PASSED")
+
+def test_released_cases_give_their_capacity_back():
+    print("\n--- Testing Diversion Release ---")
+    network = make_network(40, seed=4)
+    router, fresh = DiversionRouter(network), DiversionRouter(network)
+    rng = random.Random(2)
+    cases = [EmergencyCase(case_id=str(k), latitude=rng.uniform(8, 35), longitude=rng.uniform(68, 97), needs_icu=k % 3 == 0)
+             for k in range(600)]
+    routed = [a for a in map(router.route, cases) if a.hospital_id is not None]
+    # Enough traffic that some hospitals stopped accepting
+    assert routed and router.open_er < fresh.open_er
+
+    # Another worker taking over the counters can release what this one routed
+    replica = DiversionRouter(network)
+    replica.set_counters(router.er_occupied, router.icu_occupied, {k: list(v) for k, v in router.assigned.items()})
+    for r in (router, replica):
+        for a in routed:
+            assert r.release(a.case_id) == a.hospital_id
+        assert r.release(routed[0].case_id) is None and r.release("never-routed") is None
+        assert r.state() == fresh.state() and r.assigned == {}
+        assert (r.open_er, r.open_icu, r.accepting_icu) == (fresh.open_er, fresh.open_icu, fresh.accepting_icu)
+
+    # Routing a case again moves it rather than holding two places
+    case = cases[1]
+    first, again = router.route(case), router.route(case)
+    assert first == again and sum(router.er_occupied) == sum(fresh.er_occupied) + 1
+    print("Diversion Release Test: PASSED")
+
+if __name__ == "__main__":
+    test_routes_match_brute_force_as_capacity_fills()
+    test_released_cases_give_their_capacity_back()
@@ -0,0 +1,77 @@
+import random
+
+from er_queue import ERQueue
+from models import ERQueueEntry
+
+def test_queue_order_matches_sorted_reference_under_churn():
+    print("\n--- Testing ER Priority Queue ---")
+    rng = random.Random(17)
+    queue, waiting = ERQueue(1), {}
+    next_id, clock = 0, 0.0
+
+    def expected_next():
+        # Reference: full sort by risk desc, emergency first, then arrival
+        return min(waiting.values(), key=lambda e: (-e.final_risk_score, -e.emergency_case_flag, e.arrival_time)).patient_id
+
+    for _ in range(5000):
+        op = rng.random()
+        clock += 1
+        if op < 0.45 or not waiting:
+            entry = ERQueueEntry(patient_id=str(next_id), final_risk_score=float(rng.randint(0, 20) * 5), severity_class="x",
+                                 emergency_case_flag=rng.randint(0, 1), arrival_time=clock)
+            queue.push(entry)
+            waiting[entry.patient_id] = entry
+            next_id += 1
+        elif op < 0.7:
+            pid = rng.choice(list(waiting))
+            score = float(rng.randint(0, 20) * 5)
+            queue.rescore(pid, score, "y")
+            waiting[pid] = waiting[pid].model_copy(update={"final_risk_score": score})
+        elif op < 0.8:
+            pid = rng.choice(list(waiting))
+            assert queue.remove(pid).patient_id == pid
+            del waiting[pid]
+        else:
+            expected = expected_next()
+            top = queue.peek()
+            assert top.patient_id == expected, (top, waiting[expected])
+            queue.remove(top.patient_id)
+            del waiting[expected]
+
+        assert len(queue.heap) == len(waiting)
+        for i, (_, item) in enumerate(queue.heap.heap):
+            assert queue.heap.position[item] == i
+
+    ordered = [e.patient_id for e in queue.top(len(waiting))]
+    assert ordered == [e.patient_id for e in sorted(waiting.values(), key=lambda e: (-e.final_risk_score, -e.emergency_case_flag, e.arrival_time))]
+    print("ER Priority Queue Test: PASSED")
+
+def test_what_if_scoring_leaves_triage_order_alone():
+    print("\n--- Testing ER Order Under What-If Scoring ---")
+    import asyncio
+    import history
+    import main
+    from models import PatientData
+
+    history.init()
+
+    async def scenario():
+        low = PatientData(patient_id="ER-WHATIF-LOW")
+        high = PatientData(patient_id="ER-WHATIF-HIGH", heart_rate_bpm=170, respiratory_rate_bpm=35, emergency_case_flag=1)
+        await main.join_er_queue(9902, low)
+        await main.join_er_queue(9902, high)
+        queue = main.er_queues.queue(9902)
+        before = [e.patient_id for e in queue.top(2)]
+        # A hypothetical score for a waiting patient must not move them up the queue
+        await main.analyze_patient(low.model_copy(update={"heart_rate_bpm": 200, "icu_required_flag": 1}), is_oxygen_crisis=True)
+        await main.analyze_patient_bulk([low.model_copy(update={"heart_rate_bpm": 200, "icu_required_flag": 1})])
+        assert [e.patient_id for e in queue.top(2)] == before == ["ER-WHATIF-HIGH", "ER-WHATIF-LOW"]
+        for pid in before:
+            main.er_queues.leave(9902, pid)
+
+    asyncio.run(scenario())
+    print("ER Order Under What-If Scoring Test: PASSED")
+
+if __name__ == "__main__":
+    test_queue_order_matches_sorted_reference_under_churn()
+    test_what_if_scoring_leaves_triage_order_alone()
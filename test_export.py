@@ -0,0 +1,83 @@
+import io
+
+import pandas as pd
+
+import openpyxl
+
+import export
+import synthetic
+import xlsx
+from census import CensusStore
+
+HEADER = ["patient_id", "final_risk_score", "severity_class", "icu_required_flag"]
+
+def test_csv_and_xlsx_round_trip_and_stream():
+    print("\n--- Testing Streaming Export ---")
+    rows = [[str(i), i * 1.25, "Critical" if i % 3 else 'Low <"&">', i % 2] for i in range(25)]
+    consumed = []
+
+    def chunks():
+        for chunk in export.chunked(rows, 10):
+            consumed.append(len(chunk))
+            yield chunk
+
+    for fmt, read in (("csv", pd.read_csv), ("xlsx", pd.read_excel)):
+        consumed.clear()
+        stream = export.stream(fmt, HEADER, chunks())
+        parts = [next(stream)]
+        # The header goes out before any row is pulled from the source
+        assert consumed == [] and parts[0]
+        parts.extend(stream)
+        assert consumed == [10, 10, 5]
+        df = read(io.BytesIO(b"".join(parts)), dtype={"patient_id": str})
+        assert df.columns.tolist() == HEADER
+        assert df.values.tolist() == rows, fmt
+    print("Streaming Export Test: PASSED")
+
+def test_csv_cells_cannot_become_formulas():
+    print("\n--- Testing CSV Formula Injection ---")
+    rows = [["=HYPERLINK(\"http://x\")", -2.5, "+1", 0], ["@SUM(A1:A2)", 1.0, "-cmd", 1], ["\t=1", 2.0, "a=b", -1]]
+    df = pd.read_csv(io.BytesIO(b"".join(export.stream("csv", HEADER, [rows]))), dtype={"patient_id": str, "severity_class": str})
+    # Text is quoted with a leading apostrophe; numbers, even negative ones, are left alone
+    assert df.values.tolist() == [["'=HYPERLINK(\"http://x\")", -2.5, "'+1", 0], ["'@SUM(A1:A2)", 1.0, "'-cmd", 1],
+                                  ["'\t=1", 2.0, "a=b", -1]]
+    print("CSV Formula Injection Test: PASSED")
+
+def test_xlsx_cells_are_valid_xml_and_roll_over():
+    print("\n--- Testing XLSX Cell Cleaning And Sheet Rollover ---")
+    # Characters XML 1.0 cannot carry, escaped or not, would make the whole workbook unreadable
+    rows = [[str(i), f"note\x00{i}\x0b\x1f\ud800\uffff & <tab>\t", i * 0.5] for i in range(25)]
+    limit, xlsx.MAX_ROWS = xlsx.MAX_ROWS, 10
+    try:
+        data = b"".join(export.iter_xlsx(["patient_id", "note", "score"], export.chunked(rows, 7), sheet_name="Risk\x07"))
+    finally:
+        xlsx.MAX_ROWS = limit
+    book = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+    assert book.sheetnames == ["Risk", "Risk 2", "Risk 3"]
+    read = []
+    for sheet in book.worksheets:
+        header, *body = sheet.iter_rows(values_only=True)
+        assert header == ("patient_id", "note", "score")
+        read.extend(list(r) for r in body)
+    assert read == [[str(i), f"note{i} & <tab>\t", i * 0.5] for i in range(25)]
+    print("XLSX Cell Cleaning And Sheet Rollover Test: PASSED")
+
+def test_census_export_follows_query_order():
+    print("\n--- Testing Census Export Order ---")
+    store = CensusStore()
+    store.load_columns(synthetic.generate_patient_columns(300, seed=5))
+    _, expected = store.query(sort="age", descending=False, limit=1000)
+    chunks = store.export_chunks(sort="age", descending=False, chunk_rows=64)
+    first = next(chunks)
+    # Discharged mid-export: skipped, not an error
+    store.discharge(expected[-1]["patient_id"])
+    exported = first + [r for chunk in chunks for r in chunk]
+    assert len(first) == 64
+    assert [r["patient_id"] for r in exported] == [r["patient_id"] for r in expected[:-1]]
+    print("Census Export Order Test: PASSED")
+
+if __name__ == "__main__":
+    test_csv_and_xlsx_round_trip_and_stream()
+    test_csv_cells_cannot_become_formulas()
+    test_xlsx_cells_are_valid_xml_and_roll_over()
+    test_census_export_follows_query_order()
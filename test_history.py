@@ -0,0 +1,118 @@
+import random
+import tempfile
+
+from history import HistoryStore
+
+FIELDS = ("hospital_stress_index", "global_system_classification", "critical_patients_count")
+
+def classify(hsi):
+    return "System Overload" if hsi >= 0.9 else "Critical Capacity" if hsi >= 0.7 else "Elevated Stress"
+
+def test_point_in_time_and_range_match_replay():
+    print("\n--- Testing History Store ---")
+    rng = random.Random(21)
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore("hospitals", FIELDS, directory, block_seconds=600, max_deltas=500)
+        truth = {}  # hospital -> list of (t, state or None)
+        t = 1_700_000_000.0
+        for _ in range(6000):
+            t += 5
+            hospital = rng.randrange(12)
+            if rng.random() < 0.01:
+                store.append(hospital, None, t)
+                truth.setdefault(hospital, []).append((t, None))
+                continue
+            hsi = round(rng.uniform(0.3, 1.0), 3)
+            state = {"hospital_stress_index": hsi, "global_system_classification": classify(hsi), "critical_patients_count": rng.randrange(30)}
+            store.append(hospital, state, t)
+            truth.setdefault(hospital, []).append((t, state))
+
+        def expected_at(hospital, when):
+            state = None
+            for ts, s in truth.get(hospital, []):
+                if ts > when:
+                    break
+                state = s
+            return state
+
+        # Reopen from disk: sealed blocks are read back, the open block is flushed first
+        store.flush()
+        reopened = HistoryStore("hospitals", FIELDS, directory, block_seconds=600, max_deltas=500)
+        assert len(reopened.index) > 10
+        for _ in range(300):
+            when = rng.uniform(1_700_000_000.0 - 100, t + 100)
+            hospital = rng.randrange(12)
+            assert reopened.at(hospital, when) == expected_at(hospital, when), (hospital, when)
+
+        start, end = 1_700_000_000.0 + 7000, 1_700_000_000.0 + 19000
+        points = reopened.range(3, start, end)
+        assert points[0] == {"timestamp": start, "state": expected_at(3, start)}
+        assert [(p["timestamp"], p["state"]) for p in points[1:]] == [(ts, s) for ts, s in truth[3] if start < ts <= end]
+    print("History Store Test: PASSED")
+
+def test_workers_share_one_history():
+    print("\n--- Testing History Shared By Workers ---")
+    rng = random.Random(43)
+    with tempfile.TemporaryDirectory() as directory:
+        # Two workers appending to the same store, each with its own process-local view
+        workers = [HistoryStore("hospitals", FIELDS, directory, block_seconds=300, max_deltas=200) for _ in range(2)]
+        truth, t = {}, 1_700_000_000.0
+        for _ in range(3000):
+            t += 5
+            hospital = rng.randrange(8)
+            hsi = round(rng.uniform(0.3, 1.0), 3)
+            state = {"hospital_stress_index": hsi, "global_system_classification": classify(hsi), "critical_patients_count": rng.randrange(5)}
+            rng.choice(workers).append(hospital, state, t)
+            truth.setdefault(hospital, []).append((t, state))
+
+        def expected_at(hospital, when):
+            state = None
+            for ts, s in truth.get(hospital, []):
+                if ts > when:
+                    break
+                state = s
+            return state
+
+        # Blocks were sealed one at a time, each after the last, whichever worker sealed them
+        later = HistoryStore("hospitals", FIELDS, directory, block_seconds=300, max_deltas=200)
+        stores = workers + [later]
+        assert len(later.index) > 10 and all(a[1] <= b[0] for a, b in zip(later.index, later.index[1:]))
+        for _ in range(300):
+            when = rng.uniform(1_700_000_000.0, t + 10)
+            hospital = rng.randrange(8)
+            assert all(store.at(hospital, when) == expected_at(hospital, when) for store in stores), (hospital, when)
+        # Including the open block, which no worker holds to itself
+        assert all(store.states_at(t)[str(h)] == expected_at(h, t) for store in stores for h in range(8))
+        points = later.range(2, t - 2000, t)
+        assert [(p["timestamp"], p["state"]) for p in points[1:]] == [(ts, s) for ts, s in truth[2] if t - 2000 < ts <= t]
+    print("History Shared By Workers Test: PASSED")
+
+def test_history_records_census_and_er_patients_only():
+    print("\n--- Testing Patient History Sources ---")
+    import asyncio
+    import time
+    import history
+    import main
+    from models import PatientData
+
+    history.init()
+
+    async def scenario():
+        # History outlives the process, so each run records a patient of its own
+        patient = PatientData(patient_id=f"HIST-WHATIF-{time.time_ns()}", heart_rate_bpm=140)
+        await main.analyze_patient(patient, is_oxygen_crisis=True)
+        await main.analyze_patient_bulk([patient] * 3)
+        # Records are kept to the millisecond (rounded), so look a little ahead
+        assert history.patients.at(patient.patient_id, time.time() + 1) is None
+        # Joining an ER queue is a real admission and is recorded
+        await main.join_er_queue(9901, patient)
+        assert history.patients.at(patient.patient_id, time.time() + 1) is not None
+        main.er_queues.leave(9901, patient.patient_id)
+
+    asyncio.run(scenario())
+    print("Patient History Sources Test: PASSED")
+
+if __name__ == "__main__":
+    test_point_in_time_and_range_match_replay()
+    test_workers_share_one_history()
+    test_history_records_census_and_er_patients_only()
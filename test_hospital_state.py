@@ -0,0 +1,39 @@
+import random
+
+import synthetic
+from engine import calculate_hospital_stress
+from hospital_state import HospitalState, EVENT_COUNTERS
+from models import HospitalEvent
+
+def test_incremental_hsi_matches_full_recomputation():
+    print("\n--- Testing Event-Sourced Hospital State ---")
+    rng = random.Random(11)
+    for hospital in synthetic.hospitals_from_columns(synthetic.generate_hospital_columns(20, seed=4)):
+        state = HospitalState(hospital)
+        for _ in range(300):
+            event = HospitalEvent(type=rng.choice(list(EVENT_COUNTERS)), count=rng.randint(1, 3))
+            try:
+                state.apply([event])
+            except ValueError:
+                continue
+            expected = calculate_hospital_stress(state.hospital, state.critical_patients_count)
+            assert state.result() == expected, (event, state.result(), expected)
+    print("Event-Sourced Hospital State Test: PASSED")
+
+def test_invalid_batch_is_rejected_whole():
+    print("\n--- Testing Event Batch Atomicity ---")
+    hospital = synthetic.hospitals_from_columns(synthetic.generate_hospital_columns(1, seed=8))[0]
+    state = HospitalState(hospital)
+    before = (state.hospital.model_copy(), state.hsi)
+    free = hospital.icu_beds_total - hospital.icu_beds_occupied
+    try:
+        state.apply([HospitalEvent(type="er_arrival", count=5), HospitalEvent(type="icu_admit", count=free + 1)])
+        assert False, "ICU overflow accepted"
+    except ValueError:
+        pass
+    assert (state.hospital, state.hsi) == before and state.events_applied == 0
+    print("Event Batch Atomicity Test: PASSED")
+
+if __name__ == "__main__":
+    test_incremental_hsi_matches_full_recomputation()
+    test_invalid_batch_is_rejected_whole()
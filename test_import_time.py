@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Cold `import main` on a warm disk cache; raise it on slow CI machines
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", 0.9))
+# Loaded on first use, never by the import
+DEFERRED_MODULES = ("pandas", "pyarrow", "sqlalchemy", "google.oauth2", "aiosmtplib", "jobs")
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {modules!r} if m in sys.modules]}}))
+"""
+
+# Databases and folders are created by init() from the lifespan, never by an import
+SETUP_PROBE = """
+import json, os, sys
+sys.path.insert(0, {root!r})
+import auth_db, jobs
+imported = sorted(os.listdir("."))
+auth_db.init(), jobs.init()
+print(json.dumps({{"imported": imported, "initialised": sorted(os.listdir("."))}}))
+"""
+
+def measure_import():
+    """Best of three fresh interpreters, so one noisy run does not fail the budget."""
+    runs = []
+    for _ in range(3):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(root=ROOT, modules=DEFERRED_MODULES)],
+                             capture_output=True, text=True, check=True, cwd=ROOT)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda r: r["seconds"])
+
+def test_import_stays_within_budget():
+    print("\n--- Testing Import-Time Budget ---")
+    run = measure_import()
+    print(f"import main: {run['seconds'] * 1000:.0f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)")
+    assert run["loaded"] == [], f"Imported eagerly: {run['loaded']}"
+    assert run["seconds"] <= IMPORT_BUDGET_SECONDS, run
+    print("Import-Time Budget Test: PASSED")
+
+def test_database_modules_create_nothing_on_import():
+    print("\n--- Testing Database Setup Is Deferred ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        out = subprocess.run([sys.executable, "-c", SETUP_PROBE.format(root=ROOT)], capture_output=True, text=True, cwd=tmp)
+        assert out.returncode == 0, out.stderr[-2000:]
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+    assert run["imported"] == []
+    assert run["initialised"] == ["auth.db", "jobs", "jobs.db"]
+    print("Database Setup Is Deferred Test: PASSED")
+
+if __name__ == "__main__":
+    test_import_stays_within_budget()
+    test_database_modules_create_nothing_on_import()
@@ -0,0 +1,183 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from shared_state import SharedState
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+JOB_ROWS = 3000
+JOB_CHUNK_ROWS = 500
+
+# Queues jobs without running them, as a worker that died mid-run leaves them
+SETUP = """
+import sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+import jobs, synthetic
+jobs.init()
+for i in range({n}):
+    path = f"input_{{i}}.csv"
+    pd.DataFrame(synthetic.generate_patient_columns({rows}, seed=i)).to_csv(path, index=False)
+    db = jobs.JobSession()
+    db.add(jobs.ScoringJob(id=f"job{{i}}", status="running" if i % 2 else "queued", source="test", input_path=path,
+                           input_format="csv", is_oxygen_crisis=False, created_at=time.time()))
+    db.commit()
+    db.close()
+"""
+
+# Submit, poll and read back through the API, as a client would
+LIFECYCLE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+from fastapi.testclient import TestClient
+import main, synthetic
+
+def wait(client, job):
+    seen = []
+    deadline = time.monotonic() + 60
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        seen.append((job["rows_done"], job["chunks_done"]))
+        time.sleep(0.02)
+        job = client.get(f"/api/v1/jobs/{{job['job_id']}}").json()
+    return job, seen
+
+columns = synthetic.generate_patient_columns({rows}, seed=28)
+with TestClient(main.app) as client:
+    submitted = client.post("/api/v1/jobs", content=pd.DataFrame(columns).to_csv(index=False).encode(),
+                            headers={{"content-type": "text/csv"}})
+    early = client.get(f"/api/v1/jobs/{{submitted.json()['job_id']}}/results")
+    done, seen = wait(client, submitted.json())
+    chunks = [client.get(f"/api/v1/jobs/{{done['job_id']}}/results", params={{"chunk": i}}).json()["results"]
+              for i in range(done["chunks_done"])]
+    broken, _ = wait(client, client.post("/api/v1/jobs", content=b"foo,bar\\n1,2\\n", headers={{"content-type": "text/csv"}}).json())
+    out = {{
+        "submit_status": submitted.status_code, "submitted": submitted.json(), "early_status": early.status_code,
+        "done": done, "seen": seen, "result_ids": [r["patient_id"] for chunk in chunks for r in chunk],
+        "broken": broken, "broken_results": client.get(f"/api/v1/jobs/{{broken['job_id']}}/results").status_code,
+        "missing": client.get("/api/v1/jobs/nope").status_code,
+        "ids": columns["patient_id"].tolist(),
+    }}
+print(json.dumps(out))
+"""
+
+# A worker died after scoring two chunks: their results are stored, the job is still running
+INTERRUPTED = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+import jobs, synthetic
+jobs.init()
+pd.DataFrame(synthetic.generate_patient_columns({rows}, seed=29)).to_csv("input.csv", index=False)
+db = jobs.JobSession()
+db.add(jobs.ScoringJob(id="resumed", status="running", source="test", input_path="input.csv", input_format="csv",
+                       is_oxygen_crisis=False, rows_total={rows}, rows_done=2 * {chunk}, chunks_done=2,
+                       created_at=time.time(), started_at=time.time()))
+for i in range(2):
+    db.add(jobs.ScoringJobChunk(job_id="resumed", chunk_index=i, results=json.dumps([{{"patient_id": "kept"}}] * {chunk})))
+db.commit()
+db.close()
+"""
+
+# One uvicorn worker's startup: resume whatever nobody else owns, run it to the end
+WORKER = """
+import asyncio, json, sys
+sys.path.insert(0, {root!r})
+import jobs, bulk_pool
+
+async def main():
+    jobs.init()
+    jobs.resume_pending_jobs()
+    claimed = sorted(jobs._tasks)
+    await asyncio.gather(*list(jobs._tasks.values()))
+    bulk_pool.shutdown_pool()
+    print(json.dumps(claimed))
+
+asyncio.run(main())
+"""
+
+def test_job_lifecycle_through_the_api():
+    print("\n--- Testing Job Lifecycle ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SHARED_STATE_PATH=os.path.join(tmp, "shared.db"), JOB_CHUNK_ROWS=str(JOB_CHUNK_ROWS),
+                   BULK_POOL_WORKERS="1", HISTORY_DIR=os.path.join(tmp, "history"))
+        out = subprocess.run([sys.executable, "-c", LIFECYCLE.format(root=ROOT, rows=JOB_ROWS)], cwd=tmp, env=env,
+                             capture_output=True, text=True, timeout=180)
+        assert out.returncode == 0, out.stderr[-2000:]
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert run["submit_status"] == 202 and run["submitted"]["status"] in ("queued", "running")
+    assert run["early_status"] == 409
+    done = run["done"]
+    assert done["status"] == "completed" and done["error"] is None, done
+    assert done["rows_total"] == done["rows_done"] == JOB_ROWS and done["chunks_done"] == JOB_ROWS // JOB_CHUNK_ROWS
+    assert done["rows_per_second"] > 0 and done["eta_seconds"] is None
+    # Progress only moves forward, a whole chunk at a time
+    assert run["seen"] == sorted(run["seen"]) and all(rows == chunks * JOB_CHUNK_ROWS for rows, chunks in run["seen"])
+    assert run["result_ids"] == run["ids"]
+
+    broken = run["broken"]
+    assert broken["status"] == "failed" and broken["error"] and broken["rows_done"] == 0
+    assert run["broken_results"] == 409 and run["missing"] == 404
+    print("Job Lifecycle Test: PASSED")
+
+def test_resumed_job_keeps_finished_chunks():
+    print("\n--- Testing Job Resume After Restart ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SHARED_STATE_PATH=os.path.join(tmp, "shared.db"), JOB_CHUNK_ROWS=str(JOB_CHUNK_ROWS),
+                   BULK_POOL_WORKERS="1")
+        subprocess.run([sys.executable, "-c", INTERRUPTED.format(root=ROOT, rows=JOB_ROWS, chunk=JOB_CHUNK_ROWS)],
+                       cwd=tmp, env=env, check=True)
+        worker = subprocess.run([sys.executable, "-c", WORKER.format(root=ROOT)], cwd=tmp, env=env,
+                                capture_output=True, text=True, timeout=180)
+        assert worker.returncode == 0, worker.stderr[-2000:]
+        assert json.loads(worker.stdout.strip().splitlines()[-1]) == ["resumed"]
+
+        with sqlite3.connect(os.path.join(tmp, "jobs.db")) as db:
+            status = db.execute("SELECT status, rows_done, chunks_done FROM scoring_jobs WHERE id = 'resumed'").fetchone()
+            chunks = dict(db.execute("SELECT chunk_index, results FROM scoring_job_chunks WHERE job_id = 'resumed'"))
+
+    assert status == ("completed", JOB_ROWS, JOB_ROWS // JOB_CHUNK_ROWS)
+    assert sorted(chunks) == list(range(JOB_ROWS // JOB_CHUNK_ROWS))
+    # The chunks stored before the restart are not scored again; the rest are
+    assert all({r["patient_id"] for r in json.loads(chunks[i])} == {"kept"} for i in (0, 1))
+    assert json.loads(chunks[2])[0]["patient_id"] == f"SYN{2 * JOB_CHUNK_ROWS}"
+    print("Job Resume After Restart Test: PASSED")
+
+def test_two_workers_never_run_the_same_job():
+    print("\n--- Testing Job Ownership Across Workers ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SHARED_STATE_PATH=os.path.join(tmp, "shared.db"), JOB_CHUNK_ROWS=str(JOB_CHUNK_ROWS),
+                   BULK_POOL_WORKERS="1")
+        subprocess.run([sys.executable, "-c", SETUP.format(root=ROOT, n=6, rows=JOB_ROWS)], cwd=tmp, env=env, check=True)
+        # job5 is still being run by a live sibling that holds its lease
+        SharedState(env["SHARED_STATE_PATH"]).acquire("job:job5", "live-sibling", 120)
+
+        workers = [subprocess.Popen([sys.executable, "-c", WORKER.format(root=ROOT)], cwd=tmp, env=env,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) for _ in range(2)]
+        claimed = []
+        for worker in workers:
+            out, err = worker.communicate(timeout=180)
+            assert worker.returncode == 0, err[-2000:]
+            claimed.append(json.loads(out.strip().splitlines()[-1]))
+
+        with sqlite3.connect(os.path.join(tmp, "jobs.db")) as db:
+            jobs = dict(db.execute("SELECT id, status || ':' || rows_done FROM scoring_jobs"))
+            chunks = dict(db.execute("SELECT job_id, count(*) FROM scoring_job_chunks GROUP BY job_id"))
+
+    a, b = map(set, claimed)
+    assert not a & b, f"Both workers ran {a & b}"
+    assert a | b == {f"job{i}" for i in range(5)}
+    # Each job scored exactly once: one chunk row per chunk, no doubled row counts
+    for i in range(5):
+        assert jobs[f"job{i}"] == f"completed:{JOB_ROWS}" and chunks[f"job{i}"] == JOB_ROWS // JOB_CHUNK_ROWS
+    assert jobs["job5"] == "running:0" and "job5" not in chunks
+    print("Job Ownership Across Workers Test: PASSED")
+
+if __name__ == "__main__":
+    test_job_lifecycle_through_the_api()
+    test_resumed_job_keeps_finished_chunks()
+    test_two_workers_never_run_the_same_job()
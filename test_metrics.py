@@ -0,0 +1,101 @@
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+
+# One sample line of the Prometheus text format: name, optional {labels}, value
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*",?)*\})? (\S+)$')
+
+def parse(text: str) -> dict:
+    """Checks every line of an exposition and returns {name{labels}: value}."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert kind in ("counter", "gauge", "histogram") and name not in types, line
+            types[name] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"Not a valid sample line: {line!r}"
+        name, labels, value = match.groups()
+        assert re.sub(r"_(bucket|sum|count)$", "", name) in types or name in types, f"Sample before its TYPE: {line}"
+        samples[name + (labels or "")] = float(value)
+    return samples
+
+def test_exposition_format():
+    print("\n--- Testing Metrics Exposition Format ---")
+    counter = metrics.Counter("test_widgets_total", "Widgets made", ("kind",))
+    gauge = metrics.Gauge("test_depth", "Queue depth")
+    histogram = metrics.Histogram("test_seconds", "Step duration", ("step",), buckets=(0.5, 0.1, 1.0))
+    try:
+        counter.labels('say "hi"\\\n').inc(2)
+        counter.labels(kind="plain").inc()
+        gauge.inc(5)
+        gauge.dec(2)
+        for value in (0.05, 0.1, 0.7, 3.0):
+            histogram.labels("load").observe(value)
+
+        text = metrics.render_latest()
+        assert text.endswith("\n")
+        samples = parse(text)
+        assert samples['test_widgets_total{kind="say \\"hi\\"\\\\\\n"}'] == 2
+        assert samples['test_widgets_total{kind="plain"}'] == 1
+        assert samples["test_depth"] == 3
+        # Buckets are sorted, cumulative and end in +Inf, which equals _count
+        assert [samples[f'test_seconds_bucket{{step="load",le="{le}"}}'] for le in ("0.1", "0.5", "1.0", "+Inf")] == [2, 2, 3, 4]
+        assert samples['test_seconds_count{step="load"}'] == 4 and samples['test_seconds_sum{step="load"}'] == 3.85
+        assert "# HELP test_seconds Step duration\n# TYPE test_seconds histogram\n" in text
+    finally:
+        for metric in (counter, gauge, histogram):
+            metrics.REGISTRY.remove(metric)
+    print("Metrics Exposition Format Test: PASSED")
+
+def test_middleware_counts_requests_by_route():
+    print("\n--- Testing Metrics Middleware ---")
+    client = TestClient(main.app)
+    route = ("GET", "/api/v1/hospital/{hospital_id}/state", "404")
+    before = metrics.REQUEST_SECONDS.labels(*route).counts[:]
+    scored = metrics.ENGINE_ITEMS.labels("patient_risk").value
+
+    # Two hospital ids, one series: labelled by the route template, not the path
+    assert client.get("/api/v1/hospital/990331/state").status_code == 404
+    assert client.get("/api/v1/hospital/990332/state").status_code == 404
+    assert client.post("/api/v1/patient/analyze", json={"patient_id": "P_METRICS"}).status_code == 200
+    assert client.get("/no/such/route").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.headers["content-type"] == metrics.PROMETHEUS_CONTENT_TYPE
+    samples = parse(response.text)
+    assert sum(metrics.REQUEST_SECONDS.labels(*route).counts) - sum(before) == 2
+    assert not any("990331" in key for key in samples)
+    assert samples['carepulse_http_request_duration_seconds_count{method="POST",route="/api/v1/patient/analyze",status="200"}'] >= 1
+    assert samples['carepulse_http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}'] >= 1
+    assert metrics.ENGINE_ITEMS.labels("patient_risk").value == scored + 1
+    # /metrics itself is still in flight while it renders; everything else has finished
+    assert samples["carepulse_http_requests_in_progress"] == 1 and metrics.REQUESTS_IN_PROGRESS._default().value == 0
+    print("Metrics Middleware Test: PASSED")
+
+def test_middleware_records_failures_as_500():
+    print("\n--- Testing Metrics Middleware On Errors ---")
+    app = FastAPI()
+
+    @app.get("/api/v1/boom/{n}")
+    async def boom(n: int):
+        raise RuntimeError("boom")
+
+    app.add_middleware(metrics.MetricsMiddleware)
+    series = metrics.REQUEST_SECONDS.labels("GET", "/api/v1/boom/{n}", "500")
+    before = sum(series.counts)
+    assert TestClient(app, raise_server_exceptions=False).get("/api/v1/boom/1").status_code == 500
+    assert sum(series.counts) == before + 1 and metrics.REQUESTS_IN_PROGRESS._default().value == 0
+    print("Metrics Middleware On Errors Test: PASSED")
+
+if __name__ == "__main__":
+    test_exposition_format()
+    test_middleware_counts_requests_by_route()
+    test_middleware_records_failures_as_500()
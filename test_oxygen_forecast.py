@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+
+from engine import OXYGEN_CRISIS_LEVEL
+from models import OxygenReading
+from oxygen_forecast import ConsumptionModel, OxygenForecaster
+
+def test_rls_matches_batch_least_squares():
+    print("\n--- Testing Oxygen Consumption RLS ---")
+    rng = random.Random(3)
+    model = ConsumptionModel(forgetting=1.0)
+    X, y = [], []
+    for _ in range(400):
+        x = [1.0, rng.randint(0, 30), rng.randint(0, 40)]
+        rate = 0.2 + 0.04 * x[1] + 0.01 * x[2] + rng.gauss(0, 0.02)
+        model.update(x, rate)
+        X.append(x)
+        y.append(rate)
+    expected = np.linalg.lstsq(np.array(X), np.array(y), rcond=None)[0]
+    assert np.allclose(model.theta, expected, atol=1e-3), (model.theta, expected)
+    print("Oxygen Consumption RLS Test: PASSED")
+
+def test_forecast_tracks_depletion_and_resupply():
+    print("\n--- Testing Oxygen Forecast ---")
+    forecaster = OxygenForecaster()
+    rng = random.Random(5)
+    level, vents, icu, t = 95.0, 10, 20, 0.0
+    readings = []
+    for _ in range(48):
+        readings.append(OxygenReading(timestamp=t, oxygen_supply_level_percent=level, ventilators_in_use=vents, icu_beds_occupied=icu))
+        t += 3600
+        next_vents = max(0, vents + rng.choice((-1, 0, 1)))
+        next_icu = max(next_vents, icu + rng.choice((-1, 0, 1)))
+        level -= 0.3 + 0.05 * (vents + next_vents) / 2 + 0.01 * (icu + next_icu) / 2
+        vents, icu = next_vents, next_icu
+    forecast = forecaster.ingest(7, readings)
+
+    rate = 0.3 + 0.05 * readings[-1].ventilators_in_use + 0.01 * readings[-1].icu_beds_occupied
+    assert abs(forecast["consumption_rate_per_hour"] - rate) < 0.01, (forecast, rate)
+    expected_hours = (readings[-1].oxygen_supply_level_percent - OXYGEN_CRISIS_LEVEL) / rate
+    assert abs(forecast["hours_to_crisis"] - max(0.0, expected_hours)) < 0.5
+
+    # A resupply re-anchors the level without being read as negative consumption
+    resupplied = forecaster.ingest(7, [OxygenReading(timestamp=t, oxygen_supply_level_percent=100, ventilators_in_use=vents, icu_beds_occupied=icu)])
+    assert resupplied["resupplies"] == 1 and resupplied["observations"] == forecast["observations"]
+    assert resupplied["hours_to_crisis"] > forecast["hours_to_crisis"]
+
+    try:
+        forecaster.ingest(7, [OxygenReading(timestamp=0, oxygen_supply_level_percent=50)])
+        assert False, "out-of-order reading accepted"
+    except ValueError:
+        pass
+    assert forecaster.forecast(7) == resupplied
+    print("Oxygen Forecast Test: PASSED")
+
+if __name__ == "__main__":
+    test_rls_matches_batch_least_squares()
+    test_forecast_tracks_depletion_and_resupply()
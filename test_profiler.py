@@ -0,0 +1,157 @@
+import asyncio
+import json
+import marshal
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiler
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# The auth backend has its own main/models/database modules, so it gets its own interpreter
+BACKEND_PROBE = """
+import json, sys
+sys.path.insert(0, {backend!r})
+from fastapi.testclient import TestClient
+import auth, database, main, models
+
+models.Base.metadata.create_all(bind=database.engine)
+db = database.SessionLocal()
+db.add_all([models.User(email="admin@carepulse.test", role="Admin"), models.User(email="nurse@carepulse.test", role="Nurse")])
+db.commit()
+db.close()
+bearer = lambda email: {{"Authorization": "Bearer " + auth.create_access_token(data={{"sub": email}})}}
+admin, nurse = bearer("admin@carepulse.test"), bearer("nurse@carepulse.test")
+
+routes = [("post", "/admin/profiler/start", {{"mode": "sample", "seconds": 30}}), ("get", "/admin/profiler", None),
+          ("post", "/admin/profiler/stop", None), ("get", "/admin/profiler/result", None)]
+out = {{"anonymous": [], "nurse": [], "admin": []}}
+with TestClient(main.app) as client:
+    for who, headers in (("anonymous", {{}}), ("nurse", nurse), ("admin", admin)):
+        for method, path, body in routes:
+            out[who].append(getattr(client, method)(path, headers=headers, **({{"json": body}} if body else {{}})).status_code)
+print(json.dumps(out))
+"""
+
+def _reset():
+    profiler.stop()
+    profiler._last = None
+
+def _busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+def test_timed_sample_session():
+    print("\n--- Testing Timed Sampling Profile ---")
+    _reset()
+
+    async def scenario():
+        started = profiler.start("sample", seconds=0.3, interval_ms=2)
+        try:
+            profiler.start("sample", seconds=1)
+            raise AssertionError("A second session must be refused while one runs!")
+        except profiler.ProfilerBusy as e:
+            assert str(e) == started["session_id"]
+        try:
+            profiler.result()
+            raise AssertionError("A running session has no result yet!")
+        except profiler.ProfileNotReady:
+            pass
+        # Busy on a worker thread, which the sampler sees through sys._current_frames()
+        await asyncio.get_running_loop().run_in_executor(None, _busy, 0.2)
+        await asyncio.sleep(0.2)
+        return started
+
+    started = asyncio.run(scenario())
+    status = profiler.status()
+    assert status["session_id"] == started["session_id"] and not status["running"] and status["samples"] > 0
+    content, media_type, filename = profiler.result()
+    assert media_type == "text/plain" and filename == f"profile-{started['session_id']}.collapsed"
+    lines = content.strip().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("_busy (test_profiler.py" in line for line in lines)
+    assert profiler.stop() is None  # already finished by its deadline
+    print("Timed Sampling Profile Test: PASSED")
+
+def test_route_scoped_cprofile_session():
+    print("\n--- Testing Route-Scoped cProfile Session ---")
+    _reset()
+    app = FastAPI()
+
+    @app.post("/start")
+    async def start():
+        return profiler.start("cprofile", route="/work/{n}", requests=2)
+
+    @app.get("/work/{n}")
+    async def work(n: int):
+        _busy(0.01)
+        return {"n": n}
+
+    @app.get("/other")
+    async def other():
+        return {}
+
+    app.add_middleware(profiler.ProfilerMiddleware)
+    with TestClient(app) as client:
+        client.post("/start")
+        client.get("/other")
+        client.get("/work/1")
+        assert profiler.status()["running"] and profiler.status()["requests_seen"] == 1
+        client.get("/work/2")
+    # Only requests matching the route template count, and the session ends at the target
+    status = profiler.status()
+    assert not status["running"] and status["requests_seen"] == 2
+    content, media_type, _ = profiler.result()
+    assert media_type == "application/octet-stream"
+    functions = {name for (_, _, name) in marshal.loads(content)}
+    assert "_busy" in functions and "other" not in functions
+    print("Route-Scoped cProfile Session Test: PASSED")
+
+def test_session_arguments_are_validated():
+    print("\n--- Testing Profiler Argument Validation ---")
+    _reset()
+
+    async def scenario():
+        for kwargs in ({"mode": "perf", "seconds": 1}, {"seconds": 1, "route": "/x", "requests": 1}, {},
+                       {"seconds": profiler.MAX_SECONDS + 1}, {"route": "/x", "requests": 0}, {"seconds": 1, "interval_ms": 0}):
+            try:
+                profiler.start(**kwargs)
+                raise AssertionError(f"{kwargs} must be rejected!")
+            except ValueError:
+                pass
+
+    asyncio.run(scenario())
+    assert profiler.status() is None and profiler.stop() is None
+    try:
+        profiler.result()
+        raise AssertionError("No session, no result!")
+    except LookupError:
+        pass
+    print("Profiler Argument Validation Test: PASSED")
+
+def test_backend_profiler_routes_are_admin_only():
+    print("\n--- Testing Profiler Routes Are Admin Only ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Launched as the README does: the repository root on PYTHONPATH for metrics/profiler
+        out = subprocess.run([sys.executable, "-c", BACKEND_PROBE.format(backend=os.path.join(ROOT, "backend"))],
+                             cwd=tmp, capture_output=True, text=True, timeout=120, env={**os.environ, "PYTHONPATH": ROOT})
+        assert out.returncode == 0, out.stderr[-2000:]
+        codes = json.loads(out.stdout.strip().splitlines()[-1])
+    assert codes["anonymous"] == [401] * 4
+    assert codes["nurse"] == [403] * 4
+    # Admin: started, reported, stopped, then the finished session's stacks
+    assert codes["admin"] == [200, 200, 200, 200]
+    print("Profiler Routes Are Admin Only Test: PASSED")
+
+if __name__ == "__main__":
+    test_timed_sample_session()
+    test_route_scoped_cprofile_session()
+    test_session_arguments_are_validated()
+    test_backend_profiler_routes_are_admin_only()
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+from pubsub import Broadcaster
+
+def parse_frames(text):
+    events = []
+    for frame in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_only_changes_are_published_and_slow_readers_coalesce():
+    print("\n--- Testing Push Coalescing ---")
+
+    async def scenario():
+        hub = Broadcaster()
+        fast, slow = hub.subscribe(), hub.subscribe({"hospital"})
+
+        hub.patient_scored("1", 40.0, "Medium")
+        hub.patient_scored("1", 40.0, "Medium")  # unchanged: silent
+        assert parse_frames(fast.drain()) == [("patient", {"patient_id": "1", "final_risk_score": 40.0, "severity_class": "Medium", "discharged": False, "seq": 1})]
+
+        for hsi in (0.5, 0.6, 0.95):
+            hub.hospital_evaluated(7, hsi, "System Overload" if hsi >= 0.9 else "Elevated Stress")
+        hub.patient_discharged("1")
+        # The slow hospital-only reader gets one frame carrying the latest HSI
+        events = parse_frames(slow.drain())
+        assert [(e, d["hospital_stress_index"], d["previous_classification"]) for e, d in events] == [("hospital", 0.95, "Elevated Stress")]
+        assert [e for e, _ in parse_frames(fast.drain())] == ["hospital", "patient"]
+        assert not fast.wakeup.is_set()
+
+    asyncio.run(scenario())
+    print("Push Coalescing Test: PASSED")
+
+def test_overflow_falls_back_to_resync():
+    print("\n--- Testing Push Overflow ---")
+
+    async def scenario():
+        hub = Broadcaster()
+        subscriber = hub.subscribe()
+        subscriber.capacity = 10
+        for i in range(25):
+            hub.patient_scored(str(i), float(i), "Low")
+        events = parse_frames(subscriber.drain())
+        assert events[0] == ("resync", {})
+        # Changes after the overflow are still delivered on top of the resync
+        assert [d["patient_id"] for _, d in events[1:]] == [str(i) for i in range(20, 25)]
+
+        hub.unsubscribe(subscriber)
+        hub.patient_scored("99", 1.0, "Low")
+        assert not subscriber.pending
+
+    asyncio.run(scenario())
+    print("Push Overflow Test: PASSED")
+
+def test_what_if_scoring_publishes_nothing():
+    print("\n--- Testing Stateless Scoring Stays Silent ---")
+    import main
+    from models import PatientData
+
+    async def scenario():
+        subscriber = main.broadcaster.subscribe()
+        try:
+            patient = PatientData(patient_id="WHATIF-1", heart_rate_bpm=150)
+            await main.analyze_patient(patient, is_oxygen_crisis=True)
+            await main.analyze_patient_bulk([patient, PatientData(patient_id="WHATIF-2")])
+            assert not subscriber.pending and subscriber.drain() == ""
+        finally:
+            main.broadcaster.unsubscribe(subscriber)
+
+    asyncio.run(scenario())
+    print("Stateless Scoring Stays Silent Test: PASSED")
+
+if __name__ == "__main__":
+    test_only_changes_are_published_and_slow_readers_coalesce()
+    test_overflow_falls_back_to_resync()
+    test_what_if_scoring_publishes_nothing()
@@ -0,0 +1,59 @@
+import asyncio
+import pickle
+
+import bulk_pool
+from models import PatientData, PatientAnalysisResult
+from engine import calculate_patient_risk, score_patient
+from risk_cache import RiskCache
+
+def make_patient(pid, **vitals):
+    return PatientData(patient_id=pid, **vitals)
+
+def test_lru_eviction_and_counters():
+    print("\n--- Testing Risk Cache LRU ---")
+    cache = RiskCache(max_size=2)
+    a, b, c = make_patient("A", heart_rate_bpm=130), make_patient("B", heart_rate_bpm=40), make_patient("C", age=90)
+
+    assert cache.score(a) == score_patient(a)
+    assert cache.score(b) == score_patient(b)
+    cache.score(a)                      # refresh A, B becomes least recently used
+    cache.score(c)                      # evicts B
+    again = cache.score(make_patient("A2", heart_rate_bpm=130))
+    assert again.patient_id == "A2", "Cached result must carry the caller's patient_id!"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 3, 1, 2), stats
+    assert cache.score(a, is_oxygen_crisis=True) == score_patient(a, True)
+    print("Risk Cache LRU Test: PASSED")
+
+def test_bulk_deduplication():
+    print("\n--- Testing Bulk De-duplication ---")
+    cache = RiskCache(max_size=100)
+    bulk_pool.risk_cache, original = cache, bulk_pool.risk_cache
+    try:
+        patients = [make_patient(f"P{i}", heart_rate_bpm=120 if i % 2 else 80) for i in range(10)]
+        results = asyncio.run(bulk_pool.score_bulk(patients))
+    finally:
+        bulk_pool.risk_cache = original
+
+    assert [r.patient_id for r in results] == [p.patient_id for p in patients]
+    assert results == [score_patient(p) for p in patients], "De-duplicated results diverged!"
+    stats = cache.stats()
+    assert (stats["misses"], stats["deduplicated"], stats["size"]) == (2, 8, 2), stats
+    print("Bulk De-duplication Test: PASSED")
+
+def test_internal_records_match_api_models():
+    print("\n--- Testing Internal Result Records ---")
+    patient = make_patient("R1", heart_rate_bpm=150, age=85, icu_required_flag=1)
+    record = score_patient(patient, True)
+    # Pool workers send records back pickled
+    assert pickle.loads(pickle.dumps(record)) == record
+    model = record.to_model()
+    assert model == PatientAnalysisResult(**record.as_dict()) == calculate_patient_risk(patient, True)
+    assert model.model_dump() == record.as_dict()
+    print("Internal Result Records Test: PASSED")
+
+if __name__ == "__main__":
+    test_lru_eviction_and_counters()
+    test_bulk_deduplication()
+    test_internal_records_match_api_models()
@@ -0,0 +1,167 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+import scoring_spec
+import synthetic
+from models import PatientData
+from engine import calculate_patient_risk, calculate_patient_risk_batch, score_patient
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Staff accounts live in the backend's tables in auth.db (relative to cwd), so the probe gets its own directory
+RELOAD_PROBE = """
+import json, sys
+sys.path.insert(0, {root!r})
+import jwt
+from fastapi.testclient import TestClient
+import auth_db, main
+
+auth_db.init()
+auth_db.BackendBase.metadata.create_all(bind=auth_db.engine)
+db = auth_db.SessionLocal()
+db.add_all([auth_db.User(email="admin@carepulse.test", role="Admin"), auth_db.User(email="nurse@carepulse.test", role="Nurse"),
+            auth_db.TokenBlocklist(token=jwt.encode({{"sub": "admin@carepulse.test", "logout": 1}}, main.JWT_SECRET_KEY, main.JWT_ALGORITHM))])
+db.commit()
+db.close()
+token = lambda claims, key=main.JWT_SECRET_KEY: jwt.encode(claims, key, algorithm=main.JWT_ALGORITHM)
+bearers = {{
+    "anonymous": None,
+    "forged": token({{"sub": "admin@carepulse.test"}}, "not-the-secret-key-of-this-deployment"),
+    "unknown": token({{"sub": "ghost@carepulse.test"}}),
+    "logged_out": token({{"sub": "admin@carepulse.test", "logout": 1}}),
+    "nurse": token({{"sub": "nurse@carepulse.test"}}),
+    "admin": token({{"sub": "admin@carepulse.test"}}),
+}}
+client = TestClient(main.app)
+out = {{}}
+for who, bearer in bearers.items():
+    response = client.post("/api/v1/scoring/spec/reload", headers={{"Authorization": "Bearer " + bearer}} if bearer else {{}})
+    out[who] = [response.status_code, response.json()]
+print(json.dumps(out))
+"""
+
+RESULT_FIELDS = ("base_score", "final_risk_score", "severity_class", "diet_recommendation", "target_room_temperature")
+
+def test_spec_compiles_to_reciprocals():
+    print("\n--- Testing Scoring Spec Compilation ---")
+    spec = scoring_spec.load()
+    hr = spec.rows_male[spec.component_names.index("heart_rate")]
+    assert hr[3] == 1.0 / (60 - 30) and hr[4] == 1.0 / (180 - 100), "Reciprocal denominators are wrong!"
+    hgb = spec.component_names.index("hemoglobin")
+    assert spec.rows_male[hgb][1] == 13.2 and spec.rows_other[hgb][1] == 11.6
+    assert spec.severity_labels[spec.critical_index] == "Critical"
+    print("Scoring Spec Compilation Test: PASSED")
+
+def test_lookup_tables_match_closed_form():
+    print("\n--- Testing Scoring Lookup Tables ---")
+    spec = scoring_spec.load()
+    no_luts = scoring_spec.CompiledSpec(spec.raw, lut_max_entries=0)
+    tabled = {spec.inputs[k] for k, lut in enumerate(spec.luts) if lut is not None}
+    assert tabled == {"heart_rate_bpm", "respiratory_rate_bpm", "age", scoring_spec.MAP_INPUT}
+
+    columns = synthetic.generate_patient_columns(5000, seed=11)
+    patients = synthetic.patients_from_columns(columns)
+    # Off-table values: fractional, negative and far beyond the span
+    columns["heart_rate_bpm"] = columns["heart_rate_bpm"].astype(float)
+    columns["heart_rate_bpm"][:3] = (80.5, -4.0, 9000.0)
+    original = scoring_spec._current
+    try:
+        results = []
+        for active in (spec, no_luts):
+            scoring_spec._current = active
+            results.append(([score_patient(p) for p in patients], calculate_patient_risk_batch(columns)))
+    finally:
+        scoring_spec._current = original
+    (scalar, batch), (scalar_ref, batch_ref) = results
+    # Same arithmetic, so bit-identical rather than merely close
+    assert scalar == scalar_ref
+    assert all(np.array_equal(batch[k], batch_ref[k]) for k in batch)
+    print("Scoring Lookup Tables Test: PASSED")
+
+def test_scalar_and_batch_agree_on_random_patients():
+    print("\n--- Testing Scalar And Batch Spec Parity ---")
+    raw = scoring_spec.load().to_dict()
+    # A second spec with every kind of constant moved, so parity does not hinge on the shipped numbers
+    edited = json.loads(json.dumps(raw))
+    for component, weight in zip(edited["components"], (0.05, 0.2, 0.1, 0.05, 0.1, 0.1, 0.15, 0.1, 0.05, 0.1)):
+        component["weight"] = weight
+    edited["components"][8]["by_gender"]["other"]["normal"] = [12.1, 15.4]
+    edited["modifiers"].update(chronic_multiplier=1.3, emergency_bonus=7.5, icu_floor=60.0, oxygen_crisis_amplifier=1.4)
+    edited["severity"]["thresholds"] = [15, 40, 70]
+    edited["room_temperature"]["fever_threshold"] = 38.2
+
+    columns = synthetic.generate_uniform_patient_columns(20000, seed=30)
+    patients = synthetic.patients_from_columns(columns)
+    original = scoring_spec._current
+    try:
+        for spec_raw in (raw, edited):
+            scoring_spec._current = scoring_spec.CompiledSpec(spec_raw)
+            for crisis in (False, True):
+                batch = calculate_patient_risk_batch(columns, crisis)
+                for i, result in enumerate(score_patient(p, crisis) for p in patients):
+                    assert all(getattr(result, k) == batch[k][i] for k in RESULT_FIELDS), f"Row {i} differs: {result}"
+    finally:
+        scoring_spec._current = original
+    print("Scalar And Batch Spec Parity Test: PASSED")
+
+def test_invalid_spec_is_rejected():
+    print("\n--- Testing Scoring Spec Validation ---")
+    raw = scoring_spec.load().to_dict()
+    broken = json.loads(json.dumps(raw))
+    broken["components"][0]["weight"] = 0.5
+    try:
+        scoring_spec.CompiledSpec(broken)
+        raise AssertionError("Weights not summing to 1.0 must be rejected!")
+    except scoring_spec.SpecError:
+        pass
+    print("Scoring Spec Validation Test: PASSED")
+
+def test_hot_reload():
+    print("\n--- Testing Scoring Spec Hot Reload ---")
+    raw = scoring_spec.load().to_dict()
+    patient = PatientData(patient_id="P_SPEC", emergency_case_flag=1)
+    original_path = scoring_spec.SPEC_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spec.json")
+        with open(path, "w") as f:
+            json.dump(raw, f)
+        scoring_spec.SPEC_PATH = path
+        try:
+            scoring_spec.reload()
+            assert calculate_patient_risk(patient).final_risk_score == 15.0
+
+            raw["modifiers"]["emergency_bonus"] = 25.0
+            with open(path, "w") as f:
+                json.dump(raw, f)
+            os.utime(path, (0, 12345))  # guarantee a visible mtime change
+            scoring_spec._last_check = 0.0
+            scoring_spec.refresh()
+            assert calculate_patient_risk(patient).final_risk_score == 25.0, "Edited spec was not picked up!"
+        finally:
+            scoring_spec.SPEC_PATH = original_path
+            scoring_spec.reload()
+    print("Scoring Spec Hot Reload Test: PASSED")
+
+def test_reload_route_is_admin_only():
+    print("\n--- Testing Spec Reload Is Admin Only ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        out = subprocess.run([sys.executable, "-c", RELOAD_PROBE.format(root=ROOT)], cwd=tmp, capture_output=True, text=True, timeout=120)
+        assert out.returncode == 0, out.stderr[-2000:]
+        codes = json.loads(out.stdout.strip().splitlines()[-1])
+    assert {who: status for who, (status, _) in codes.items()} == {"anonymous": 401, "forged": 401, "unknown": 401, "logged_out": 401,
+                                                                   "nurse": 403, "admin": 200}
+    assert codes["admin"][1] == {"success": True, "version": scoring_spec.load().version}
+    print("Spec Reload Is Admin Only Test: PASSED")
+
+if __name__ == "__main__":
+    test_spec_compiles_to_reciprocals()
+    test_lookup_tables_match_closed_form()
+    test_scalar_and_batch_agree_on_random_patients()
+    test_invalid_spec_is_rejected()
+    test_hot_reload()
+    test_reload_route_is_admin_only()
@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+import history
+import synthetic
+from er_queue import ERQueueRegistry
+from hospital_state import HospitalRegistry
+from models import ERQueueEntry, HospitalEvent, OxygenReading
+from oxygen_forecast import OxygenForecaster
+from shared_state import LockTimeout, SharedState
+
+WORKERS = 4
+ROUNDS = 50
+
+def worker(path, counter_file, queue):
+    store = SharedState(path)
+    ids = []
+    for _ in range(ROUNDS):
+        ids.append(store.next_id("patient_id"))
+        store.increment("requests")
+        # Unprotected read-modify-write of a shared file, as add_patient does with the workbook
+        with store.lock("counter_file"):
+            with open(counter_file) as f:
+                value = int(f.read())
+            with open(counter_file, "w") as f:
+                f.write(str(value + 1))
+    queue.put(ids)
+
+def test_sequences_counters_and_locks_across_processes():
+    print("\n--- Testing Shared State Across Workers ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        path, counter_file = os.path.join(tmp, "shared.db"), os.path.join(tmp, "counter.txt")
+        with open(counter_file, "w") as f:
+            f.write("0")
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(path, counter_file, queue)) for _ in range(WORKERS)]
+        for p in processes:
+            p.start()
+        ids = sorted(i for _ in processes for i in queue.get(timeout=60))
+        for p in processes:
+            p.join()
+
+        assert ids == list(range(1, WORKERS * ROUNDS + 1))
+        store = SharedState(path)
+        assert store.counter("requests") == WORKERS * ROUNDS
+        with open(counter_file) as f:
+            assert int(f.read()) == WORKERS * ROUNDS
+        # A sequence catches up with IDs that already exist elsewhere
+        assert store.next_id("patient_id", at_least=1000) == 1000
+        assert store.next_id("patient_id", at_least=5) == 1001
+    print("Shared State Across Workers Test: PASSED")
+
+def test_change_feed_reaches_other_workers_only():
+    print("\n--- Testing Shared Change Feed ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared.db")
+        a, b = SharedState(path), SharedState(path)
+        seen_a, seen_b = [], []
+        a.subscribe("census", lambda key, payload: seen_a.append((key, payload)))
+        b.subscribe("census", lambda key, payload: seen_b.append((key, payload)))
+        a.poll(), b.poll()
+
+        a.publish("census", "7", {"age": 70})
+        a.publish("census", "7", None)
+        b.publish("other_topic", "x")
+        assert b.poll() == 2 and a.poll() == 0
+        assert seen_b == [("7", {"age": 70}), ("7", None)] and seen_a == []
+
+        assert a.put("spec", {"v": 1}) == 1 and b.put("spec", {"v": 2}) == 2
+        assert a.get("spec") == {"v": 2} and a.delete("spec") and b.get("spec", "gone") == "gone"
+    print("Shared Change Feed Test: PASSED")
+
+def test_leases_expire_and_are_taken_over():
+    print("\n--- Testing Leased Ownership ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = SharedState(os.path.join(tmp, "shared.db")), SharedState(os.path.join(tmp, "shared.db"))
+        assert a.acquire("job:1", "a", lease=0.2) and not b.acquire("job:1", "b", lease=0.2)
+        assert a.renew("job:1", "a", lease=0.05)
+        time.sleep(0.1)
+        # The lapsed lease goes to b, and a can no longer renew it
+        assert b.acquire("job:1", "b", lease=5) and not a.renew("job:1", "a")
+        a.release("job:1", "a")
+        assert not a.acquire("job:1", "a")
+        b.release("job:1", "b")
+        assert a.acquire("job:1", "a")
+    print("Leased Ownership Test: PASSED")
+
+def test_held_lock_outlives_its_lease():
+    print("\n--- Testing Lock Lease Renewal ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = SharedState(os.path.join(tmp, "shared.db")), SharedState(os.path.join(tmp, "shared.db"))
+        with a.lock("patient_workbook", lease=0.15):
+            # Held for several leases: renewed in the background, so never taken over
+            time.sleep(0.5)
+            assert not b.acquire("patient_workbook", "b", lease=5)
+            try:
+                with b.lock("patient_workbook", timeout=0.1):
+                    raise AssertionError("A held lock must not be handed out!")
+            except LockTimeout:
+                pass
+        assert b.acquire("patient_workbook", "b")
+    print("Lock Lease Renewal Test: PASSED")
+
+def _worker_state(path):
+    store = SharedState(path)
+    hospitals = HospitalRegistry(store)
+    return store, hospitals, ERQueueRegistry(hospitals, store), OxygenForecaster(store)
+
+def test_hospital_er_and_oxygen_state_is_shared():
+    print("\n--- Testing Shared Hospital, ER And Oxygen State ---")
+    history.init()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared.db")
+        a_store, a_hospitals, a_queues, a_oxygen = _worker_state(path)
+        b_store, b_hospitals, b_queues, b_oxygen = _worker_state(path)
+        a_store.poll(), b_store.poll()
+
+        hospital = synthetic.hospitals_from_columns(synthetic.generate_hospital_columns(1, seed=3))[0]
+        a_hospitals.seed(hospital.model_copy(update={"er_occupied": 0}))
+        a_hospitals.apply(hospital.hospital_id, [HospitalEvent(type="bed_freed"), HospitalEvent(type="patient_critical")])
+        for i, score in enumerate((0.4, 0.9, 0.4)):
+            a_queues.admit(hospital.hospital_id, ERQueueEntry(patient_id=f"P{i}", final_risk_score=score, severity_class="Watch",
+                                                              emergency_case_flag=0, arrival_time=100.0))
+        readings = [OxygenReading(timestamp=3600.0 * t, oxygen_supply_level_percent=90 - 2 * t, ventilators_in_use=t,
+                                  icu_beds_occupied=5 + t % 3) for t in range(6)]
+        a_oxygen.ingest(hospital.hospital_id, readings)
+
+        # The other worker serves the same state once it has caught up with the change feed
+        b_store.poll()
+        hospital_id = hospital.hospital_id
+        assert b_hospitals.get(hospital_id).result() == a_hospitals.get(hospital_id).result()
+        assert b_hospitals.get(hospital_id).hospital.er_occupied == 3
+        assert [e.patient_id for e in b_queues.queue(hospital_id).top(5)] == ["P1", "P0", "P2"]
+        assert b_oxygen.forecast(hospital_id) == a_oxygen.forecast(hospital_id)
+
+        # ...and its changes come back: b takes the next patient, a no longer has them waiting
+        assert b_queues.next_patient(hospital_id, "ward").patient_id == "P1"
+        a_store.poll()
+        assert [e.patient_id for e in a_queues.queue(hospital_id).top(5)] == ["P0", "P2"]
+        assert a_hospitals.get(hospital_id).result() == b_hospitals.get(hospital_id).result()
+        assert a_hospitals.get(hospital_id).hospital.er_occupied == 2
+
+        # A worker started later loads the saved state
+        c_store, c_hospitals, c_queues, c_oxygen = _worker_state(path)
+        c_hospitals.load(), c_oxygen.load(), c_queues.load()
+        assert c_hospitals.get(hospital_id).to_dict() == a_hospitals.get(hospital_id).to_dict()
+        assert [e.patient_id for e in c_queues.queue(hospital_id).top(5)] == ["P0", "P2"]
+        assert c_oxygen.forecast(hospital_id) == a_oxygen.forecast(hospital_id)
+
+        assert c_hospitals.remove(hospital_id) and c_oxygen.reset(hospital_id)
+        a_store.poll()
+        assert a_hospitals.get(hospital_id) is None and a_oxygen.forecast(hospital_id) is None
+    print("Shared Hospital, ER And Oxygen State Test: PASSED")
+
+if __name__ == "__main__":
+    test_sequences_counters_and_locks_across_processes()
+    test_change_feed_reaches_other_workers_only()
+    test_leases_expire_and_are_taken_over()
+    test_held_lock_outlives_its_lease()
+    test_hospital_er_and_oxygen_state_is_shared()
@@ -0,0 +1,68 @@
+import asyncio
+
+import bulk_pool
+import simulation
+import synthetic
+from models import HospitalData, SimulationConfig
+
+HOSPITAL = HospitalData(
+    hospital_id=1, total_beds=200, occupied_beds=170, icu_beds_total=20, icu_beds_occupied=16, er_capacity=40,
+    er_occupied=30, ongoing_operations_count=8, available_doctors=20, available_nurses=60, ventilators_available=18,
+    ambulance_available_count=4, room_temperature_celsius=22.0, oxygen_supply_level_percent=55, total_patients_current=200
+)
+COLUMNS = synthetic.generate_patient_columns(400, seed=9)
+
+def run(**config):
+    result = asyncio.run(simulation.run_simulation(HOSPITAL, SimulationConfig(runs=500, horizon_hours=48, **config), COLUMNS))
+    result.pop("seconds")
+    return result
+
+def test_seeded_runs_are_deterministic():
+    print("\n--- Testing Simulation Determinism ---")
+    assert run(seed=7) == run(seed=7)
+    assert run(seed=7) != run(seed=8)
+    print("Simulation Determinism Test: PASSED")
+
+def test_results_do_not_depend_on_the_pool_size():
+    print("\n--- Testing Simulation Across Pool Sizes ---")
+    saved = simulation.RUNS_PER_BLOCK, bulk_pool.POOL_WORKERS
+    simulation.RUNS_PER_BLOCK = 150  # 500 runs -> 4 blocks
+    try:
+        results = []
+        for workers in (1, 2, 3):
+            bulk_pool.shutdown_pool()
+            bulk_pool.POOL_WORKERS = workers
+            results.append(run(seed=11))
+    finally:
+        bulk_pool.shutdown_pool()
+        simulation.RUNS_PER_BLOCK, bulk_pool.POOL_WORKERS = saved
+    # Same seed, same blocks: grouping them over more or fewer workers changes nothing
+    assert results[0] == results[1] == results[2]
+    print("Simulation Across Pool Sizes Test: PASSED")
+
+def test_outcomes_stay_in_bounds():
+    print("\n--- Testing Simulation Bounds ---")
+    result = run(seed=3, surge_probability=1.0, oxygen_disruption_probability=1.0)
+    assert all(0.0 <= p <= 1.0 for p in result["probabilities"].values())
+    for key in ("peak_icu_shortfall", "peak_ventilator_shortfall", "peak_hsi", "final_hsi", "min_oxygen_percent", "oxygen_crisis_hours"):
+        s = result[key]
+        assert s["p5"] <= s["p50"] <= s["p90"] <= s["p95"] <= s["p99"] <= s["max"], key
+    assert 0.0 <= result["min_oxygen_percent"]["p5"] and result["min_oxygen_percent"]["max"] <= 100.0
+    assert result["oxygen_crisis_hours"]["max"] <= 48
+    # Nobody arrives and the census never deteriorates: no shortfall can appear
+    calm = run(seed=3, arrival_rate_per_hour=0.0, surge_probability=0.0, oxygen_resupply_probability_per_hour=1.0)
+    assert calm["probabilities"]["icu_shortfall"] == 0.0
+    print("Simulation Bounds Test: PASSED")
+
+def test_stays_shorter_than_an_hour():
+    print("\n--- Testing Sub-Hour Length of Stay ---")
+    # Accepted by the model (gt=0); the hourly discharge probability must stay within [0, 1]
+    result = run(seed=1, er_length_of_stay_hours=0.25, icu_length_of_stay_hours=0.5, ward_length_of_stay_hours=0.9)
+    assert 0.0 <= result["final_hsi"]["max"]
+    print("Sub-Hour Length of Stay Test: PASSED")
+
+if __name__ == "__main__":
+    test_seeded_runs_are_deterministic()
+    test_results_do_not_depend_on_the_pool_size()
+    test_outcomes_stay_in_bounds()
+    test_stays_shorter_than_an_hour()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import synthetic
+from engine import calculate_patient_risk_batch
+from models import HospitalData, PatientData
+
+ROWS = 250
+CHUNK_ROWS = 100
+
+def _same(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(np.array_equal(a[k], b[k]) for k in a)
+
+def test_seeded_generators_are_deterministic():
+    print("\n--- Testing Synthetic Determinism ---")
+    for generate in (synthetic.generate_patient_columns, synthetic.generate_hospital_columns,
+                     lambda n, seed: synthetic.generate_vitals_columns(n, 12, seed)):
+        assert _same(generate(200, seed=5), generate(200, seed=5))
+        assert not _same(generate(200, seed=5), generate(200, seed=6))
+    mixed = lambda: synthetic.generate_patient_columns(300, seed=5, severity_mix="Normal=0.5,Critical=0.5", scenario="oxygen_crisis")
+    assert _same(mixed(), mixed())
+
+    # Every generated row is a valid model instance
+    columns = synthetic.generate_patient_columns(200, seed=5, scenario="mass_casualty")
+    for patient in synthetic.patients_from_columns(columns):
+        PatientData.model_validate(patient.model_dump())
+    for hospital in synthetic.hospitals_from_columns(synthetic.generate_hospital_columns(50, seed=5, scenario="heatwave")):
+        HospitalData.model_validate(hospital.model_dump())
+    try:
+        synthetic.generate_patient_columns(10, scenario="flood")
+        raise AssertionError("Unknown scenarios must be rejected!")
+    except ValueError:
+        pass
+    print("Synthetic Determinism Test: PASSED")
+
+def test_severity_mix_is_validated_and_exact():
+    print("\n--- Testing Severity Mix ---")
+    assert synthetic.parse_severity_mix("Normal=3, Critical=1") == {"Normal": 0.75, "Watch": 0.0, "Severe": 0.0, "Critical": 0.25}
+    assert synthetic.parse_severity_mix({"Watch": 0.2, "Severe": 0.2}) == {"Normal": 0.0, "Watch": 0.5, "Severe": 0.5, "Critical": 0.0}
+    for bad in ("Normal=0.5,Fatal=0.5", {"Normal": 0.0}, {"Normal": 1.5, "Watch": -0.5}, "Normal=lots"):
+        try:
+            synthetic.parse_severity_mix(bad)
+            raise AssertionError(f"{bad!r} must be rejected!")
+        except ValueError:
+            pass
+
+    for crisis, scenario in ((False, "normal"), (True, "oxygen_crisis")):
+        columns = synthetic.generate_patient_columns(1000, seed=35, severity_mix="Normal=0.4,Watch=0.3,Severe=0.2,Critical=0.1",
+                                                     scenario=scenario)
+        labels, counts = np.unique(calculate_patient_risk_batch(columns, crisis)["severity_class"], return_counts=True)
+        assert dict(zip(labels, counts.tolist())) == {"Normal": 400, "Watch": 300, "Severe": 200, "Critical": 100}
+    print("Severity Mix Test: PASSED")
+
+def test_chunked_writers_agree_and_read_back():
+    print("\n--- Testing Chunked Dataset Writers ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        frames, progress = {}, []
+        for fmt in synthetic.WRITERS:
+            path = os.path.join(tmp, f"patients.{fmt}")
+            report = synthetic.write_dataset("patients", ROWS, path, chunk_rows=CHUNK_ROWS, seed=7,
+                                             progress=lambda done, _: progress.append(done))
+            assert report["rows"] == ROWS and report["format"] == fmt
+            if fmt == "xlsx":
+                book = openpyxl.load_workbook(path, read_only=True)
+                header, *rows = book.worksheets[0].iter_rows(values_only=True)
+                frames[fmt] = pd.DataFrame(rows, columns=header)
+            else:
+                frames[fmt] = {"csv": pd.read_csv, "ndjson": lambda p: pd.read_json(p, lines=True), "parquet": pd.read_parquet}[fmt](path)
+        # Progress is reported once per chunk
+        assert progress == [100, 200, 250] * len(synthetic.WRITERS)
+
+        expected = pd.concat([pd.DataFrame(synthetic.generate_patient_columns(min(CHUNK_ROWS, ROWS - offset), synthetic._chunk_seed(7, i), offset))
+                              for i, offset in enumerate(range(0, ROWS, CHUNK_ROWS))], ignore_index=True)
+        for fmt, df in frames.items():
+            assert df.columns.tolist() == list(PatientData.model_fields), fmt
+            assert df.values.tolist() == expected.values.tolist(), fmt
+        assert frames["csv"]["patient_id"].tolist() == [f"SYN{i}" for i in range(ROWS)]
+
+        # Vitals come in whole patients per chunk, trimmed to the row count asked for
+        path = os.path.join(tmp, "vitals.xlsx")
+        assert synthetic.write_dataset("vitals", 1000, path, chunk_rows=300, steps=120)["rows"] == 1000
+        sheet = openpyxl.load_workbook(path, read_only=True).worksheets[0]
+        header, *rows = sheet.iter_rows(values_only=True)
+        assert header == synthetic.VITALS_FIELDS and len(rows) == 1000
+        assert rows[0][0] == "2026-03-01 14:00:00" and rows[-1][1] == "SYN8"
+
+        for args in (("patients", 10, os.path.join(tmp, "out.txt")), ("wards", 10, os.path.join(tmp, "out.csv"))):
+            try:
+                synthetic.write_dataset(*args)
+                raise AssertionError(f"{args} must be rejected!")
+            except ValueError:
+                pass
+    print("Chunked Dataset Writers Test: PASSED")
+
+if __name__ == "__main__":
+    test_seeded_generators_are_deterministic()
+    test_severity_mix_is_validated_and_exact()
+    test_chunked_writers_agree_and_read_back()
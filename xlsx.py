@@ -0,0 +1,122 @@
+"""
+Streaming SpreadsheetML (.xlsx) writer, shared by result exports and synthetic datasets.
+
+Rows go straight into the zip as inline strings: without a shared-string table nothing has to
+be kept until the end of a sheet, and an export holds one chunk of rows in memory however many
+it has. Given a target that cannot seek, zipfile writes data descriptors instead of seeking
+back, so the same writer serves streamed downloads and files on disk. A sheet rolls over to the
+next at Excel's row limit; the workbook parts naming the sheets are written on close().
+"""
+import math
+import re
+import zipfile
+from typing import List, Sequence
+from xml.sax.saxutils import escape
+
+MAX_ROWS = 1_048_575  # per sheet, excluding the header
+MAX_SHEET_NAME = 31
+
+# Characters XML 1.0 does not allow at all, escaped or not: most C0 controls, lone surrogates, U+FFFE/U+FFFF
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+SHEET_START = f'{XML_DECLARATION}<worksheet xmlns="{MAIN_NS}"><sheetData>'
+SHEET_END = "</sheetData></worksheet>"
+
+# --- CELLS ---
+def clean_text(value) -> str:
+    """str(value), XML-escaped, with characters XML 1.0 cannot carry dropped."""
+    return escape(_ILLEGAL_XML.sub("", str(value)))
+
+def _text(value) -> str:
+    return f'<c t="inlineStr"><is><t>{clean_text(value)}</t></is></c>'
+
+def _float(value: float) -> str:
+    return f"<c><v>{value!r}</v></c>" if math.isfinite(value) else "<c/>"
+
+# Exact-type dispatch: one dict lookup per cell instead of an isinstance chain
+CELL_WRITERS = {
+    float: _float,
+    int: lambda value: f"<c><v>{value}</v></c>",
+    str: _text,
+    bool: lambda value: f'<c t="b"><v>{int(value)}</v></c>',
+    type(None): lambda value: "<c/>",
+}
+
+def cell(value) -> str:
+    writer = CELL_WRITERS.get(type(value))
+    if writer is not None:
+        return writer(value)
+    if isinstance(value, bool):
+        return CELL_WRITERS[bool](value)
+    if isinstance(value, (int, float)):  # numpy scalars and other numeric subclasses
+        return _float(float(value))
+    return _text(value)
+
+def row(values) -> str:
+    return "<row>" + "".join(map(cell, values)) + "</row>"
+
+# --- WORKBOOK ---
+class Workbook:
+    """
+    One header, then rows, into `file` (a path or a write-only object). Sheets are named
+    sheet_name, then "sheet_name 2", "sheet_name 3", ... as rows roll over.
+    """
+
+    def __init__(self, file, header: Sequence, sheet_name: str = "Sheet1"):
+        self.zf = zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED)
+        self.header = row(header)
+        self.sheet_name = _ILLEGAL_XML.sub("", sheet_name)[:MAX_SHEET_NAME]
+        self.sheet, self.sheets, self.rows_in_sheet = None, 0, 0
+        self._open_sheet()
+
+    def _open_sheet(self):
+        self._close_sheet()
+        self.sheets += 1
+        # Size unknown up front, so each sheet entry is written with ZIP64 headers
+        self.sheet = self.zf.open(f"xl/worksheets/sheet{self.sheets}.xml", "w", force_zip64=True)
+        self.sheet.write((SHEET_START + self.header).encode())
+        self.rows_in_sheet = 0
+
+    def _close_sheet(self):
+        if self.sheet is not None:
+            self.sheet.write(SHEET_END.encode())
+            self.sheet.close()
+            self.sheet = None
+
+    def write_rows(self, rows: List[Sequence]):
+        while rows:
+            if self.rows_in_sheet >= MAX_ROWS:
+                self._open_sheet()
+            take = rows[:MAX_ROWS - self.rows_in_sheet]
+            rows = rows[len(take):]
+            self.sheet.write("".join(map(row, take)).encode())
+            self.rows_in_sheet += len(take)
+
+    def close(self):
+        self._close_sheet()
+        sheets = range(1, self.sheets + 1)
+        names = [escape(self.sheet_name if i == 1 else f"{self.sheet_name} {i}", {'"': "&quot;"}) for i in sheets]
+        sheet_type = f"{REL_NS}/worksheet"
+        self.zf.writestr("[Content_Types].xml",
+            f'{XML_DECLARATION}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>' for i in sheets)
+            + "</Types>")
+        self.zf.writestr("_rels/.rels",
+            f'{XML_DECLARATION}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>")
+        self.zf.writestr("xl/workbook.xml",
+            f'{XML_DECLARATION}<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>'
+            + "".join(f'<sheet name="{name}" sheetId="{i}" r:id="rId{i}"/>' for i, name in zip(sheets, names))
+            + "</sheets></workbook>")
+        self.zf.writestr("xl/_rels/workbook.xml.rels",
+            f'{XML_DECLARATION}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="rId{i}" Type="{sheet_type}" Target="worksheets/sheet{i}.xml"/>' for i in sheets)
+            + "</Relationships>")
+        self.zf.close()